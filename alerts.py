@@ -0,0 +1,157 @@
+import numpy as np
+
+# ==========================================
+# 觸發價索引：每檔標的依方向各一組排序陣列，新價格以 searchsorted 找出被穿越的觸發價
+#   每個 tick 成本 O(log n + 觸發筆數)，與該檔掛了多少個價位無關
+# ==========================================
+BELOW = -1   # 跌破觸發 (價格 < 觸發價)，例如特務機器人的「< 觸發買進價」
+ABOVE = 1    # 突破觸發 (價格 > 觸發價)
+
+class _Side:
+    # 單一標的、單一方向的觸發價，依價格排序
+    def __init__(self, direction):
+        self.direction = direction
+        self.levels = np.empty(0)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.armed = np.empty(0, dtype=bool)
+        self.alive = np.empty(0, dtype=bool)
+        self.one_shot = np.empty(0, dtype=bool)
+        self.hysteresis = np.empty(0)
+        self.rearm_sorted = np.empty(0)           # 重新上膛價 (觸發價 ± 遲滯)，排序後
+        self.rearm_order = np.empty(0, dtype=np.int64)
+        self.pending = []                          # 尚未併入陣列的新觸發價
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.levels) - self.dead + len(self.pending)
+
+    def add(self, alert_id, level, one_shot, hysteresis):
+        self.pending.append((level, alert_id, one_shot, hysteresis, True))
+
+    def remove(self, alert_id):
+        for i, p in enumerate(self.pending):
+            if p[1] == alert_id:
+                del self.pending[i]; return True
+        hit = np.flatnonzero((self.ids == alert_id) & self.alive)
+        if hit.size == 0: return False
+        self.alive[hit] = False
+        self.armed[hit] = False
+        self.dead += hit.size
+        return True
+
+    def _rebuild(self):
+        # 併入新觸發價、清掉已失效的，重新排序
+        keep = self.alive
+        levels, ids, hyst = self.levels[keep], self.ids[keep], self.hysteresis[keep]
+        armed, one_shot = self.armed[keep], self.one_shot[keep]
+        if self.pending:
+            lv, aid, shot, h, arm = zip(*self.pending)
+            levels = np.concatenate([levels, np.array(lv, dtype=float)])
+            ids = np.concatenate([ids, np.array(aid, dtype=np.int64)])
+            one_shot = np.concatenate([one_shot, np.array(shot, dtype=bool)])
+            hyst = np.concatenate([hyst, np.array(h, dtype=float)])
+            armed = np.concatenate([armed, np.array(arm, dtype=bool)])
+            self.pending = []
+
+        order = np.argsort(levels, kind='stable')
+        self.levels, self.ids, self.hysteresis = levels[order], ids[order], hyst[order]
+        self.armed, self.one_shot = armed[order], one_shot[order]
+        self.alive = np.ones(len(self.levels), dtype=bool)
+        self.dead = 0
+        rearm = self.levels - self.direction * self.hysteresis
+        self.rearm_order = np.argsort(rearm, kind='stable')
+        self.rearm_sorted = rearm[self.rearm_order]
+
+    def cross(self, prev, price):
+        # 回傳 [(alert_id, 觸發價, 是否已失效), ...]
+        if self.dead and self.dead * 2 > len(self.levels): self._rebuild()
+        fired = self._cross_sorted(prev, price)
+        if self.pending:
+            # 新掛上的觸發價看「當下是否已滿足條件」，不必等下一次穿越
+            pending, self.pending = self.pending, []
+            for lv, aid, shot, h, _ in pending:
+                hit = price < lv if self.direction == BELOW else price > lv
+                if hit: fired.append((aid, lv, shot))
+                if not (hit and shot): self.pending.append((lv, aid, shot, h, not hit))
+            if self.pending: self._rebuild()
+        return fired
+
+    def _cross_sorted(self, prev, price):
+        n = len(self.levels)
+        if n == 0 or prev is None: return []
+
+        if self.direction == BELOW:
+            # 由 prev 跌到 price：觸發價落在 (price, prev] 的都被跌破
+            lo = np.searchsorted(self.levels, price, 'right')
+            hi = np.searchsorted(self.levels, prev, 'right')
+            # 反彈站回重新上膛價之上 → 可再次觸發
+            if price > prev:
+                a = np.searchsorted(self.rearm_sorted, prev, 'left')
+                b = np.searchsorted(self.rearm_sorted, price, 'left')
+                self._rearm(self.rearm_order[a:b])
+        else:
+            lo = np.searchsorted(self.levels, prev, 'left')
+            hi = np.searchsorted(self.levels, price, 'left')
+            if price < prev:
+                a = np.searchsorted(self.rearm_sorted, price, 'right')
+                b = np.searchsorted(self.rearm_sorted, prev, 'right')
+                self._rearm(self.rearm_order[a:b])
+
+        if lo >= hi: return []
+        idx = np.arange(lo, hi)
+        idx = idx[self.armed[idx]]
+        if idx.size == 0: return []
+        self.armed[idx] = False
+        shot = self.one_shot[idx]
+        if shot.any():
+            self.alive[idx[shot]] = False
+            self.dead += int(shot.sum())
+        return list(zip(self.ids[idx].tolist(), self.levels[idx].tolist(), shot.tolist()))
+
+    def _rearm(self, idx):
+        if idx.size == 0: return
+        idx = idx[self.alive[idx] & ~self.one_shot[idx]]
+        self.armed[idx] = True
+
+class AlertIndex:
+    def __init__(self):
+        self._books = {}     # ticker -> {BELOW: _Side, ABOVE: _Side}
+        self._last = {}      # ticker -> 上一筆價格
+        self._where = {}     # alert_id -> (ticker, direction)
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    def add(self, ticker, level, direction=BELOW, one_shot=True, hysteresis=0.0, alert_id=None):
+        # one_shot=False 為可重複觸發：觸發後價格離開觸發價超過 hysteresis 才重新上膛
+        if alert_id is None:
+            alert_id = self._next_id
+            self._next_id += 1
+        book = self._books.setdefault(ticker, {BELOW: _Side(BELOW), ABOVE: _Side(ABOVE)})
+        book[direction].add(alert_id, float(level), bool(one_shot), float(hysteresis))
+        self._where[alert_id] = (ticker, direction)
+        return alert_id
+
+    def remove(self, alert_id):
+        loc = self._where.pop(alert_id, None)
+        if loc is None: return False
+        return self._books[loc[0]][loc[1]].remove(alert_id)
+
+    def update(self, ticker, price):
+        # 回傳本次被穿越的觸發：[(alert_id, ticker, level, direction, price), ...]
+        prev = self._last.get(ticker)
+        self._last[ticker] = price
+        book = self._books.get(ticker)
+        if book is None: return []
+        events = []
+        for direction, side in book.items():
+            for alert_id, level, finished in side.cross(prev, price):
+                if finished: self._where.pop(alert_id, None)
+                events.append((alert_id, ticker, level, direction, price))
+        return events
+
+    def update_many(self, prices):
+        events = []
+        for ticker, price in prices.items(): events.extend(self.update(ticker, price))
+        return events
@@ -1,13 +1,11 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-import yfinance as yf
-from datetime import datetime, time as dt_time
-import pytz
-import time
-import feedparser
-import requests
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from symbols import get_master
+from metrics import timed, record_error
+from ui_common import (engine, init_session, get_quote_cache, get_metrics_server, plot_chinese_chart, show_chart,
+                       render_admin_panel, clear_caches, render_upstream_status, render_master_status, render_replay_panel,
+                       live_every, rerun_fragment, render_dashboard)
 
 # ==========================================
 # 1. 系統初始化 & CSS 風格
@@ -57,185 +55,96 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # ==========================================
-# 2. 核心數據引擎
+# 2. 核心數據引擎 (報價 / K 線 / 新聞等兩頁共用的部分在 ui_common.py)
 # ==========================================
-class DataEngine:
-    def __init__(self):
-        self.tz = pytz.timezone('Asia/Taipei')
-        # 內建台股名稱翻譯字典
-        self.name_map = {
-            "2330": "台積電", "2317": "鴻海", "2454": "聯發科", "2603": "長榮", "2609": "陽明",
-            "2615": "萬海", "3231": "緯創", "2382": "廣達", "2356": "英業達", "2303": "聯電",
-            "2881": "富邦金", "2882": "國泰金", "2891": "中信金", "2376": "技嘉", "2388": "威盛",
-            "3037": "欣興", "3035": "智原", "3017": "奇鋐", "2368": "金像電", "3008": "大立光",
-            "1513": "中興電", "1519": "華城", "1503": "士電", "1504": "東元", "2002": "中鋼",
-            "1605": "華新", "2409": "友達", "3481": "群創", "2344": "華邦電", "2498": "宏達電",
-            "6182": "合晶", "8069": "元太", "5483": "中美晶", "3661": "世芯-KY", "6531": "愛普",
-            "6669": "緯穎", "5269": "祥碩", "6415": "矽力-KY", "2327": "國巨", "2308": "台達電"
-        }
-        self.watch_list = list(self.name_map.keys())
-
-    def is_market_open(self):
-        now = datetime.now(self.tz)
-        if now.weekday() >= 5: return False
-        return dt_time(9, 0) <= now.time() <= dt_time(13, 30)
-
-    def get_stock_name(self, ticker):
-        clean_ticker = ticker.replace('.TW', '')
-        return self.name_map.get(clean_ticker, ticker)
-
-    @st.cache_data(ttl=60)
-    def fetch_quote(_self, ticker):
-        if not ticker.endswith('.TW') and not ticker.startswith('^'): ticker += '.TW'
-        try:
-            stock = yf.Ticker(ticker)
-            df = stock.history(period='1d', interval='1m')
-            if df.empty:
-                df = stock.history(period='5d', interval='1d')
-            
-            if df.empty: return None
-            
-            last = df.iloc[-1]
-            price = float(last['Close'])
-            
-            change = 0.0
-            pct = 0.0
-            if len(df) > 1:
-                prev = df.iloc[-2]['Close']
-                change = price - prev
-                pct = (change / prev) * 100
-            
-            clean_ticker = ticker.replace('.TW', '')
-            display_name = _self.name_map.get(clean_ticker, clean_ticker)
-            
-            return {
-                "name": display_name, "price": price, "change": change,
-                "pct": pct, "vol": last['Volume'], 
-                "open": last['Open'], "high": last['High'], "low": last['Low']
-            }
-        except: return None
-        
-    @st.cache_data(ttl=3600)
-    def fetch_stock_profile(_self, ticker):
-        if not ticker.endswith('.TW'): ticker += '.TW'
-        try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            return {
-                "pe": info.get('trailingPE', 'N/A'),
-                "eps": info.get('trailingEps', 'N/A'),
-                "marketCap": info.get('marketCap', 'N/A'),
-                "yield": info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 'N/A',
-                "sector": info.get('sector', 'N/A')
-            }
-        except: return None
-
-    @st.cache_data(ttl=300)
-    def fetch_indices(_self):
-        targets = {"加權指數": "^TWII", "櫃買指數": "^TWOII", "道瓊": "^DJI", "那斯達克": "^IXIC", "費半": "^SOX"}
-        res = {}
-        for name, sym in targets.items():
-            q = _self.fetch_quote(sym)
-            if q: res[name] = q
-        return res
-
-    # === [修改重點] 增加 interval 和 period 參數 ===
-    @st.cache_data(ttl=60)
-    def fetch_kline(_self, ticker, interval="1d", period="3mo"):
-        if not ticker.endswith('.TW'): ticker += '.TW'
-        try:
-            stock = yf.Ticker(ticker)
-            df = stock.history(period=period, interval=interval)
-            df.reset_index(inplace=True)
-            df['Date'] = df['Date'].dt.tz_localize(None)
-            df.columns = [c.lower() for c in df.columns]
-            return df
-        except: return pd.DataFrame()
-
-    @st.cache_data(ttl=300)
-    def get_real_news(_self):
-        rss_url = "https://news.google.com/rss/search?q=台股&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
-        news_items = []
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        try:
-            response = requests.get(rss_url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                feed = feedparser.parse(response.content)
-                if feed.entries:
-                    for entry in feed.entries[:5]:
-                        t = entry.published_parsed
-                        time_str = f"{t.tm_hour:02}:{t.tm_min:02}" if t else "最新"
-                        news_items.append({
-                            "title": entry.title, "link": entry.link,
-                            "time": time_str, "source": entry.source.title if hasattr(entry, 'source') else "Google新聞"
-                        })
-        except: pass
-        if not news_items: return [{"title": "系統連線中...", "link": "#", "time": "--", "source": "系統"}]
-        return news_items
-
-    @st.cache_data(ttl=60)
-    def scan_market(_self, min_p, max_p, strategy):
-        data_list = []
-        tickers_tw = [f"{x}.TW" for x in _self.watch_list]
-        try:
-            df = yf.download(tickers_tw, period="1d", group_by='ticker', threads=True, progress=False)
-            for code in _self.watch_list:
-                t_code = f"{code}.TW"
-                if t_code not in df.columns.levels[0]: continue
-                sub = df[t_code]
-                if sub.empty: continue
-                row = sub.iloc[-1]
-                price = float(row['Close'])
-                if not (min_p <= price <= max_p): continue
-                open_p = float(row['Open'])
-                change_pct = (price - open_p) / open_p * 100
-                vol = int(row['Volume'])
-                name = _self.name_map.get(code, code)
-                data_list.append({
-                    "代號": code, "名稱": name, "股價": price, "漲跌幅": change_pct, "成交量": vol,
-                    "abs_change": abs(change_pct)
-                })
-            res = pd.DataFrame(data_list)
-            if res.empty: return res
-            if strategy == "漲跌停 (±10%)": return res.sort_values(by="abs_change", ascending=False).head(10)
-            elif strategy == "爆量強勢股": return res.sort_values(by="成交量", ascending=False).head(10)
-            elif strategy == "飆股 (漲幅排行)": return res.sort_values(by="漲跌幅", ascending=False).head(10)
-            return res
-        except: return pd.DataFrame()
-
-    def send_line_push(self, token, user_id, message):
-        url = "https://api.line.me/v2/bot/message/push"
-        headers = {"Content-Type": "application/json", "Authorization": "Bearer " + token}
-        data = {"to": user_id, "messages": [{"type": "text", "text": message}]}
-        try:
-            requests.post(url, headers=headers, json=data)
-            return True
-        except: return False
-
-engine = DataEngine()
+@st.cache_resource
+def get_line_dispatcher():
+    # 背景發送 LINE 通知，按鈕點下立即返回
+    from line_notify import LineDispatcher
+    return LineDispatcher()
+
+@st.cache_resource
+def get_bot_store():
+    # 與 bot_daemon.py 共用的機器人設定/狀態
+    from bot_store import BotStore
+    return BotStore()
+
+@st.cache_resource
+def get_bootstrap_pool():
+    # 新 session 的預設報價在背景抓，第一次畫面不等網路
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="bootstrap")
+
+def send_line_push(token, user_id, message):
+    # 回傳排入佇列的工作編號；User ID 以逗號分隔多人時改用 multicast
+    user_ids = [u.strip() for u in user_id.split(',') if u.strip()]
+    dispatcher = get_line_dispatcher()
+    if len(user_ids) > 1: return dispatcher.multicast(token, user_ids, message)
+    job = dispatcher.push(token, user_ids[0] if user_ids else "", message)
+    return [job] if job else []
 
 # ==========================================
 # 3. Session 狀態初始化
 # ==========================================
-if 'portfolio' not in st.session_state: st.session_state.portfolio = [{"code": "2330", "name": "台積電", "cost": 980, "qty": 1000}]
-if 'login_status' not in st.session_state: st.session_state.login_status = False
+init_session()
 if 'member_tier' not in st.session_state: st.session_state.member_tier = "一般會員"
 if 'line_token' not in st.session_state: st.session_state.line_token = ""
 if 'line_uid' not in st.session_state: st.session_state.line_uid = ""
+if 'line_jobs' not in st.session_state: st.session_state.line_jobs = []
+if 'line_token_input' not in st.session_state: st.session_state.line_token_input = st.session_state.line_token
+if 'line_uid_input' not in st.session_state: st.session_state.line_uid_input = st.session_state.line_uid
 
 if 'bot_instances' not in st.session_state:
+    # 觸發價 / 現價先留空，報價在背景抓，回來後由 fill_bootstrap_quote() 填入
     default_code = "2330"
-    init_q = engine.fetch_quote(default_code)
-    init_price = float(init_q['price']) if init_q else 1000.0
-    
+    st.session_state.bot_quote = get_bootstrap_pool().submit(engine.fetch_quote, default_code, get_quote_cache())
     st.session_state.bot_instances = [
-        {"id": i, "active": False, "code": default_code, "price": init_price, "qty": 1, "profit": 5.0, "loss": 2.0, "cur_price": init_price} 
+        {"id": i, "active": False, "code": default_code, "price": None, "qty": 1, "profit": 5.0, "loss": 2.0, "trail": 0.0, "cur_price": None}
         for i in range(5)
     ]
 
+def fill_bootstrap_quote():
+    # 回傳 True = 預設報價還在路上
+    fut = st.session_state.get('bot_quote')
+    if fut is None: return False
+    if not fut.done(): return True
+    try: q = fut.result()
+    except Exception as e:
+        record_error("bootstrap", e)
+        q = None
+    price = float(q['price']) if q else 1000.0
+    for b in st.session_state.bot_instances:
+        if b['price'] is None: b['price'] = price
+        if b['cur_price'] is None: b['cur_price'] = price
+    del st.session_state.bot_quote
+    return False
+
+def bot_owner():
+    # 機器人以 LINE User ID 歸戶 (多人時取第一個)：關掉分頁後輸入同一個 ID 就能接回監控中的機器人
+    uids = [u.strip() for u in st.session_state.line_uid.split(',') if u.strip()]
+    return uids[0] if uids else ""
+
+def load_owner_bots():
+    # 從 BotStore 接回這個 ID 名下的機器人設定 (背景監控照常在跑)，卡片上的輸入框重新帶入
+    owner = bot_owner()
+    if not owner: return
+    rows = get_bot_store().load_bots(owner)
+    for i, b in enumerate(st.session_state.bot_instances):
+        r = rows.get(i)
+        if r is None: continue
+        b.update(code=r['code'], price=r['price'], qty=r['qty'], profit=r['profit'], loss=r['loss'], trail=r['trail'],
+                 active=bool(r['active']), cur_price=r['cur_price'] or r['price'])
+        for k in ('bc', 'bcp', 'bp', 'bq', 'bpf', 'bls', 'btr'): st.session_state.pop(f"{k}_{i}", None)
+    if rows and not st.session_state.line_token:
+        st.session_state.line_token = st.session_state.line_token_input = next(iter(rows.values()))['line_token'] or ""
+
+def on_line_change():
+    st.session_state.line_token = st.session_state.line_token_input
+    st.session_state.line_uid = st.session_state.line_uid_input
+    load_owner_bots()
+
 def on_bot_code_change(i):
     key = f"bc_{i}"
-    code = st.session_state[key]
+    code = st.session_state[key] = get_master().resolve(st.session_state[key])
     q = engine.fetch_quote(code)
     if q:
         cur_p = float(q['price'])
@@ -243,162 +152,184 @@ def on_bot_code_change(i):
         st.session_state.bot_instances[i]['price'] = cur_p
         st.session_state.bot_instances[i]['code'] = code
 
-def auto_fill_name():
-    code = st.session_state.p_code_input
-    if code:
-        info = engine.fetch_quote(code)
-        if info: st.session_state.p_name_input = info['name']
-
-def plot_chinese_chart(df, title, trigger_price=None):
-    fig = go.Figure(data=[go.Candlestick(
-        x=df['date'], open=df['open'], high=df['high'], low=df['low'], close=df['close'],
-        name='K線',
-        increasing_line_color='#d32f2f', decreasing_line_color='#2e7d32'
-    )])
-    fig.update_traces(hovertemplate='<b>日期</b>: %{x}<br><b>開盤</b>: %{open:.2f}<br><b>最高</b>: %{high:.2f}<br><b>最低</b>: %{low:.2f}<br><b>收盤</b>: %{close:.2f}<extra></extra>')
-    if trigger_price:
-        fig.add_hline(y=trigger_price, line_dash="dash", line_color="blue", annotation_text="觸發買進價")
-    fig.update_layout(title=title, height=350, xaxis_rangeslider_visible=False, margin=dict(l=10, r=10, t=30, b=10), yaxis_title="股價 (TWD)", hovermode="x unified")
-    return fig
+def track_line_jobs(jobs):
+    st.session_state.line_jobs = (st.session_state.line_jobs + list(jobs))[-20:]
+    return bool(jobs)
+
+# 背景預設報價回來前，機器人卡片佔位區塊的輪詢週期
+BOOTSTRAP_POLL_SEC = 0.5
 
 # ==========================================
-# 4. 模組一：股市情報站 (Dashboard)
+# 4. 模組一：股市情報站 (與當沖版共用 ui_common.render_dashboard)
 # ==========================================
-def render_dashboard():
-    st.markdown("<div class='nav-bar'><span class='nav-title'>🕵️ 股市情報站 (Intelligence Station)</span></div>", unsafe_allow_html=True)
-    
-    col_main, col_news = st.columns([3, 2])
-    
-    with col_main:
-        # A. 大盤
-        st.subheader("📊 市場行情")
-        indices = engine.fetch_indices()
-        c_grid = st.columns(4)
-        for i, (name, data) in enumerate(indices.items()):
-            if i < 4:
-                color = "up" if data['change'] > 0 else "down"
-                with c_grid[i]:
-                    st.markdown(f"""
-                    <div class='card'>
-                        <div class='card-title'>{name}</div>
-                        <div class='card-val {color}'>{data['price']:,.0f}</div>
-                        <div class='{color}'>{data['change']:+.0f} ({data['pct']:+.2f}%)</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-        st.divider()
-        
-        # B. 個股偵查
-        st.subheader("🔎 全方位個股偵查")
-        c_search, c_space = st.columns([1, 2])
-        ticker = c_search.text_input("輸入代號 (例如 2330)", "2330")
-        
-        q = engine.fetch_quote(ticker)
-        profile = engine.fetch_stock_profile(ticker)
+
+# ==========================================
+# 5. 模組二：股市特務 X (Bot)
+# ==========================================
+@st.fragment(run_every=live_every("bot"))
+@timed("render.bot_card")
+def render_bot_card(i):
+    # 每張卡片獨立刷新：重讀背景監控寫回的現價 / 持倉 / 出場並重畫自己的走勢圖，不動到其他卡片
+    from positions import EXIT_LABEL
+    is_open = engine.is_market_open()
+    store = get_bot_store()
+    owner = bot_owner()
+    bot_states = store.load_bots(owner)
+    bot_positions = {p['slot']: p for p in store.load_positions(owner)}
+    bot_fills = {f['slot']: f for f in store.load_fills(owner)}
+
+    bot = st.session_state.bot_instances[i]
+    state = bot_states.get(i) if bot['active'] else None
+    if state and state['cur_price']: bot['cur_price'] = state['cur_price']
+    active_css = "bot-active-border" if bot['active'] else "bot-inactive-border"
+    status_txt = "🟢 監控中" if bot['active'] else "⚪ 待命"
         
-        if q:
-            color_cls = "up" if q['change'] > 0 else "down"
-            st.markdown(f"""
-            <div class='stock-header'>
-                <span class='stock-price-lg {color_cls}'>{q['price']}</span>
-                <span class='stock-meta {color_cls}' style='margin-left:10px; font-size:20px;'>{q['change']:+.2f} ({q['pct']:+.2f}%)</span>
-                <div class='stock-meta'>代號: {ticker} | 名稱: {q['name']} | 成交量: {q['vol']:,}</div>
-            </div>
-            """, unsafe_allow_html=True)
+    with st.expander(f"🤖 特務 #{i+1} [{bot['code']}] - {status_txt}", expanded=True):
+        st.markdown(f"<div class='bot-card {active_css}'>", unsafe_allow_html=True)
             
-            tab1, tab2, tab3 = st.tabs(["📈 技術走勢", "📋 基本資料", "🔗 深層數據 (Anue)"])
+        c_chart, c_ctrl = st.columns([2, 1])
             
-            with tab1:
-                # === [修改重點] K 線週期切換 ===
-                c_k_opt, c_k_void = st.columns([1, 4])
-                k_type = c_k_opt.radio("K線週期", ["日K", "週K", "月K"], horizontal=True, label_visibility="collapsed")
+        with c_chart:
+            disabled = bot['active']
+            c_1, c_2, c_3, c_4 = st.columns([1.5, 1.5, 1.5, 1.5])
                 
-                if k_type == "日K": k_inv, k_prd = "1d", "3mo"
-                elif k_type == "週K": k_inv, k_prd = "1wk", "1y"
-                else: k_inv, k_prd = "1mo", "5y"
+            new_code = c_1.text_input(f"代號 #{i+1}", bot['code'], key=f"bc_{i}", disabled=disabled, on_change=on_bot_code_change, args=(i,))
+            cur_price_display = st.session_state.bot_instances[i]['cur_price']
+            c_2.number_input(f"現價 (參考)", value=float(cur_price_display), disabled=True, key=f"bcp_{i}")
+            new_price = c_3.number_input(f"觸發價 #{i+1}", value=float(st.session_state.bot_instances[i]['price']), key=f"bp_{i}", disabled=disabled)
+            new_qty = c_4.number_input(f"張數 #{i+1}", value=bot['qty'], key=f"bq_{i}", disabled=disabled)
                 
-                df_k = engine.fetch_kline(ticker, interval=k_inv, period=k_prd)
+            df_bot, ind_bot = engine.fetch_indicators(new_code)
+            if not df_bot.empty:
+                name = engine.get_stock_name(new_code)
+                show_chart(plot_chinese_chart(df_bot, f"{name} ({new_code}) 監控走勢", new_price, source=(new_code, "1d")), use_container_width=True, key=f"bot_chart_{i}")
+                last = ind_bot.iloc[-1]
+                st.caption(f"RSI14 {last['rsi']:.1f}｜K {last['k']:.1f} / D {last['d']:.1f}｜MA20 {last['ma20']:.2f}｜ATR {last['atr']:.2f}")
                 
-                if not df_k.empty:
-                    st.plotly_chart(plot_chinese_chart(df_k, f"{q['name']} ({ticker}) - {k_type}線圖"), use_container_width=True, key="dash_chart")
-                else:
-                    st.warning("查無此週期 K 線資料")
-            
-            with tab2:
-                if profile:
-                    c_p1, c_p2, c_p3 = st.columns(3)
-                    c_p1.metric("本益比 (PE)", f"{profile['pe']}")
-                    c_p2.metric("每股盈餘 (EPS)", f"{profile['eps']}")
-                    c_p3.metric("殖利率 (%)", f"{profile['yield']:.2f}%" if profile['yield'] != 'N/A' else 'N/A')
-                    st.caption(f"產業: {profile['sector']} | 市值: {profile['marketCap']}")
-                else:
-                    st.info("暫無基本資料")
-
-            with tab3:
-                st.info(f"🔒 {q['name']} ({ticker}) 深層數據傳送門 (點擊直達鉅亨網)：")
-                anue_base = f"https://stock.cnyes.com/market/TWS:{ticker}:STOCK"
-                col_btn1, col_btn2, col_btn3 = st.columns(3)
-                col_btn1.link_button("🏦 三大法人買賣超", f"{anue_base}/institutional", use_container_width=True)
-                col_btn2.link_button("📉 融資融券餘額", f"{anue_base}/margin", use_container_width=True)
-                col_btn3.link_button("📑 營收與財報", f"{anue_base}/financials", use_container_width=True)
+            if not disabled:
+                st.session_state.bot_instances[i]['code'] = new_code
+                st.session_state.bot_instances[i]['price'] = new_price
+                st.session_state.bot_instances[i]['qty'] = new_qty
+
+        with c_ctrl:
+            st.write("#### 任務控制")
+            st.info(f"監控: {new_code}\n條件: < {new_price}")
+            c_pf, c_ls, c_tr = st.columns(3)
+            new_profit = c_pf.number_input("停利%", value=float(bot['profit']), min_value=0.1, step=0.5, key=f"bpf_{i}", disabled=disabled)
+            new_loss = c_ls.number_input("停損%", value=float(bot['loss']), min_value=0.1, step=0.5, key=f"bls_{i}", disabled=disabled)
+            new_trail = c_tr.number_input("移動停損%", value=float(bot.get('trail', 0.0)), min_value=0.0, step=0.5, key=f"btr_{i}", disabled=disabled)
+            if not disabled:
+                st.session_state.bot_instances[i]['profit'] = new_profit
+                st.session_state.bot_instances[i]['loss'] = new_loss
+                st.session_state.bot_instances[i]['trail'] = new_trail
+
+            pos = bot_positions.get(i) if state else None
+            fill = bot_fills.get(i) if state and state['triggered_at'] else None
+            if fill and fill['ts'] >= state['triggered_at']:
+                st.success(f"🏁 {EXIT_LABEL[fill['kind']]}出場 @ {fill['exit']:.2f} ({fill['pl']:+,.0f})")
+            elif pos:
+                st.success(f"📈 持倉中 進場 {pos['entry']:.2f}｜停利 {pos['tp']:.2f}｜停損 {pos['sl']:.2f}")
+            elif state and state['triggered_at']:
+                t_str = datetime.fromtimestamp(state['triggered_at'], engine.tz).strftime("%H:%M:%S")
+                st.success(f"🎯 已觸發 @ {state['triggered_price']:.2f} ({t_str})")
+            elif state and state['last_checked']:
+                st.caption(f"最後檢查: {datetime.fromtimestamp(state['last_checked'], engine.tz).strftime('%H:%M:%S')}")
                 
-        st.divider()
-        
-        # C. 熱點排行
-        st.subheader("🔥 市場熱點排行 (Scanner)")
-        with st.container():
-            st.info("💡 請設定條件以開始搜尋")
-            c_s1, c_s2, c_s3, c_s4 = st.columns([2, 2, 3, 2])
-            min_p = c_s1.number_input("最低價 ($)", value=10, min_value=1)
-            max_p = c_s2.number_input("最高價 ($)", value=1000, min_value=1)
-            strat = c_s3.selectbox("篩選策略", ["漲跌停 (±10%)", "爆量強勢股", "飆股 (漲幅排行)"])
-            if c_s4.button("🔍 開始掃描", type="primary", use_container_width=True):
-                with st.spinner("正在掃描全市場數據..."):
-                    res = engine.scan_market(min_p, max_p, strat)
-                    if not res.empty:
-                        st.success(f"搜尋完成！")
-                        st.dataframe(res.style.format({"股價": "{:.2f}", "漲跌幅": "{:+.2f}%", "成交量": "{:,}"}), use_container_width=True)
-                    else:
-                        st.warning("查無符合條件股票")
-
-    with col_news:
-        st.subheader("📰 今日頭條 (Google News)")
-        st.caption("點擊標題開啟新視窗")
-        news_list = engine.get_real_news()
-        for news in news_list:
-            st.markdown(f"""
-            <div class='news-item'>
-                <a href='{news['link']}' target='_blank' class='news-link'>{news['title']} 🔗</a>
-                <div class='news-meta'>{news['time']} | {news['source']}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            if not bot['active']:
+                if not owner: st.caption("先在側欄輸入 LINE User ID 才能啟動 (機器人以此歸戶)")
+                if st.button(f"🟢 啟動 #{i+1}", key=f"s_{i}", use_container_width=True, disabled=not is_open or not owner):
+                    st.session_state.bot_instances[i]['active'] = True
+                    get_bot_store().save_bot(owner, i, st.session_state.bot_instances[i], st.session_state.line_token, st.session_state.line_uid)
+                    msg = f"【啟動】\n標的: {new_code}\n條件: < {new_price}"
+                    if st.session_state.line_token: track_line_jobs(send_line_push(st.session_state.line_token, st.session_state.line_uid, msg))
+                    rerun_fragment()
+            else:
+                if st.button(f"🔴 停止 #{i+1}", key=f"e_{i}", use_container_width=True):
+                    st.session_state.bot_instances[i]['active'] = False
+                    get_bot_store().save_bot(owner, i, st.session_state.bot_instances[i], st.session_state.line_token, st.session_state.line_uid)
+                    msg = f"【停止】\n標的: {bot['code']}\n已手動停止"
+                    if st.session_state.line_token: track_line_jobs(send_line_push(st.session_state.line_token, st.session_state.line_uid, msg))
+                    rerun_fragment()
+
+        render_backtest(i, new_code, new_price, new_profit, new_loss, new_trail, new_qty)
             
+        st.markdown("</div>", unsafe_allow_html=True)
+
+@st.fragment(run_every=BOOTSTRAP_POLL_SEC)
+def render_bot_placeholders(limit):
+    # 卡片骨架：預設報價回來就整頁重跑，換成真正的機器人卡片
+    if not fill_bootstrap_quote(): st.rerun()
+    for i in range(limit):
+        with st.expander(f"🤖 特務 #{i+1} [{st.session_state.bot_instances[i]['code']}] - ⏳ 載入報價中", expanded=True):
+            st.caption("報價載入中，稍候自動顯示…")
+
+@st.cache_data(ttl=300, show_spinner=False)
+def backtest_bot(code, interval, period, trigger, profit, loss, trail, lots):
+    from backtest import run_backtest
+    return run_backtest(engine.fetch_kline(code, interval=interval, period=period), trigger, profit, loss, trail, lots)
+
+@timed("render.backtest")
+def render_backtest(i, code, trigger, profit, loss, trail, lots):
+    # 以卡片目前的觸發價 / 停利 / 停損 / 移動停損重播歷史 K 棒 (卡片在 expander 裡，不能再包一層 expander)
+    if not st.toggle("🧪 歷史回測 (以目前設定重播)", key=f"bt_on_{i}"): return
+    span = st.radio("回測資料", ["日K (近1年)", "1分K (近5日)"], horizontal=True, key=f"bt_span_{i}", label_visibility="collapsed")
+    interval, period = ("1d", "1y") if span.startswith("日K") else ("1m", "5d")
+    from backtest import trade_table
+    from charts import build_equity_figure
+    trades, curve, stats = backtest_bot(code, interval, period, float(trigger), float(profit), float(loss), float(trail), int(lots))
+    if not stats['trades']:
+        st.info("這段期間沒有跌破觸發價的紀錄")
+        return
+    m1, m2, m3, m4, m5 = st.columns(5)
+    m1.metric("交易次數", stats['trades'])
+    m2.metric("勝率", f"{stats['win_rate']:.0f}%")
+    m3.metric("淨損益", f"{stats['net_pl']:+,.0f}")
+    m4.metric("最大回落", f"{stats['max_drawdown']:,.0f}")
+    m5.metric("獲利因子", f"{stats['profit_factor']:.2f}")
+    show_chart(build_equity_figure(curve, f"{code} 回測權益曲線 ({span})"), use_container_width=True, key=f"bt_curve_{i}")
+    st.dataframe(trade_table(trades).style.format({"進場價": "{:.2f}", "出場價": "{:.2f}", "手續費": "{:,.0f}", "證交稅": "{:,.0f}", "淨損益": "{:+,.0f}"}), use_container_width=True, hide_index=True)
+    st.caption("成本沿用當沖試算：手續費 0.1425% (原價、最低 20 元)，證交稅 0.15%")
+
+@st.fragment
+@timed("render.optimizer")
+def render_optimizer(limit):
+    # 多檔 x 數千組參數平行回測 (多行程 + shared memory)，結果留在 session 裡
+    import numpy as np
+    from optimizer import run_sweep, best_by
+    from charts import build_sweep_heatmap
     st.divider()
-    st.subheader("🎒 我的資產庫存")
-    with st.expander("➕ 新增庫存紀錄", expanded=False):
-        c1, c2, c3, c4 = st.columns(4)
-        new_code = c1.text_input("代號", key="p_code_input", on_change=auto_fill_name)
-        new_name = c2.text_input("名稱 (自動帶入)", key="p_name_input")
-        new_cost = c3.number_input("平均成本", min_value=0.0)
-        new_qty = c4.number_input("股數", min_value=1, step=1000)
-        if st.button("加入"):
-            if new_code:
-                st.session_state.portfolio.append({"code": new_code, "name": new_name, "cost": new_cost, "qty": new_qty})
-                st.rerun()
-    if st.session_state.portfolio:
-        p_data = []
-        for item in st.session_state.portfolio:
-            q = engine.fetch_quote(item['code'])
-            curr = q['price'] if q else item['cost']
-            prof = (curr - item['cost']) * item['qty']
-            p_data.append({
-                "代號": item['code'], "名稱": item['name'], "持有": item['qty'],
-                "成本": item['cost'], "現價": f"{curr:.2f}", "損益": f"{prof:,.0f}"
-            })
-        st.dataframe(pd.DataFrame(p_data), use_container_width=True)
+    st.subheader("🧬 參數最佳化 (歷史回測)")
+    with st.expander("⚙️ 掃描範圍", expanded="opt_result" not in st.session_state):
+        default_codes = ",".join(dict.fromkeys(b['code'] for b in st.session_state.bot_instances[:limit]))
+        codes_txt = st.text_input("標的 (逗號分隔)", default_codes, key="opt_codes")
+        c1, c2, c3 = st.columns(3)
+        trig = c1.slider("觸發價：期初收盤往下 %", 0.0, 20.0, (0.0, 10.0), 0.5, key="opt_trig")
+        prof = c2.slider("停利 %", 0.5, 30.0, (1.0, 10.0), 0.5, key="opt_prof")
+        loss = c3.slider("停損 %", 0.5, 20.0, (1.0, 5.0), 0.5, key="opt_loss")
+        c4, c5 = st.columns(2)
+        steps = c4.slider("每個參數取幾個值", 3, 30, 10, key="opt_steps")
+        span = c5.radio("回測資料", ["日K (近1年)", "1分K (近5日)"], horizontal=True, key="opt_span")
+        codes = [c.strip() for c in codes_txt.split(",") if c.strip()]
+        st.caption(f"共 {len(codes) * steps ** 3:,} 組")
+        if st.button("🚀 開始最佳化", type="primary", disabled=not codes):
+            interval, period = ("1d", "1y") if span.startswith("日K") else ("1m", "5d")
+            with st.spinner("平行回測中..."):
+                frames = {code: engine.fetch_kline(code, interval=interval, period=period) for code in codes}
+                st.session_state.opt_result = run_sweep(frames, np.linspace(*trig, steps), np.linspace(*prof, steps), np.linspace(*loss, steps))
 
-# ==========================================
-# 5. 模組二：股市特務 X (Bot)
-# ==========================================
+    if "opt_result" not in st.session_state: return
+    table, info = st.session_state.opt_result
+    if table.empty:
+        st.warning("查無 K 線資料，無法回測")
+        return
+    st.caption(f"⏱️ {info['combos']:,} 組 / {info['seconds']:.2f} 秒 = {info['combos_per_sec']:,.0f} 組/秒 ({info['workers']} 個行程, {info['tickers']} 檔)")
+    st.dataframe(table.head(50).style.format({"觸發%": "{:.1f}", "觸發價": "{:.2f}", "停利%": "{:.1f}", "停損%": "{:.1f}", "移動停損%": "{:.1f}",
+                                              "勝率": "{:.0f}%", "淨損益": "{:+,.0f}", "最大回落": "{:,.0f}"}), use_container_width=True, hide_index=True)
+    code = st.selectbox("熱圖標的", list(dict.fromkeys(table['代號'])), key="opt_heat_code")
+    pivot = best_by(table[table['代號'] == code].round({"停利%": 2, "停損%": 2}), "停損%", "停利%")
+    show_chart(build_sweep_heatmap(pivot, f"{code} 停利 x 停損 (觸發價取最佳)"), use_container_width=True, key="opt_heatmap")
+
+@timed("render.bot")
 def render_bot():
     st.markdown("<div class='nav-bar'><span class='nav-title'>🕵️ 股市特務 X (Auto-Trading Bot)</span></div>", unsafe_allow_html=True)
     
@@ -425,16 +356,16 @@ def render_bot():
     
     st.sidebar.divider()
     st.sidebar.header("🔔 LINE 通知 (Messaging API)")
-    l_token = st.sidebar.text_input("Channel Token", value=st.session_state.line_token, type="password")
-    l_uid = st.sidebar.text_input("User ID", value=st.session_state.line_uid)
+    l_token = st.sidebar.text_input("Channel Token", type="password", key="line_token_input", on_change=on_line_change)
+    l_uid = st.sidebar.text_input("User ID", key="line_uid_input", on_change=on_line_change, help="機器人以此 ID 歸戶，重新開啟頁面輸入同一個 ID 即可接回")
     
     c_line_test, c_line_report = st.sidebar.columns(2)
     if c_line_test.button("測試通知"):
         st.session_state.line_token = l_token
         st.session_state.line_uid = l_uid
-        if engine.send_line_push(l_token, l_uid, "【股市特務X】連線測試成功！"):
-            st.sidebar.success("成功")
-        else: st.sidebar.error("失敗")
+        if track_line_jobs(send_line_push(l_token, l_uid, "【股市特務X】連線測試成功！")):
+            st.sidebar.success("已排入發送佇列")
+        else: st.sidebar.error("請先設定 Token 與 User ID")
         
     if c_line_report.button("📢 發送收盤報告"):
         if not st.session_state.line_token:
@@ -442,87 +373,63 @@ def render_bot():
         else:
             report_msg = "📊 【股市特務 X】收盤損益報告\n----------------------\n"
             total_pl = 0
-            count = 0
-            for bot in st.session_state.bot_instances[:limit]:
-                if bot['active']:
-                    q = engine.fetch_quote(bot['code'])
-                    if q:
-                        curr = q['price']
-                        pl = (curr - bot['price']) * bot['qty'] * 1000
-                        total_pl += pl
-                        name = engine.get_stock_name(bot['code'])
-                        report_msg += f"✅ {name}({bot['code']}): {pl:+,.0f}\n"
-                        count += 1
+            count = sum(1 for b in st.session_state.bot_instances[:limit] if b['active'])
+            # 損益直接讀背景監控程式寫下的出場紀錄與持倉現價，不再逐台重抓報價
+            from positions import EXIT_LABEL
+            store = get_bot_store()
+            today = datetime.now(engine.tz).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+            for f in store.load_fills(bot_owner(), since=today):
+                total_pl += f['pl']
+                name = engine.get_stock_name(f['code'])
+                report_msg += f"✅ {name}({f['code']}) {EXIT_LABEL[f['kind']]}: {f['pl']:+,.0f}\n"
+            states = store.load_bots(bot_owner())
+            for p in store.load_positions(bot_owner()):
+                curr = (states.get(p['slot']) or {}).get('cur_price') or p['entry']
+                pl = (curr - p['entry']) * p['qty'] * 1000
+                total_pl += pl
+                name = engine.get_stock_name(p['code'])
+                report_msg += f"⏳ {name}({p['code']}) 持有中: {pl:+,.0f}\n"
             report_msg += "----------------------\n"
             report_msg += f"💰 今日總損益: {total_pl:+,.0f} 元\n🤖 運行機器人: {count} 台"
             
-            if engine.send_line_push(l_token, l_uid, report_msg):
-                st.sidebar.success("報告已發送！")
+            if track_line_jobs(send_line_push(l_token, l_uid, report_msg)):
+                st.sidebar.success("報告已排入發送佇列！")
             else:
-                st.sidebar.error("發送失敗")
+                st.sidebar.error("請先設定 User ID")
 
-    st.info(f"權限：{tier} | 可執行：{limit} 筆")
+    if st.session_state.line_jobs:
+        # 發送結果由背景執行緒回填，下次重新整理就會看到
+        with st.sidebar.expander("📬 發送紀錄", expanded=False):
+            status_icon = {"queued": "⏳", "sent": "✅", "failed": "❌"}
+            for job in reversed(st.session_state.line_jobs[-5:]):
+                r = get_line_dispatcher().status(job)
+                if r: st.caption(f"{status_icon[r['status']]} {r['text']} {r['error']}")
 
-    for i in range(limit):
-        bot = st.session_state.bot_instances[i]
-        active_css = "bot-active-border" if bot['active'] else "bot-inactive-border"
-        status_txt = "🟢 監控中" if bot['active'] else "⚪ 待命"
-        
-        with st.expander(f"🤖 特務 #{i+1} [{bot['code']}] - {status_txt}", expanded=True):
-            st.markdown(f"<div class='bot-card {active_css}'>", unsafe_allow_html=True)
-            
-            c_chart, c_ctrl = st.columns([2, 1])
-            
-            with c_chart:
-                disabled = bot['active']
-                c_1, c_2, c_3, c_4 = st.columns([1.5, 1.5, 1.5, 1.5])
-                
-                new_code = c_1.text_input(f"代號 #{i+1}", bot['code'], key=f"bc_{i}", disabled=disabled, on_change=on_bot_code_change, args=(i,))
-                cur_price_display = st.session_state.bot_instances[i]['cur_price']
-                c_2.number_input(f"現價 (參考)", value=float(cur_price_display), disabled=True, key=f"bcp_{i}")
-                new_price = c_3.number_input(f"觸發價 #{i+1}", value=float(st.session_state.bot_instances[i]['price']), key=f"bp_{i}", disabled=disabled)
-                new_qty = c_4.number_input(f"張數 #{i+1}", value=bot['qty'], key=f"bq_{i}", disabled=disabled)
-                
-                df_bot = engine.fetch_kline(new_code)
-                if not df_bot.empty:
-                    name = engine.get_stock_name(new_code)
-                    st.plotly_chart(plot_chinese_chart(df_bot, f"{name} ({new_code}) 監控走勢", new_price), use_container_width=True, key=f"bot_chart_{i}")
-                
-                if not disabled:
-                    st.session_state.bot_instances[i]['code'] = new_code
-                    st.session_state.bot_instances[i]['price'] = new_price
-                    st.session_state.bot_instances[i]['qty'] = new_qty
-
-            with c_ctrl:
-                st.write("#### 任務控制")
-                st.info(f"監控: {new_code}\n條件: < {new_price}")
-                
-                if not bot['active']:
-                    if st.button(f"🟢 啟動 #{i+1}", key=f"s_{i}", use_container_width=True, disabled=not is_open):
-                        st.session_state.bot_instances[i]['active'] = True
-                        msg = f"【啟動】\n標的: {new_code}\n條件: < {new_price}"
-                        if st.session_state.line_token: engine.send_line_push(st.session_state.line_token, st.session_state.line_uid, msg)
-                        st.rerun()
-                else:
-                    if st.button(f"🔴 停止 #{i+1}", key=f"e_{i}", use_container_width=True):
-                        st.session_state.bot_instances[i]['active'] = False
-                        msg = f"【停止】\n標的: {bot['code']}\n已手動停止"
-                        if st.session_state.line_token: engine.send_line_push(st.session_state.line_token, st.session_state.line_uid, msg)
-                        st.rerun()
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+    st.info(f"權限：{tier} | 可執行：{limit} 筆")
+    st.caption("💡 關閉瀏覽器後仍要監控，請在主機執行 `python bot_daemon.py`")
+    if fill_bootstrap_quote(): render_bot_placeholders(limit)
+    else:
+        for i in range(limit): render_bot_card(i)
+    render_optimizer(limit)
 
 # ==========================================
 # 6. 主程式導航
 # ==========================================
+get_metrics_server()   # Prometheus 端點，每個行程只啟動一次
+
 with st.sidebar:
     st.title("🕵️ 股市特務 X")
     st.markdown("---")
     module = st.radio("導航", ["📊 股市情報站", "🤖 股市特務 X"])
     st.markdown("---")
     if st.button("清除快取"):
-        st.cache_data.clear()
+        clear_caches()
         st.rerun()
+    render_replay_panel()
+    render_upstream_status()
+    render_master_status()
+    st.markdown("---")
+    render_admin_panel()
 
 if module == "📊 股市情報站":
     render_dashboard()
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from trade_costs import trade_costs, LOT_SHARES
+from positions import TAKE_PROFIT, STOP_LOSS, TRAIL_STOP, EXIT_LABEL, bracket_prices
+
+# ==========================================
+# 特務機器人回測：跌破觸發價進場，停利 / 停損 / 移動停損出場，手續費與證交稅沿用當沖試算
+#   進場點以整段陣列一次找出 (由上往下穿越觸發價)；出場只往後掃到碰價為止 (視窗倍增)，
+#   整體成本約 O(K 棒數)，一年 1 分K 不到一秒
+#   同一根 K 棒同時碰到停利與停損時以停損為準 (與 PositionBook 一致)
+# ==========================================
+OPEN = "OPEN"   # 回測結束仍持有，以最後收盤價計
+FIRST_WINDOW = 256
+
+def _arrays(df):
+    return (df['open'].to_numpy(dtype=float), df['high'].to_numpy(dtype=float),
+            df['low'].to_numpy(dtype=float), df['close'].to_numpy(dtype=float))
+
+def entry_signals(o, l, c, trigger):
+    # 由觸發價之上跌破：開盤或前一根收盤仍在觸發價之上，這根低點跌破
+    prev_c = np.concatenate([[np.inf], c[:-1]])
+    cross = (l < trigger) & ((o >= trigger) | (prev_c >= trigger))
+    cross[0] = l[0] < trigger   # 第一根就在觸發價之下 = 機器人啟動當下已滿足條件
+    return np.flatnonzero(cross)
+
+def find_exit(o, h, l, start, entry, tp, sl, trail_pct):
+    # 從 start 往後找第一根碰到停利 / 停損的 K 棒；回傳 (索引, 價格, 種類)，找不到回傳 None
+    n, w = len(o), FIRST_WINDOW
+    peak = entry
+    while start < n:
+        end = min(n, start + w)
+        hh, ll = h[start:end], l[start:end]
+        stop = np.full(end - start, sl)
+        if trail_pct > 0:
+            # 停損依「前一根為止的最高價」上移，只上不下
+            peaks = np.maximum(peak, np.maximum.accumulate(np.concatenate([[peak], hh[:-1]])))
+            stop = np.maximum(stop, peaks * (1 - trail_pct / 100))
+        hit_sl = ll <= stop
+        hit_tp = hh >= tp
+        hit = np.flatnonzero(hit_sl | hit_tp)
+        if hit.size:
+            j = int(hit[0])
+            i = start + j
+            if hit_sl[j]:
+                kind = TRAIL_STOP if stop[j] > sl else STOP_LOSS
+                return i, min(o[i], stop[j]), kind
+            return i, max(o[i], tp), TAKE_PROFIT
+        if trail_pct > 0: peak = max(peak, float(hh.max()))
+        start, w = end, w * 2
+    return None
+
+def simulate(o, h, l, c, trigger, profit_pct, loss_pct, trail_pct=0.0, signals=None):
+    # 回傳 [(進場索引, 出場索引, 進場價, 出場價, 種類), ...]；signals 只跟觸發價有關，掃參數時可共用
+    if signals is None: signals = entry_signals(o, l, c, trigger)
+    fills, k = [], 0
+    while k < len(signals):
+        i = int(signals[k])
+        entry = min(o[i], trigger)
+        tp, sl = bracket_prices(entry, profit_pct, loss_pct)
+        found = find_exit(o, h, l, i + 1, entry, tp, sl, trail_pct)
+        x, exit_price, kind = found if found else (len(c) - 1, c[-1], OPEN)
+        fills.append((i, x, float(entry), float(exit_price), kind))
+        k = int(np.searchsorted(signals, x, 'right'))   # 出場後的下一次跌破
+    return fills
+
+def run_backtest(df, trigger, profit_pct, loss_pct, trail_pct=0.0, lots=1, discount=1.0):
+    # 回傳 (trades DataFrame, equity Series, stats dict)
+    if df.empty or trigger <= 0: return pd.DataFrame(), pd.Series(dtype=float), summarize(pd.DataFrame(), None, 0)
+    o, h, l, c = _arrays(df)
+    dates = pd.DatetimeIndex(df['date'])
+    shares = lots * LOT_SHARES
+
+    rows = []
+    equity = np.zeros(len(c))
+    realized = 0.0
+    for i, x, entry, exit_price, kind in simulate(o, h, l, c, trigger, profit_pct, loss_pct, trail_pct):
+        gross, fee, tax = (float(v) for v in trade_costs(entry, exit_price, lots, True, discount))
+        # 持有期間以收盤價計未實現損益，出場那根起計入已實現
+        equity[i:x] = realized + (c[i:x] - entry) * shares
+        realized += gross - fee - tax
+        equity[x:] = realized
+        rows.append({"entry_time": dates[i], "entry": entry, "exit_time": dates[x], "exit": exit_price,
+                     "kind": kind, "lots": lots, "gross": gross, "fee": fee, "tax": tax,
+                     "pl": gross - fee - tax, "bars": x - i})
+    trades = pd.DataFrame(rows)
+    curve = pd.Series(equity, index=dates.rename('date'), name='equity')
+    return trades, curve, summarize(trades, curve, len(c))
+
+def summarize(trades, curve, n_bars):
+    if trades.empty: return {"trades": 0, "win_rate": 0.0, "net_pl": 0.0, "avg_pl": 0.0, "max_drawdown": 0.0, "profit_factor": 0.0, "exposure": 0.0}
+    pl = trades['pl'].to_numpy()
+    eq = curve.to_numpy()
+    wins, losses = pl[pl > 0].sum(), -pl[pl < 0].sum()
+    return {
+        "trades": len(pl),
+        "win_rate": float((pl > 0).mean() * 100),
+        "net_pl": float(pl.sum()),
+        "avg_pl": float(pl.mean()),
+        "max_drawdown": float((np.maximum.accumulate(np.maximum(eq, 0)) - eq).max()),
+        "profit_factor": float(wins / losses) if losses else float('inf'),
+        "exposure": float(trades['bars'].sum() / n_bars * 100),
+    }
+
+def trade_table(trades):
+    if trades.empty: return trades
+    return pd.DataFrame({
+        "進場時間": trades['entry_time'], "進場價": trades['entry'], "出場時間": trades['exit_time'],
+        "出場價": trades['exit'], "出場": trades['kind'].map(lambda k: EXIT_LABEL.get(k, "持有中")),
+        "手續費": trades['fee'], "證交稅": trades['tax'], "淨損益": trades['pl'],
+    })
@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import pandas as pd
+from datetime import datetime, timedelta, time as dt_time
+from market_data import TW_TZ, SESSION_OPEN
+from providers import get_provider
+from metrics import record_error, record_rows
+from scheduler import CHART, UpstreamUnavailable, get_scheduler, has_rows
+
+# ==========================================
+# 本地 K 線庫 (Parquet，依 interval / 代號分檔)
+# ==========================================
+DATA_DIR = os.environ.get('STOCK_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')   # 基準測試等可改到暫存目錄
+STORE_DIR = os.path.join(DATA_DIR, 'bars')
+SETTLE_TIME = dt_time(14, 0)      # 收盤後日 K 結算緩衝
+LIVE_REFRESH_SEC = 60             # 盤中增量同步間隔
+FULL_HISTORY = pd.Timestamp('1900-01-01')
+
+def normalize_history(df):
+    # yfinance 的 index 日K 叫 Date、分K 叫 Datetime，統一成小寫欄位 + 無時區的台北時間
+    if df is None or df.empty: return pd.DataFrame()
+    df = df.reset_index()
+    df = df.rename(columns={df.columns[0]: 'date'})
+    if df['date'].dt.tz is not None: df['date'] = df['date'].dt.tz_localize(None)
+    df.columns = [c.lower() for c in df.columns]
+    return df
+
+def download_history(symbol, interval, period=None, start=None, provider=None, priority=CHART):
+    # 排程器拒絕 (限流 / 斷路) 時丟出 UpstreamUnavailable，讓呼叫端改回本地庫現有資料
+    provider = provider or get_provider()
+    try:
+        df = get_scheduler().call(priority, provider.history, symbol, interval, period=period, start=start, ok=has_rows)
+        record_rows(provider.name, len(df))
+        return normalize_history(df)
+    except UpstreamUnavailable as e:
+        record_error(provider.name, e.state)
+        raise
+    except Exception as e:
+        record_error(provider.name, e)
+        return pd.DataFrame()
+
+def period_start(period, now):
+    m = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not m: return FULL_HISTORY   # max / ytd 之類一律視為全期
+    n, unit = int(m.group(1)), m.group(2)
+    if unit == 'd': return now - pd.DateOffset(days=n)
+    if unit == 'wk': return now - pd.DateOffset(weeks=n)
+    if unit == 'mo': return now - pd.DateOffset(months=n)
+    return now - pd.DateOffset(years=n)
+
+def slice_period(df, interval, period, now):
+    if df.empty: return df
+    if period == '1d' and interval not in ('1d', '5d', '1wk', '1mo', '3mo'):
+        # 分K 的 1d 指最近一個交易日，而不是最近 24 小時
+        last_day = df['date'].iloc[-1].normalize()
+        return df[df['date'] >= last_day].reset_index(drop=True)
+    return df[df['date'] >= period_start(period, now)].reset_index(drop=True)
+
+def last_settle(now):
+    # 最近一個 (平日) 收盤結算時點；國定假日頂多多同步一次
+    day = now if now.time() >= SETTLE_TIME else now - timedelta(days=1)
+    while day.weekday() >= 5: day -= timedelta(days=1)
+    return TW_TZ.localize(datetime.combine(day.date(), SETTLE_TIME))
+
+class BarStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def path(self, symbol, interval, ext='parquet'):
+        return os.path.join(self.root, interval, f"{symbol}.{ext}")
+
+    def load(self, symbol, interval):
+        p = self.path(symbol, interval)
+        if not os.path.exists(p): return pd.DataFrame()
+        try: return pd.read_parquet(p)
+        except Exception as e:
+            record_error("bar_store", e)
+            return pd.DataFrame()
+
+    def load_meta(self, symbol, interval):
+        p = self.path(symbol, interval, 'json')
+        if not os.path.exists(p): return {}
+        try:
+            with open(p, encoding='utf-8') as f: return json.load(f)
+        except Exception as e:
+            record_error("bar_store", e)
+            return {}
+
+    def save(self, symbol, interval, df, meta):
+        p = self.path(symbol, interval)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        # 先寫暫存檔再 rename，多個 session 同時寫入也不會讀到半個檔
+        if df is not None:
+            df.to_parquet(p + '.tmp', index=False)
+            os.replace(p + '.tmp', p)
+        with open(p + '.json.tmp', 'w', encoding='utf-8') as f: json.dump(meta, f)
+        os.replace(p + '.json.tmp', self.path(symbol, interval, 'json'))
+
+    def needs_sync(self, meta, now):
+        synced_at = meta.get('synced_at')
+        if synced_at is None: return True
+        last_sync = datetime.fromtimestamp(synced_at, TW_TZ)
+        if now.weekday() < 5 and SESSION_OPEN <= now.time() < SETTLE_TIME:
+            return (now - last_sync).total_seconds() >= LIVE_REFRESH_SEC
+        # 休市中：上次同步已在最近一次結算之後，就不可能有新 K 棒
+        return last_sync < last_settle(now)
+
+    def fetch(self, symbol, interval="1d", period="3mo"):
+        provider = get_provider()
+        now = provider.now()
+        now_naive = pd.Timestamp(now.replace(tzinfo=None))
+        if not provider.persist:
+            # 本地庫 / 重播：資料源本身就在本機，不寫回 K 線庫
+            try: return slice_period(download_history(symbol, interval, period=period, provider=provider), interval, period, now_naive)
+            except UpstreamUnavailable: return pd.DataFrame()
+        stored = self.load(symbol, interval)
+        meta = self.load_meta(symbol, interval)
+        start = period_start(period, now_naive)
+
+        covered_from = pd.Timestamp(meta['covered_from']) if 'covered_from' in meta else None
+        try:
+            if stored.empty or covered_from is None or covered_from > start:
+                # 庫裡沒有 (或不夠長)：整段下載一次
+                fresh = download_history(symbol, interval, period=period, provider=provider)
+                if fresh.empty: return slice_period(stored, interval, period, now_naive)
+                meta['covered_from'] = str(start)
+            elif self.needs_sync(meta, now):
+                # 只要最後一根 (可能未收完) 之後的資料
+                fresh = download_history(symbol, interval, start=stored['date'].iloc[-1], provider=provider)
+                gap = now_naive - stored['date'].iloc[-1]
+                if fresh.empty and interval not in ('1d', '1wk', '1mo') and gap > pd.Timedelta(days=7):
+                    # 分K 上游只保留數天，斷太久就重抓整段
+                    fresh = download_history(symbol, interval, period=period, provider=provider)
+            else:
+                return slice_period(stored, interval, period, now_naive)
+        except UpstreamUnavailable:
+            # 上游降級：先回本地庫現有的 K 線，不更新同步時間，下次再補
+            return slice_period(stored, interval, period, now_naive)
+
+        meta['synced_at'] = now.timestamp()
+        merged = stored
+        if not fresh.empty:
+            merged = pd.concat([stored, fresh], ignore_index=True) if not stored.empty else fresh
+            merged = merged.drop_duplicates(subset='date', keep='last').sort_values('date').reset_index(drop=True)
+        self.save(symbol, interval, merged if not fresh.empty else None, meta)
+        return slice_period(merged, interval, period, now_naive)
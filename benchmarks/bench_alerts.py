@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alerts import AlertIndex, BELOW, ABOVE
+
+# ==========================================
+# AlertIndex 基準測試：10 萬個觸發價 x 隨機漫步報價流
+#   python benchmarks/bench_alerts.py --alerts 100000 --tickers 1000 --ticks 200
+# ==========================================
+def build_index(n_alerts, n_tickers, rng):
+    base = rng.uniform(20, 1000, n_tickers)
+    tickers = rng.integers(0, n_tickers, n_alerts)
+    levels = base[tickers] * rng.uniform(0.9, 1.1, n_alerts)
+    directions = np.where(rng.random(n_alerts) < 0.5, BELOW, ABOVE)
+    one_shot = rng.random(n_alerts) < 0.5
+
+    index = AlertIndex()
+    t0 = time.perf_counter()
+    for t, lv, d, o in zip(tickers.tolist(), levels.tolist(), directions.tolist(), one_shot.tolist()):
+        index.add(t, lv, d, one_shot=o, hysteresis=lv * 0.002)
+    return index, base, time.perf_counter() - t0
+
+def run(n_alerts, n_tickers, n_ticks, seed=0):
+    rng = np.random.default_rng(seed)
+    index, base, build_sec = build_index(n_alerts, n_tickers, rng)
+    # 每檔 n_ticks 筆報價，每筆 ±0.3% 隨機漫步
+    paths = base[:, None] * np.cumprod(1 + rng.normal(0, 0.003, (n_tickers, n_ticks)), axis=1)
+
+    # 第一筆報價會把已滿足條件的觸發價併入並排序，不計入穩態
+    index.update_many({t: float(paths[t, 0]) for t in range(n_tickers)})
+    events = 0
+    t0 = time.perf_counter()
+    for k in range(1, n_ticks):
+        events += len(index.update_many({t: float(paths[t, k]) for t in range(n_tickers)}))
+    elapsed = time.perf_counter() - t0
+    ticks = n_tickers * (n_ticks - 1)
+    return {
+        "alerts": n_alerts, "tickers": n_tickers, "ticks": ticks, "events": events,
+        "build_sec": round(build_sec, 4), "eval_sec": round(elapsed, 4),
+        "ticks_per_sec": round(ticks / elapsed), "us_per_tick": round(elapsed / ticks * 1e6, 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AlertIndex benchmark")
+    parser.add_argument("--alerts", type=int, default=100_000)
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    res = run(args.alerts, args.tickers, args.ticks, args.seed)
+    for k, v in res.items(): print(f"{k:>14}: {v}")
+
+if __name__ == "__main__":
+    main()
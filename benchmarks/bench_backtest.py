@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest import run_backtest
+
+# ==========================================
+# 回測基準測試：一年份 1 分K (約 245 天 x 270 根) 跑一次特務規則
+#   python benchmarks/bench_backtest.py --bars 66000 --profit 1.5 --loss 1
+# ==========================================
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 600 * np.cumprod(1 + rng.normal(0, 0.0015, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, n)) * close
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-02 09:00', periods=n, freq='min', tz='Asia/Taipei'),
+        'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+        'close': close, 'volume': rng.integers(1, 500, n).astype(float),
+    })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bot backtest benchmark")
+    parser.add_argument("--bars", type=int, default=66_000)
+    parser.add_argument("--profit", type=float, default=1.5)
+    parser.add_argument("--loss", type=float, default=1.0)
+    parser.add_argument("--trail", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    df = make_bars(args.bars)
+    # 觸發價取中位數，讓進出場次數夠多
+    trigger = float(df['close'].median())
+    best = float('inf')
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        trades, curve, stats = run_backtest(df, trigger, args.profit, args.loss, args.trail)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{'bars':>14}: {args.bars}")
+    print(f"{'trades':>14}: {stats['trades']}")
+    print(f"{'net_pl':>14}: {stats['net_pl']:,.0f}")
+    print(f"{'best_sec':>14}: {best:.4f}")
+    print(f"{'bars_per_sec':>14}: {args.bars / best:,.0f}")
+
+if __name__ == "__main__":
+    main()
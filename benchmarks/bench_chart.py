@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from charts import build_price_figure, MAX_POINTS, WEBGL_THRESHOLD
+
+# ==========================================
+# K 線圖基準測試：不同資料筆數下，原始蠟燭圖與縮減後圖表的 JSON 大小與序列化時間
+#   python benchmarks/bench_chart.py --rows 500 5000 50000 200000
+# ==========================================
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 600 * np.cumprod(1 + rng.normal(0, 0.001, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.002, n)) * close
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-02 09:00', periods=n, freq='min', tz='Asia/Taipei'),
+        'open': open_, 'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+        'close': close, 'volume': rng.integers(1, 500, n).astype(float),
+    })
+
+def measure(df, max_points, webgl_threshold, repeat):
+    best_build, best_json, size = float('inf'), float('inf'), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fig = build_price_figure(df, "bench", trigger_price=float(df['close'].iloc[-1]),
+                                 max_points=max_points, webgl_threshold=webgl_threshold)
+        t1 = time.perf_counter()
+        size = len(fig.to_json())
+        t2 = time.perf_counter()
+        best_build, best_json = min(best_build, t1 - t0), min(best_json, t2 - t1)
+    return {"trace": fig.data[0].type, "points": len(fig.data[0].x), "json_kb": round(size / 1024, 1),
+            "build_ms": round(best_build * 1000, 1), "json_ms": round(best_json * 1000, 1)}
+
+def run(rows, max_points=MAX_POINTS, repeat=3):
+    results = []
+    for n in rows:
+        df = make_bars(n)
+        # 不縮減、不切 WebGL 等於原本的畫法；太大的筆數原始畫法要跑很久，略過
+        raw = measure(df, n, n, repeat) if n <= 50_000 else None
+        results.append({"rows": n, "raw": raw, "reduced": measure(df, max_points, WEBGL_THRESHOLD, repeat)})
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chart downsampling benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[500, 2000, 10_000, 50_000, 200_000])
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    print(f"{'rows':>8} {'mode':>8} {'trace':>12} {'points':>7} {'json_kb':>9} {'build_ms':>9} {'json_ms':>8}")
+    for r in run(args.rows, args.max_points, args.repeat):
+        for mode in ("raw", "reduced"):
+            m = r[mode]
+            if m is None: continue
+            print(f"{r['rows']:>8} {mode:>8} {m['trace']:>12} {m['points']:>7} {m['json_kb']:>9} {m['build_ms']:>9} {m['json_ms']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+OWN_DATA_DIR = "STOCK_DATA_DIR" not in os.environ
+DATA_DIR = os.environ.setdefault("STOCK_DATA_DIR", tempfile.mkdtemp(prefix="stock-replay-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import ohlcv
+from bar_store import BarStore, normalize_history
+from providers import ReplayProvider, set_provider, clock
+from market_data import download_quotes
+from resample import fetch_kline
+from shared_cache import SharedCache
+from scheduler import Scheduler, set_scheduler
+from alerts import AlertIndex, BELOW, ABOVE
+from intraday_stats import IntradayBook, prev_close
+
+# ==========================================
+# 重播壓測：把 fixtures 產生的一天 1 分K 當成錄好的行情，以 1x~1000x 重播整個盤中
+#   每輪 = 報價快取 (虛擬時鐘) + 批次報價 + 觸發價比對 + 當沖 VWAP 更新，量每輪延遲與每秒輪數
+#   python benchmarks/bench_replay.py --symbols 200 --alerts 20000 --speed 1000
+# ==========================================
+def record(store, n_symbols, days=3):
+    symbols = [f"{1000 + i}.TW" for i in range(n_symbols)]
+    for sym in symbols:
+        store.save(sym, '1m', normalize_history(ohlcv(sym, '1m', 270 * days)), {})
+        store.save(sym, '1d', normalize_history(ohlcv(sym, '1d', 250)), {})
+    return symbols
+
+def run(n_symbols, n_alerts, speed, cache_ttl, intraday, seed=0):
+    store = BarStore()
+    symbols = record(store, n_symbols)
+    provider = ReplayProvider(speed=speed)
+    set_provider(provider)
+    set_scheduler(Scheduler("yahoo", rate=0))   # 1000x 重播的請求頻率遠超實盤，不套上游限速
+    rng = np.random.default_rng(seed)
+    opens = {s: float(store.load(s, '1m')['open'].iloc[-270]) for s in symbols}
+    index = AlertIndex()
+    for s, lv, d in zip(rng.choice(symbols, n_alerts), rng.uniform(0.97, 1.03, n_alerts), rng.random(n_alerts) < 0.5):
+        index.add(s, opens[s] * lv, BELOW if d else ABOVE)
+    cache = SharedCache(ttl=cache_ttl, max_entries=len(symbols) * 2, name="replay_quote", clock=clock)
+    book = IntradayBook()
+
+    cycles, events, laps = 0, 0, []
+    t_start = time.perf_counter()
+    while not provider.finished():
+        t0 = time.perf_counter()
+        quotes = cache.get_many(symbols, download_quotes)
+        events += len(index.update_many({s: q['price'] for s, q in quotes.items() if q}))
+        for s in symbols[:intraday]:
+            bars = fetch_kline(store, s, '1m', '1d')
+            if not bars.empty: book.update(s, bars, prev_close(fetch_kline(store, s, '1d', '1mo'), bars['date'].iloc[-1]))
+        laps.append(time.perf_counter() - t0)
+        cycles += 1
+    wall = time.perf_counter() - t_start
+    laps = np.array(laps) * 1000
+    return {
+        "day": str(provider.day), "speed": speed, "symbols": n_symbols, "alerts": n_alerts, "cycles": cycles, "events": events,
+        "wall_sec": round(wall, 2), "cycles_per_sec": round(cycles / wall, 1), "virtual_sec_per_cycle": round(270 * 60 / max(cycles, 1), 2),
+        "p50_ms": round(float(np.percentile(laps, 50)), 2), "p95_ms": round(float(np.percentile(laps, 95)), 2), "max_ms": round(float(laps.max()), 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay stress benchmark")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--alerts", type=int, default=10_000)
+    parser.add_argument("--speed", type=float, default=1000)
+    parser.add_argument("--cache-ttl", type=float, default=60, help="報價快取新鮮期 (虛擬秒)")
+    parser.add_argument("--intraday", type=int, default=5, help="每輪更新 VWAP 的檔數")
+    args = parser.parse_args(argv)
+    try:
+        res = run(args.symbols, args.alerts, args.speed, args.cache_ttl, args.intraday)
+        for k, v in res.items(): print(f"{k:>22}: {v}")
+    finally:
+        if OWN_DATA_DIR: shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scheduler import Scheduler, CircuitBreaker, UpstreamUnavailable, BOT, QUOTE, CHART, PROFILE, PRIORITY_LABEL, non_empty
+
+# ==========================================
+# 上游排程壓測：模擬上游限流 (每次請求固定延遲)，圖表 / 新聞大量排隊時量各優先級的排隊延遲，
+# 再模擬上游整個掛掉，確認斷路器開路後請求立即降級、不再打上游
+#   python benchmarks/bench_scheduler.py --rate 10 --latency 0.3 --load 60
+# ==========================================
+def slow_upstream(latency, calls):
+    def call(kind):
+        calls.append(kind)
+        time.sleep(latency)
+        return kind
+    return call
+
+def load_test(rate, latency, load, bots, concurrency):
+    calls = []
+    upstream = slow_upstream(latency, calls)
+    sched = Scheduler("bench", rate=rate, burst=rate, max_concurrency=concurrency,
+                      max_wait={BOT: 60.0, QUOTE: 60.0, CHART: 60.0, PROFILE: 60.0})
+    waits = {p: [] for p in PRIORITY_LABEL}
+
+    def client(priority):
+        t0 = time.perf_counter()
+        sched.call(priority, upstream, PRIORITY_LABEL[priority])
+        waits[priority].append(time.perf_counter() - t0 - latency)
+
+    # 先塞滿低優先 (月K、新聞)，機器人檢查稍後才到
+    threads = [threading.Thread(target=client, args=(p,)) for p in (CHART, PROFILE) for _ in range(load)]
+    for t in threads: t.start()
+    time.sleep(latency)
+    bot_threads = [threading.Thread(target=client, args=(p,)) for p in (BOT, QUOTE) for _ in range(bots)]
+    for t in bot_threads: t.start()
+    for t in threads + bot_threads: t.join()
+    return {PRIORITY_LABEL[p]: (len(w), np.percentile(w, 50) * 1000, np.percentile(w, 95) * 1000) for p, w in waits.items() if w}
+
+def outage_test(threshold, cooldown, n):
+    calls = []
+    sched = Scheduler("bench", rate=0, breaker=CircuitBreaker(threshold, cooldown))
+    states = {}
+    t0 = time.perf_counter()
+    for _ in range(n):
+        try:
+            sched.call(QUOTE, lambda: calls.append(1) or np.empty(0), ok=lambda r: r.size > 0)
+            state = "error"
+        except UpstreamUnavailable as e:
+            state = e.state
+        states[state] = states.get(state, 0) + 1
+    return {"requests": n, "upstream_calls": len(calls), "states": states, "ms": (time.perf_counter() - t0) * 1000}
+
+def recovery_test(cooldown=0.05):
+    # 開路 -> 冷卻 -> 試探請求回空表 (無從判斷) -> 下一個請求仍要能試探，成功後關路
+    sched = Scheduler("bench", rate=0, breaker=CircuitBreaker(1, cooldown))
+    try: sched.call(QUOTE, lambda: None, ok=lambda r: False)
+    except UpstreamUnavailable: pass
+    time.sleep(cooldown * 1.5)
+    steps = []
+    for rows in (0, 3):
+        try:
+            sched.call(QUOTE, lambda: np.empty(rows), ok=lambda r: True if r.size else None)
+            steps.append(sched.breaker.state)
+        except UpstreamUnavailable as e:
+            steps.append(e.state)
+    return steps
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upstream scheduler priority / circuit breaker benchmark")
+    parser.add_argument("--rate", type=float, default=10, help="上游每秒請求數")
+    parser.add_argument("--latency", type=float, default=0.3, help="每次上游請求耗時 (秒)")
+    parser.add_argument("--load", type=int, default=30, help="圖表與新聞各排幾個請求")
+    parser.add_argument("--bots", type=int, default=5, help="機器人與報價各幾個請求")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    print(f"{'priority':<10} {'n':>4} {'wait_p50_ms':>12} {'wait_p95_ms':>12}")
+    for label, (n, p50, p95) in load_test(args.rate, args.latency, args.load, args.bots, args.concurrency).items():
+        print(f"{label:<10} {n:>4} {p50:>12.1f} {p95:>12.1f}")
+    res = outage_test(threshold=5, cooldown=30, n=1000)
+    print(f"outage: {res['requests']} 次請求只打上游 {res['upstream_calls']} 次，{res['states']}，{res['ms']:.1f} ms")
+    steps = recovery_test()
+    print(f"recovery: 空表試探後 {steps[0]}，下一個有資料的請求後 {steps[1]}")
+    return 0 if steps[-1] == "closed" else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
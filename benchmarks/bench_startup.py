@@ -0,0 +1,108 @@
+import os
+import sys
+import ast
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 啟動預算：每個 case 開一個全新行程量
+#   import_ms        執行 app 檔頂層 import (含 streamlit / pandas) 的時間
+#   first_paint_ms   冷行程第一次整頁執行 (AppTest，行情走 fixtures 離線資料)
+#   new_session_ms   同一行程再開一個新 session 的第一次執行
+#   bot_page_ms      切到機器人頁
+#   heavy_at_import  import 階段就被載入的重型套件 (應為空：pandas / numpy、圖表、回測、新聞、掃描等都在用到的函式裡才載入)
+#   python benchmarks/bench_startup.py --repeat 3 --out startup.json   # 任一中位數超出預算回傳 1
+# ==========================================
+APPS = {"app.py": "🤖 股市特務 X", "grid_bot.py": "⚡ 當沖戰情室"}
+HEAVY_MODULES = ("yfinance", "requests", "feedparser", "curl_cffi", "bs4", "pandas", "numpy", "charts", "backtest", "optimizer",
+                 "bot_store", "line_notify", "news_feed", "indicators", "scanner")
+BUDGET_MS = {"import_ms": 1500, "first_paint_ms": 2000, "new_session_ms": 800, "bot_page_ms": 1000}
+
+def top_imports(script):
+    with open(script, encoding="utf-8") as f: tree = ast.parse(f.read(), script)
+    return ast.Module(body=[n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))], type_ignores=[])
+
+def child(script):
+    # 在全新行程內執行，結果以一行 JSON 印到 stdout
+    path = os.path.join(ROOT, script)
+    sys.path.insert(0, ROOT)
+    t0 = time.perf_counter()
+    exec(compile(top_imports(path), path, "exec"), {"__name__": "startup_probe"})
+    import_ms = (time.perf_counter() - t0) * 1000
+    heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from fixtures import OfflineMarket
+    from streamlit.testing.v1 import AppTest
+    res = {"import_ms": import_ms, "heavy_at_import": heavy}
+    with OfflineMarket():
+        at = AppTest.from_file(path, default_timeout=600)
+        at.session_state.login_status = True
+        t0 = time.perf_counter()
+        at.run()
+        res["first_paint_ms"] = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        at.sidebar.radio[0].set_value(APPS[script]).run()
+        res["bot_page_ms"] = (time.perf_counter() - t0) * 1000
+        fresh = AppTest.from_file(path, default_timeout=600)
+        t0 = time.perf_counter()
+        fresh.run()
+        res["new_session_ms"] = (time.perf_counter() - t0) * 1000
+        res["exceptions"] = [e.message for e in at.exception] + [e.message for e in fresh.exception]
+    print(json.dumps(res, ensure_ascii=False))
+
+def run_child(script):
+    env = dict(os.environ, STOCK_DATA_DIR=tempfile.mkdtemp(prefix="stock-startup-"))
+    try:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", script], cwd=ROOT, env=env,
+                             capture_output=True, text=True, timeout=900)
+    finally:
+        shutil.rmtree(env["STOCK_DATA_DIR"], ignore_errors=True)
+    lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+    if out.returncode or not lines: raise RuntimeError(f"{script}: {out.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup budget benchmark (import + first paint)")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--out", default=None, help="JSON 輸出路徑 (預設印到 stdout)")
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args.child)
+        return 0
+
+    results, over = [], []
+    for script in args.only:
+        runs = [run_child(script) for _ in range(max(1, args.repeat))]
+        for metric, budget in BUDGET_MS.items():
+            samples = [r[metric] for r in runs]
+            row = {"name": f"startup.{metric}", "params": {"script": script}, "samples_ms": [round(s, 3) for s in samples],
+                   "best_ms": round(min(samples), 3), "median_ms": round(statistics.median(samples), 3), "budget_ms": budget}
+            results.append(row)
+            if row["median_ms"] > budget: over.append(row)
+            print(f"{script:<12} {metric:<15} median {row['median_ms']:>9.1f} ms  budget {budget:>6} ms{'  <-- over budget' if row['median_ms'] > budget else ''}", file=sys.stderr)
+        heavy = sorted({m for r in runs for m in r["heavy_at_import"]})
+        errors = sorted({e for r in runs for e in r["exceptions"]})
+        results.append({"name": "startup.heavy_at_import", "params": {"script": script}, "modules": heavy, "exceptions": errors})
+        if heavy or errors: over.append(results[-1])
+
+    report = {"meta": {"timestamp": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+                       "cpus": os.cpu_count(), "repeat": args.repeat}, "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(text)
+    else: print(text)
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+# 本地 K 線庫 / 新聞庫 / 機器人庫一律寫到暫存目錄 (必須在 import 專案模組之前設定)
+OWN_DATA_DIR = "STOCK_DATA_DIR" not in os.environ
+DATA_DIR = os.environ.setdefault("STOCK_DATA_DIR", tempfile.mkdtemp(prefix="stock-bench-"))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import OfflineMarket, ohlcv
+from bar_store import BarStore, normalize_history
+from indicators import IndicatorState, drift, DRIFT_TOL
+from resample import fetch_kline
+from charts import build_price_figure
+from market_data import download_quotes
+from scanner import load_universe, download_universe, scan_frame
+from metrics import REGISTRY
+from scheduler import Scheduler, set_scheduler
+
+# ==========================================
+# 離線基準測試組：yfinance / requests / feedparser 全部吃 fixtures.py 的錄製資料，不連網、結果可重現
+#   python benchmarks/bench_suite.py --out bench.json
+#   python benchmarks/bench_suite.py --only scan kline --compare bench.json   # 中位數慢超過門檻就回傳 1
+#   每項輸出 {name, params, samples_ms, first_ms, best_ms, median_ms}
+# ==========================================
+SCAN_SIZES = (40, 400, 2000)
+KLINE_CASES = (("1d", 250), ("1d", 1250), ("1m", 2700), ("1m", 27000), ("5m", 27000))
+PORTFOLIO_SIZES = (10, 100, 1000)
+INDICATOR_ROWS = (250, 1250)
+APPS = {"app": ("app.py", "🤖 股市特務 X"), "grid_bot": ("grid_bot.py", "⚡ 當沖戰情室")}
+SCAN_STRATEGY = "飆股 (漲幅排行)"
+
+def measure(name, func, repeat, **params):
+    # 第一次單獨記 (含冷快取)，其餘取最佳與中位數
+    samples = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    rest = samples[1:] or samples
+    return {"name": name, "params": params, "samples_ms": [round(s, 3) for s in samples], "first_ms": round(samples[0], 3),
+            "best_ms": round(min(rest), 3), "median_ms": round(statistics.median(rest), 3)}
+
+def bench_scan(market, repeat):
+    # DataEngine.scan_market = 全市場清單 (一天抓一次) + 批次下載 + 篩選排序，這裡分開計時
+    results = []
+    for n in SCAN_SIZES:
+        market.set_universe(n)
+        universe = load_universe()
+        symbols = list(universe)
+        results.append(measure("scan.load_universe", load_universe, repeat, symbols=n))
+        results.append(measure("scan.download_and_rank", lambda: scan_frame(download_universe(symbols), universe, 0, 10_000, SCAN_STRATEGY),
+                               repeat, symbols=n))
+    return results
+
+def bench_kline(market, repeat):
+    # fetch_kline (本地庫 + 增量同步 + 重取樣) 與 K 線圖 (含 JSON 序列化)；冷 = 空的本地庫
+    results = []
+    for interval, rows in KLINE_CASES:
+        symbol = f"K{rows}.TW"
+        base_iv = "1m" if interval.endswith("m") else "1d"
+        market.set_rows(symbol, base_iv, rows)
+        store = BarStore(os.path.join(DATA_DIR, "bench-bars", f"{interval}-{rows}"))
+        shutil.rmtree(store.root, ignore_errors=True)
+        df = {}
+        def load():
+            df['k'] = fetch_kline(store, symbol, interval, "max")
+        results.append(measure("kline.fetch", load, repeat, interval=interval, rows=rows))
+        results.append(measure("kline.plot", lambda: build_price_figure(df['k'], "bench", float(df['k']['close'].iloc[-1])).to_json(),
+                               repeat, interval=interval, rows=rows, bars=len(df['k'])))
+    return results
+
+def bench_indicators(market, repeat):
+    # 指標：整段計算 vs 區間往後滑一根的增量更新 (fetch_kline 的 period 切片每來一根新 K 就滑一次)
+    results = []
+    for rows in INDICATOR_ROWS:
+        df = normalize_history(ohlcv("IND.TW", "1d", rows + max(1, repeat) + 1))
+        results.append(measure("indicators.full", lambda: IndicatorState().update(df.iloc[:rows]), repeat, rows=rows))
+        state = IndicatorState()
+        state.update(df.iloc[:rows])
+        step = iter(range(1, max(1, repeat) + 1))
+        def slide():
+            k = next(step)
+            state.update(df.iloc[k:k + rows])
+        results.append(measure("indicators.slide", slide, repeat, rows=rows))
+        if state.rebuilds: raise RuntimeError(f"indicators.slide rows={rows}: 區間滑動卻整段重算")
+        k = next(step, None) or max(1, repeat) + 1
+        err = drift(state.update(df.iloc[k:k + rows]), IndicatorState().update(df.iloc[k:k + rows]))
+        if err > DRIFT_TOL: raise RuntimeError(f"indicators.slide rows={rows}: 暖機後與整段重算差 {err:.2e}")
+    return results
+
+def _clear_streamlit_caches():
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+def run_app(script, repeat, page=None, portfolio=None):
+    # 回傳 [第一次執行, 之後每次 rerun] 的毫秒數；第一次前清掉 Streamlit 快取
+    from streamlit.testing.v1 import AppTest
+    _clear_streamlit_caches()
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=600)
+    if portfolio is not None: at.session_state.portfolio = portfolio
+    samples = []
+    for k in range(max(2, repeat)):
+        t0 = time.perf_counter()
+        if k == 0 and page is not None:
+            at.run()
+            t0 = time.perf_counter()
+            at.sidebar.radio[0].set_value(page).run()
+        else: at.run()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if at.exception: raise RuntimeError(f"{script}: {at.exception[0].message}")
+    return samples
+
+def _app_result(name, samples, **params):
+    rest = samples[1:]
+    return {"name": name, "params": params, "samples_ms": [round(s, 3) for s in samples], "first_ms": round(samples[0], 3),
+            "best_ms": round(min(rest), 3), "median_ms": round(statistics.median(rest), 3)}
+
+def bench_portfolio(market, repeat):
+    # 庫存估值：報價批次下載 + 損益表；透過 AppTest 跑整頁 (含每檔的新聞 feed)
+    market.set_universe(max(PORTFOLIO_SIZES))
+    results = []
+    for n in PORTFOLIO_SIZES:
+        holdings = [{"code": code, "name": name, "cost": 100.0, "qty": 1000} for code, name, _, _ in market.universe[:n]]
+        symbols = [f"{h['code']}.TW" for h in holdings]
+        results.append(measure("portfolio.quotes", lambda: download_quotes(symbols), repeat, holdings=n))
+        results.append(_app_result("portfolio.dashboard", run_app("app.py", repeat, portfolio=holdings), holdings=n))
+    return results
+
+def bench_apptest(market, repeat):
+    market.set_universe(400)
+    results = []
+    for key, (script, bot_page) in APPS.items():
+        results.append(_app_result(f"apptest.{key}.dashboard", run_app(script, repeat)))
+        results.append(_app_result(f"apptest.{key}.bot", run_app(script, repeat, page=bot_page)))
+    return results
+
+BENCHES = {"scan": bench_scan, "kline": bench_kline, "indicators": bench_indicators, "portfolio": bench_portfolio, "apptest": bench_apptest}
+
+def git_commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception: return ""
+
+def compare(results, baseline, threshold):
+    # 依 (name, params) 對齊，比較中位數；回傳超過門檻的項目
+    base = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"{'name':<26} {'params':<34} {'base_ms':>10} {'now_ms':>10} {'ratio':>7}")
+    for r in results:
+        b = base.get((r['name'], json.dumps(r['params'], sort_keys=True)))
+        if b is None or not b['median_ms']: continue
+        ratio = r['median_ms'] / b['median_ms']
+        flag = "  <-- regression" if ratio > threshold else ""
+        print(f"{r['name']:<26} {json.dumps(r['params'], ensure_ascii=False):<34} {b['median_ms']:>10.1f} {r['median_ms']:>10.1f} {ratio:>7.2f}{flag}")
+        if ratio > threshold: regressions.append(r)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with recorded market-data fixtures")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHES), default=list(BENCHES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None, help="JSON 輸出路徑 (預設印到 stdout)")
+    parser.add_argument("--compare", default=None, help="拿來比較的舊 JSON")
+    parser.add_argument("--threshold", type=float, default=1.25, help="中位數變慢超過此倍數算退步")
+    args = parser.parse_args(argv)
+
+    results = []
+    started = time.time()
+    set_scheduler(Scheduler("yahoo", rate=0))   # 量程式本身，不量上游限速 (連線上限照舊)
+    with OfflineMarket() as market:
+        for name in args.only:
+            results += BENCHES[name](market, args.repeat)
+            print(f"[{name}] done", file=sys.stderr)
+        calls = dict(market.calls)
+    report = {
+        "meta": {"timestamp": started, "commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "repeat": args.repeat, "upstream_calls": calls},
+        "results": results,
+        "ops": REGISTRY.latency_table(),   # 同一行程內各 DataEngine / 畫面區塊的延遲分佈
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(text)
+    else: print(text)
+    if OWN_DATA_DIR: shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+        if compare(results, baseline, args.threshold): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from optimizer import run_sweep
+from bench_backtest import make_bars
+
+# ==========================================
+# 參數最佳化基準測試：多檔標的 x 數千組參數，回報每秒組合數以估算需要的機器規模
+#   python benchmarks/bench_sweep.py --tickers 20 --bars 250 --workers 8
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bot parameter sweep benchmark")
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--triggers", type=int, default=10)
+    parser.add_argument("--profits", type=int, default=10)
+    parser.add_argument("--losses", type=int, default=10)
+    args = parser.parse_args(argv)
+    frames = {f"T{i:04d}": make_bars(args.bars, seed=i) for i in range(args.tickers)}
+    table, info = run_sweep(frames, np.linspace(0, 5, args.triggers), np.linspace(0.5, 10, args.profits),
+                            np.linspace(0.5, 10, args.losses), max_workers=args.workers)
+    for k, v in info.items(): print(f"{k:>14}: {v:,.2f}" if isinstance(v, float) else f"{k:>14}: {v}")
+    print(table.head(5).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
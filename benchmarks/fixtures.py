@@ -0,0 +1,190 @@
+import zlib
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from market_data import TW_TZ, SESSION_OPEN
+
+# ==========================================
+# 離線行情：以固定亂數種子產生的「錄好」資料取代 yfinance / requests (feedparser 吃的是這裡回的 RSS)
+#   同一代號每次產生的 OHLCV、報價、新聞都一樣，基準測試結果才可重現
+#   with OfflineMarket(universe_size=400) as market: ...   # 區塊內任何未涵蓋的連線一律丟 ConnectionError
+# ==========================================
+SESSION_MINUTES = 270
+PERIOD_DAYS = {'d': 1, 'wk': 5, 'mo': 21, 'y': 250}
+MAX_DAYS = 1250
+
+def _seed(*parts):
+    return zlib.crc32("|".join(map(str, parts)).encode())
+
+def _period_days(period):
+    if not period or period == 'max': return MAX_DAYS
+    if period == 'ytd': return 250
+    num = ''.join(ch for ch in period if ch.isdigit()) or '1'
+    return int(num) * PERIOD_DAYS.get(period[len(num):], 1)
+
+def trading_days(n, now=None):
+    # 最近 n 個平日 (含今天；今天還沒開盤就不算)
+    now = now or datetime.now(TW_TZ)
+    end = now.date() if now.weekday() < 5 and now.time() >= SESSION_OPEN else now.date() - timedelta(days=1)
+    return pd.bdate_range(end=end, periods=n)
+
+def session_minutes(n, now=None):
+    # 最近 n 根 1 分K 的時間 (每天 09:00 起 270 根，今天只到現在)
+    now = now or datetime.now(TW_TZ)
+    days = trading_days(n // SESSION_MINUTES + 2, now)
+    offsets = pd.to_timedelta(np.arange(SESSION_MINUTES) + SESSION_OPEN.hour * 60, unit='min')
+    stamps = (days.values[:, None] + offsets.values[None, :]).ravel()
+    stamps = stamps[stamps <= np.datetime64(now.replace(tzinfo=None))]
+    return pd.DatetimeIndex(stamps[-n:]).tz_localize(TW_TZ)
+
+def ohlcv(symbol, interval, n, now=None):
+    # Yahoo 格式：tz-aware index (Date / Datetime) + Open/High/Low/Close/Volume
+    rng = np.random.default_rng(_seed(symbol, interval))
+    base = 20 + (_seed(symbol) % 98000) / 100
+    if interval == '1d':
+        index = trading_days(n, now).tz_localize(TW_TZ).rename('Date')
+        vol = 0.015
+    else:
+        index = session_minutes(n, now).rename('Datetime')
+        vol = 0.0015
+    n = len(index)
+    close = base * np.cumprod(1 + rng.normal(0, vol, n))
+    open_ = np.concatenate([[base], close[:-1]])
+    spread = np.abs(rng.normal(0, vol / 2, n)) * close
+    return pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close) + spread, 'Low': np.minimum(open_, close) - spread,
+                         'Close': close, 'Volume': rng.integers(1, 5000, n).astype(float) * 1000}, index=index)
+
+def isin_html(rows):
+    # 證交所 ISIN 公告頁的表格欄位：代號及名稱、ISIN、上市日、市場別、產業別、CFICode、備註
+    body = "".join(f"<tr><td>{code}　{name}</td><td>TW000{code}000</td><td>2000/01/01</td><td>{market}</td>"
+                   f"<td>{industry}</td><td>ESVUFR</td><td></td></tr>" for code, name, market, industry in rows)
+    head = "<tr><td>有價證券代號及名稱</td><td>國際證券辨識號碼(ISIN Code)</td><td>上市日</td><td>市場別</td><td>產業別</td><td>CFICode</td><td>備註</td></tr>"
+    return f"<html><body><table>{head}{body}</table></body></html>"
+
+def rss(query, n_items=20, now=None):
+    now = now or datetime.now(TW_TZ)
+    rng = np.random.default_rng(_seed('rss', query))
+    items = "".join(
+        f"<item><title>{query} 新聞 {k} - 測試社</title><link>https://example.com/{_seed(query, k)}</link>"
+        f"<guid>{_seed(query, k)}</guid><pubDate>{format_datetime(now - timedelta(minutes=int(m)))}</pubDate>"
+        f"<source url='https://example.com'>測試社</source></item>"
+        for k, m in enumerate(np.sort(rng.integers(0, 600, n_items))))
+    return f"<?xml version='1.0' encoding='UTF-8'?><rss version='2.0'><channel><title>{query}</title>{items}</channel></rss>"
+
+class FakeResponse:
+    def __init__(self, content=b"", status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.encoding = 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return {}
+
+class FakeTicker:
+    def __init__(self, market, symbol):
+        self.market = market
+        self.symbol = symbol
+
+    def history(self, period=None, interval='1d', start=None, **kwargs):
+        df = self.market.history(self.symbol, interval, period)
+        if start is None: return df
+        start = pd.Timestamp(start)
+        if start.tz is None: start = start.tz_localize(TW_TZ)   # BarStore 存的是無時區台北時間
+        return df[df.index >= start]
+
+    @property
+    def info(self):
+        rng = np.random.default_rng(_seed('info', self.symbol))
+        return {"trailingPE": float(rng.uniform(8, 40)), "trailingEps": float(rng.uniform(0.5, 30)),
+                "marketCap": int(rng.uniform(1e9, 1e13)), "dividendYield": float(rng.uniform(0, 0.06)), "sector": "Technology"}
+
+class OfflineMarket:
+    def __init__(self, universe_size=400, rss_items=20):
+        self.rows = {}          # (symbol, interval) -> 指定筆數
+        self.calls = {}         # 量測用：各假上游被叫了幾次
+        self._frames = {}
+        self._patched = []
+        self.rss_items = rss_items
+        self.set_universe(universe_size)
+
+    def set_universe(self, n):
+        # 前 1/4 上櫃、其餘上市；代號 1000 起跳，避開真實主檔不影響結果
+        self.universe = [(str(1000 + i), f"測試{i}", "上櫃" if i % 4 == 3 else "上市", "測試業") for i in range(n)]
+
+    def set_rows(self, symbol, interval, n):
+        self.rows[(symbol, interval)] = n
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def history(self, symbol, interval, period):
+        days = _period_days(period)
+        n = self.rows.get((symbol, interval)) or (days if interval == '1d' else days * SESSION_MINUTES)
+        key = (symbol, interval, n)
+        if key not in self._frames: self._frames[key] = ohlcv(symbol, interval, n)
+        return self._frames[key]
+
+    # === 取代的上游 ===
+    def download(self, tickers, period='1mo', interval='1d', **kwargs):
+        self._count('yf.download')
+        symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = [self.history(s, interval, period) for s in symbols]
+        if not frames: return pd.DataFrame()
+        return pd.concat(frames, axis=1, keys=symbols, names=['Ticker', 'Price'])
+
+    def ticker(self, symbol, *args, **kwargs):
+        self._count('yf.Ticker')
+        return FakeTicker(self, symbol)
+
+    def get(self, url, *args, **kwargs):
+        self._count('requests.get')
+        if 'isin.twse.com.tw' in url:
+            market = "上市" if 'strMode=2' in url else "上櫃"
+            resp = FakeResponse(isin_html([r for r in self.universe if r[2] == market]).encode('cp950'))
+            resp.encoding = 'cp950'
+            return resp
+        raise requests.ConnectionError(f"offline: {url}")
+
+    def session_get(self, session, url, *args, **kwargs):
+        self._count('session.get')
+        if 'news.google.com' in url:
+            query = requests.utils.unquote(url.split('q=')[1].split('&')[0])
+            return FakeResponse(rss(query, self.rss_items).encode(), headers={'ETag': f'"{_seed(query)}"'})
+        raise requests.ConnectionError(f"offline: {url}")
+
+    def session_post(self, session, url, *args, **kwargs):
+        self._count('session.post')
+        return FakeResponse(b"{}")
+
+    def _patch(self, obj, name, value):
+        self._patched.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def install(self):
+        market = self
+        self._patch(yf, 'download', self.download)
+        self._patch(yf, 'Ticker', self.ticker)
+        self._patch(requests, 'get', self.get)
+        self._patch(requests.Session, 'get', lambda s, url, *a, **k: market.session_get(s, url, *a, **k))
+        self._patch(requests.Session, 'post', lambda s, url, *a, **k: market.session_post(s, url, *a, **k))
+        return self
+
+    def uninstall(self):
+        while self._patched:
+            obj, name, value = self._patched.pop()
+            setattr(obj, name, value)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        return False
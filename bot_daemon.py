@@ -0,0 +1,168 @@
+import time
+import logging
+import argparse
+from market_data import SESSION_OPEN, SESSION_CLOSE, to_symbol, download_quotes
+from providers import get_provider
+from scheduler import BOT, UpstreamUnavailable
+from bot_store import BotStore, DB_PATH
+from line_notify import LineDispatcher
+from alerts import AlertIndex, BELOW
+from positions import PositionBook, bracket_prices, EXIT_LABEL, MANUAL
+from metrics import timed, start_metrics_server
+
+# ==========================================
+# 股市特務 X 背景監控程式 (不需要開著瀏覽器)
+#   python bot_daemon.py                 # 盤中每 30 秒檢查一次
+#   python bot_daemon.py --once --force  # 立即跑一輪 (不看開盤時間)
+#   python bot_daemon.py --metrics-port 9465  # 另外匯出 Prometheus 量測
+#   STOCK_PROVIDER=replay STOCK_REPLAY_SPEED=600 python bot_daemon.py --interval 1   # 用重播行情壓測觸發
+# ==========================================
+log = logging.getLogger("bot_daemon")
+
+def is_market_open(now=None):
+    now = now or get_provider().now()   # STOCK_PROVIDER=replay 時跟著虛擬時鐘
+    if now.weekday() >= 5: return False
+    return SESSION_OPEN <= now.time() <= SESSION_CLOSE
+
+def trigger_message(bot, price):
+    tp, sl = bracket_prices(bot['price'], bot['profit'], bot['loss'])
+    return f"【觸發】\n標的: {bot['code']}\n條件: < {bot['price']}\n現價: {price}\n停利: {tp:.2f} / 停損: {sl:.2f}"
+
+def fill_message(fill):
+    return f"【出場】\n標的: {fill['code']}\n{EXIT_LABEL[fill['kind']]} @ {fill['exit']:.2f}\n損益: {fill['pl']:+,.0f} 元"
+
+def bot_key(b):
+    return (b['owner'], b['slot'], b['updated_at'])
+
+class BotMonitor:
+    # 觸發價常駐在 AlertIndex、未平倉部位常駐在 PositionBook，每輪只同步有變動的機器人
+    def __init__(self, store, dispatcher=None):
+        self.store = store
+        self.dispatcher = dispatcher or LineDispatcher()
+        self.index = AlertIndex()
+        self.book = PositionBook()
+        self.alert_of = {}    # (owner, slot, updated_at) -> alert_id
+        self.bot_of = {}      # alert_id -> bot
+        self.saved = {(p['owner'], p['slot'], p['updated_at']): p for p in store.load_positions()}
+
+    def open_position(self, b, entry, opened_at, saved=None):
+        meta = {"owner": b['owner'], "slot": b['slot'], "updated_at": b['updated_at'], "code": b['code'],
+                "symbol": to_symbol(b['code']), "opened_at": opened_at,
+                "line_token": b.get('line_token') or "", "line_uid": b.get('line_uid') or ""}
+        if saved is None:
+            self.book.open(bot_key(b), meta, entry, b['qty'], b['profit'], b['loss'], b['trail'])
+        else:
+            self.book.open(bot_key(b), meta, saved['entry'], saved['qty'], b['profit'], b['loss'], saved['trail'],
+                           tp=saved['tp'], sl=saved['sl'], peak=saved['peak'])
+
+    def sync(self, bots):
+        # 回傳已不在監控中的部位 (UI 停止或改設定)，需手動平倉
+        live = {bot_key(b): b for b in bots if b['triggered_at'] is None}
+        for key in [k for k in self.alert_of if k not in live]:
+            aid = self.alert_of.pop(key)
+            self.index.remove(aid)
+            self.bot_of.pop(aid, None)
+        for key, b in live.items():
+            if key in self.alert_of: continue
+            aid = self.index.add(to_symbol(b['code']), b['price'], BELOW)
+            self.alert_of[key] = aid
+            self.bot_of[aid] = b
+
+        # 重新啟動後從儲存區接回已觸發、尚未出場的部位
+        active = {bot_key(b): b for b in bots}
+        for key, b in active.items():
+            if b['triggered_at'] is not None and key not in self.book and key in self.saved:
+                self.open_position(b, None, self.saved[key]['opened_at'], saved=self.saved.pop(key))
+        orphans = [k for k in self.book.slot_of if k not in active]
+        orphans += [k for k in self.saved if k not in active]
+        return orphans
+
+    @timed("daemon.run_cycle")
+    def run_cycle(self, notify=None):
+        notify = notify or self.dispatcher.push
+        bots = list(self.store.iter_active())
+        orphans = self.sync(bots)
+        if not bots and not orphans: return 0
+        # 所有機器人與待平倉部位的標的合併成一次批次報價
+        symbols = {to_symbol(b['code']) for b in bots}
+        symbols |= {self.book.meta[self.book.slot_of[k]]['symbol'] for k in orphans if k in self.book}
+        try:
+            quotes = download_quotes(list(symbols), priority=BOT)
+        except UpstreamUnavailable as e:
+            # 限流 / 斷路：這一輪不比對 (沒有報價就不能判斷觸發)，下一輪再試
+            log.warning("行情來源降級 (%s)，本輪略過", e)
+            return 0
+        prices = {s: q['price'] for s, q in quotes.items()}
+
+        now = time.time()
+        fired = {}    # (owner, slot, updated_at) -> (bot, 觸發價)
+        for aid, sym, level, direction, price in self.index.update_many(prices):
+            b = self.bot_of.pop(aid, None)
+            if b is None: continue
+            self.alert_of.pop(bot_key(b), None)
+            fired[bot_key(b)] = (b, price)
+            # 以觸發價進場，掛上停利/停損
+            self.open_position(b, b['price'], now)
+
+        fills = self.book.update(prices, now)
+        for key in orphans:
+            if key in self.book:
+                i = self.book.slot_of[key]
+                price = prices.get(self.book.meta[i]['symbol'], float(self.book.entry[i]))
+                fills.append(self.book.close(key, price, now, MANUAL))
+            else:
+                # 儲存區裡留下、但機器人已停止的部位：以進場價平倉
+                p = self.saved.pop(key)
+                fills.append({"owner": p['owner'], "slot": p['slot'], "code": p['code'], "kind": MANUAL,
+                              "entry": p['entry'], "exit": p['entry'], "qty": p['qty'], "pl": 0.0, "ts": now,
+                              "line_token": p.get('line_token') or "", "line_uid": p.get('line_uid') or ""})
+
+        states = []
+        for b in bots:
+            q = quotes.get(to_symbol(b['code']))
+            if not q: continue
+            key = bot_key(b)
+            trig_at, trig_price = (now, fired[key][1]) if key in fired else (b['triggered_at'], b['triggered_price'])
+            states.append((q['price'], now, trig_at, trig_price, b['owner'], b['slot'], b['updated_at']))
+        self.store.update_states(states)
+        self.store.add_fills(fills)
+        self.store.save_positions([
+            (m['owner'], m['slot'], m['updated_at'], m['code'], entry, qty, tp, sl, trail, peak, m['opened_at'], m['line_token'], m['line_uid'])
+            for key, m, entry, qty, tp, sl, trail, peak in self.book.snapshot()
+        ])
+
+        # 出場 (含停止後的手動平倉) 用部位上記的 LINE 設定，不依賴機器人是否仍在監控
+        outbox = [(b, trigger_message(b, price)) for b, price in fired.values()]
+        outbox += [(f, fill_message(f)) for f in fills]
+        for to, msg in outbox:
+            log.info("%s #%s %s", to['owner'], to['slot'], msg.replace("\n", " "))
+            if to.get('line_token') and to.get('line_uid'): notify(to['line_token'], to['line_uid'], msg)
+        return len(bots)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="股市特務 X 背景監控程式")
+    parser.add_argument("--db", default=DB_PATH, help="機器人設定資料庫路徑")
+    parser.add_argument("--interval", type=float, default=30.0, help="每輪檢查間隔 (秒)")
+    parser.add_argument("--once", action="store_true", help="只跑一輪就結束")
+    parser.add_argument("--force", action="store_true", help="休市時也照樣檢查")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Prometheus /metrics 埠號 (0 = 不開)")
+    args = parser.parse_args(argv)
+    if args.metrics_port and not start_metrics_server(args.metrics_port): log.warning("量測埠 %d 已被佔用", args.metrics_port)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    monitor = BotMonitor(BotStore(args.db))
+    while True:
+        started = time.time()
+        if args.force or is_market_open():
+            try:
+                n = monitor.run_cycle()
+                log.info("本輪檢查 %d 台機器人，耗時 %.2fs", n, time.time() - started)
+            except Exception:
+                log.exception("本輪檢查失敗")
+        if args.once:
+            monitor.dispatcher.flush()
+            break
+        time.sleep(max(0.0, args.interval - (time.time() - started)))
+
+if __name__ == "__main__":
+    main()
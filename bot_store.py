@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+
+# ==========================================
+# 特務機器人共用儲存 (SQLite)：UI 寫入設定，背景監控程式寫回狀態
+# ==========================================
+DB_PATH = os.path.join(os.environ.get('STOCK_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'), 'bots.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bots (
+    owner TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    price REAL NOT NULL,
+    qty INTEGER NOT NULL DEFAULT 1,
+    profit REAL NOT NULL DEFAULT 5.0,
+    loss REAL NOT NULL DEFAULT 2.0,
+    trail REAL NOT NULL DEFAULT 0.0,
+    active INTEGER NOT NULL DEFAULT 0,
+    line_token TEXT DEFAULT '',
+    line_uid TEXT DEFAULT '',
+    cur_price REAL,
+    last_checked REAL,
+    triggered_at REAL,
+    triggered_price REAL,
+    updated_at REAL,
+    PRIMARY KEY (owner, slot)
+);
+CREATE INDEX IF NOT EXISTS idx_bots_active ON bots(active);
+CREATE TABLE IF NOT EXISTS positions (
+    owner TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    code TEXT NOT NULL,
+    entry REAL NOT NULL,
+    qty REAL NOT NULL,
+    tp REAL NOT NULL,
+    sl REAL NOT NULL,
+    trail REAL NOT NULL DEFAULT 0.0,
+    peak REAL NOT NULL,
+    opened_at REAL,
+    line_token TEXT DEFAULT '',
+    line_uid TEXT DEFAULT '',
+    PRIMARY KEY (owner, slot)
+);
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    entry REAL NOT NULL,
+    exit REAL NOT NULL,
+    qty REAL NOT NULL,
+    pl REAL NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fills_owner_ts ON fills(owner, ts);
+"""
+
+class BotStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # 舊版資料庫補欄位
+            cols = {r['name'] for r in conn.execute("PRAGMA table_info(bots)")}
+            if 'trail' not in cols: conn.execute("ALTER TABLE bots ADD COLUMN trail REAL NOT NULL DEFAULT 0.0")
+            cols = {r['name'] for r in conn.execute("PRAGMA table_info(positions)")}
+            for col in ('line_token', 'line_uid'):
+                if col not in cols: conn.execute(f"ALTER TABLE positions ADD COLUMN {col} TEXT DEFAULT ''")
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作一條連線：交易結束自動 commit，並確實關閉
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn: yield conn
+        finally: conn.close()
+
+    def save_bot(self, owner, slot, bot, line_token="", line_uid=""):
+        # 每次啟動/停止都重設觸發狀態，讓監控程式重新判斷
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO bots (owner, slot, code, price, qty, profit, loss, trail, active, line_token, line_uid,
+                                  cur_price, triggered_at, triggered_price, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, ?)
+                ON CONFLICT(owner, slot) DO UPDATE SET
+                    code=excluded.code, price=excluded.price, qty=excluded.qty, profit=excluded.profit,
+                    loss=excluded.loss, trail=excluded.trail, active=excluded.active, line_token=excluded.line_token,
+                    line_uid=excluded.line_uid, triggered_at=NULL, triggered_price=NULL,
+                    updated_at=excluded.updated_at
+            """, (owner, slot, bot['code'], float(bot['price']), int(bot['qty']), float(bot['profit']),
+                  float(bot['loss']), float(bot.get('trail', 0.0)), int(bool(bot['active'])), line_token, line_uid, bot.get('cur_price'), time.time()))
+
+    def load_bots(self, owner):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM bots WHERE owner = ?", (owner,)).fetchall()
+        return {r['slot']: dict(r) for r in rows}
+
+    def iter_active(self):
+        with self._connect() as conn:
+            for r in conn.execute("SELECT * FROM bots WHERE active = 1"): yield dict(r)
+
+    def update_states(self, states):
+        # states: [(cur_price, last_checked, triggered_at, triggered_price, owner, slot, updated_at), ...]
+        # updated_at 不符代表 UI 在這輪之間改過設定，該筆結果作廢
+        if not states: return
+        with self._connect() as conn:
+            conn.executemany("""
+                UPDATE bots SET cur_price=?, last_checked=?, triggered_at=?, triggered_price=?
+                WHERE owner=? AND slot=? AND updated_at=? AND active=1
+            """, states)
+
+    def load_positions(self, owner=None):
+        with self._connect() as conn:
+            if owner is None: rows = conn.execute("SELECT * FROM positions").fetchall()
+            else: rows = conn.execute("SELECT * FROM positions WHERE owner = ?", (owner,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def save_positions(self, rows):
+        # rows: [(owner, slot, updated_at, code, entry, qty, tp, sl, trail, peak, opened_at, line_token, line_uid), ...]
+        # LINE 設定跟著部位存，機器人停止後出場通知仍送得到
+        if not rows: return
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO positions (owner, slot, updated_at, code, entry, qty, tp, sl, trail, peak, opened_at, line_token, line_uid)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(owner, slot) DO UPDATE SET
+                    updated_at=excluded.updated_at, code=excluded.code, entry=excluded.entry, qty=excluded.qty,
+                    tp=excluded.tp, sl=excluded.sl, trail=excluded.trail, peak=excluded.peak,
+                    opened_at=excluded.opened_at, line_token=excluded.line_token, line_uid=excluded.line_uid
+            """, rows)
+
+    def add_fills(self, fills):
+        # 出場成交寫入 fills，並移除對應的未平倉部位
+        if not fills: return
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO fills (owner, slot, code, kind, entry, exit, qty, pl, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(f['owner'], f['slot'], f['code'], f['kind'], f['entry'], f['exit'], f['qty'], f['pl'], f['ts']) for f in fills])
+            conn.executemany("DELETE FROM positions WHERE owner = ? AND slot = ?", [(f['owner'], f['slot']) for f in fills])
+
+    def load_fills(self, owner, since=0.0):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM fills WHERE owner = ? AND ts >= ? ORDER BY ts", (owner, since)).fetchall()
+        return [dict(r) for r in rows]
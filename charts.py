@@ -0,0 +1,226 @@
+import threading
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from collections import OrderedDict
+from indicators import OVERLAYS, SUBPLOTS
+from metrics import record_cache
+
+# ==========================================
+# K 線圖：依可視寬度先縮減資料再送到瀏覽器
+#   資料 <= MAX_POINTS 根：原樣畫蠟燭
+#   超過 MAX_POINTS：相鄰 K 棒合併 (開=首、高=最高、低=最低、收=尾)，保留極值
+#   超過 WEBGL_THRESHOLD (例如多日 1 分K)：改用 WebGL 折線，收盤價以 LTTB 取樣
+#   技術指標線依同一組取樣位置畫 (合併 K 棒時取該段最後一根的指標值)
+# ==========================================
+MAX_POINTS = 600
+WEBGL_THRESHOLD = 20000
+HOVER_CANDLE = '<b>日期</b>: %{x}<br><b>開盤</b>: %{open:.2f}<br><b>最高</b>: %{high:.2f}<br><b>最低</b>: %{low:.2f}<br><b>收盤</b>: %{close:.2f}<extra></extra>'
+HOVER_LINE = '<b>日期</b>: %{x}<br><b>收盤</b>: %{y:.2f}<extra></extra>'
+LINE_COLORS = {'ma5': '#ff9800', 'ma20': '#9c27b0', 'ma60': '#795548', 'ema20': '#00897b', 'bb_upper': '#90a4ae', 'bb_mid': '#607d8b',
+               'bb_lower': '#90a4ae', 'rsi': '#6a1b9a', 'macd': '#1565c0', 'macd_signal': '#ef6c00', 'k': '#1565c0', 'd': '#ef6c00', 'atr': '#5d4037'}
+
+def bucket_bounds(n, max_points):
+    starts = (np.arange(max_points) * n) // max_points
+    return starts, np.append(starts[1:], n) - 1
+
+def downsample_ohlc(df, max_points=MAX_POINTS):
+    n = len(df)
+    if n <= max_points: return df
+    starts, ends = bucket_bounds(n, max_points)
+    out = {
+        'date': df['date'].iloc[starts].reset_index(drop=True),
+        'open': df['open'].to_numpy(dtype=float)[starts],
+        'high': np.fmax.reduceat(df['high'].to_numpy(dtype=float), starts),
+        'low': np.fmin.reduceat(df['low'].to_numpy(dtype=float), starts),
+        'close': df['close'].to_numpy(dtype=float)[ends],
+    }
+    if 'volume' in df.columns: out['volume'] = np.add.reduceat(np.nan_to_num(df['volume'].to_numpy(dtype=float)), starts)
+    return pd.DataFrame(out)
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets：回傳保留下來的索引
+    n = len(x)
+    if n_out >= n or n_out < 3: return np.arange(n)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[end:nxt_end].mean(), y[end:nxt_end].mean()
+        xs, ys = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+def price_trace(df, max_points=MAX_POINTS, webgl_threshold=WEBGL_THRESHOLD):
+    # 回傳 (trace, x 取樣列, y 取樣列)，後兩者給指標線對齊用
+    n = len(df)
+    if n > webgl_threshold:
+        dates = pd.DatetimeIndex(df['date'])
+        y = df['close'].to_numpy(dtype=float)
+        keep = lttb(dates.asi8.astype(float), y, max_points * 2)
+        return go.Scattergl(x=dates[keep], y=y[keep], mode='lines', name='收盤', line=dict(color='#1e3c72', width=1.5),
+                            hovertemplate=HOVER_LINE), keep, keep
+    xi, yi = bucket_bounds(n, max_points) if n > max_points else (np.arange(n), np.arange(n))
+    df = downsample_ohlc(df, max_points)
+    return go.Candlestick(
+        x=df['date'], open=df['open'], high=df['high'], low=df['low'], close=df['close'],
+        name='K線', increasing_line_color='#d32f2f', decreasing_line_color='#2e7d32', hovertemplate=HOVER_CANDLE
+    ), xi, yi
+
+def build_price_figure(df, title, trigger_price=None, trigger_label="觸發買進價", max_points=MAX_POINTS, webgl_threshold=WEBGL_THRESHOLD,
+                       ind=None, overlays=(), subplots=()):
+    # ind：indicators 算好的指標表 (與 df 對齊)；overlays 疊在 K 線上，subplots 各自一列
+    trace, xi, yi = price_trace(df, max_points, webgl_threshold)
+    subplots = [name for name in subplots if ind is not None and name in SUBPLOTS]
+    if not subplots: fig = go.Figure(data=[trace])
+    else:
+        fig = make_subplots(rows=1 + len(subplots), cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                            row_heights=[0.6] + [0.4 / len(subplots)] * len(subplots), subplot_titles=[""] + subplots)
+        fig.add_trace(trace, row=1, col=1)
+    if ind is not None:
+        x = df['date'].iloc[xi]
+        for name in overlays:
+            for col in OVERLAYS.get(name, []):
+                fig.add_trace(go.Scatter(x=x, y=ind[col].to_numpy()[yi], mode='lines', name=col.upper(), line=dict(color=LINE_COLORS[col], width=1),
+                                         hovertemplate=f'{col.upper()} %{{y:.2f}}<extra></extra>'), **({'row': 1, 'col': 1} if subplots else {}))
+        for r, name in enumerate(subplots, start=2):
+            for col in SUBPLOTS[name]:
+                y = ind[col].to_numpy()[yi]
+                if col == 'macd_hist':
+                    fig.add_trace(go.Bar(x=x, y=y, name='OSC', marker_color=np.where(y >= 0, '#d32f2f', '#2e7d32'),
+                                         hovertemplate='OSC %{y:.2f}<extra></extra>'), row=r, col=1)
+                else:
+                    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name=col.upper(), line=dict(color=LINE_COLORS[col], width=1),
+                                             hovertemplate=f'{col.upper()} %{{y:.2f}}<extra></extra>'), row=r, col=1)
+    if trigger_price:
+        fig.add_hline(y=trigger_price, line_dash="dash", line_color="blue", annotation_text=trigger_label, **({'row': 1, 'col': 1} if subplots else {}))
+    fig.update_layout(title=title, height=350 + 130 * len(subplots), margin=dict(l=10, r=10, t=30, b=10), yaxis_title="股價 (TWD)", hovermode="x unified", showlegend=False)
+    fig.update_xaxes(rangeslider_visible=False)
+    return fig
+
+# ==========================================
+# 圖表快取：(代號, 週期, 資料指紋, 觸發價, 標題, 指標) 都沒變就沿用上次建好的 Figure
+#   資料指紋 = 筆數 + 最後一根 K 棒時間 + 最後收盤 (盤中最後一根會持續更新)
+#   快取內的 Figure 跨 session 共用，拿到後不可再修改
+# ==========================================
+def data_fingerprint(df):
+    if df.empty: return (0, None, None)
+    last = df.iloc[-1]
+    return (len(df), str(last['date']), float(last['close']))
+
+class FigureCache:
+    def __init__(self, max_entries=64, name="figure"):
+        self.max_entries = max_entries
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            fig = self._items.get(key)
+            if fig is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                record_cache(self.name, "hit")
+                return fig
+            self.misses += 1
+        record_cache(self.name, "miss")
+        fig = build()
+        with self._lock:
+            self._items[key] = fig
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries: self._items.popitem(last=False)
+        return fig
+
+    def clear(self):
+        with self._lock: self._items.clear()
+
+# ==========================================
+# 當沖損益情境熱圖：縱軸出場價 (依升降單位)、橫軸張數，紅賺綠賠
+# ==========================================
+def build_pl_heatmap(exits, lots, grid, title):
+    fig = go.Figure(data=[go.Heatmap(
+        z=grid, x=[f"{n}張" for n in lots], y=[f"{p:.2f}" for p in exits], zmid=0,
+        colorscale=[[0, '#2e7d32'], [0.5, '#ffffff'], [1, '#d32f2f']], colorbar=dict(title="淨損益"),
+        hovertemplate='出場 %{y}｜%{x}<br>淨損益 %{z:+,.0f} 元<extra></extra>'
+    )])
+    fig.update_layout(title=title, height=450, margin=dict(l=10, r=10, t=30, b=10), yaxis=dict(type='category'), xaxis=dict(type='category'))
+    return fig
+
+# ==========================================
+# 回測權益曲線：持有期間含未實現損益，點數多時以 LTTB 縮減
+# ==========================================
+def build_equity_figure(curve, title):
+    x, y = pd.DatetimeIndex(curve.index), curve.to_numpy(dtype=float)
+    if len(y) > MAX_POINTS * 2:
+        keep = lttb(x.asi8.astype(float), y, MAX_POINTS * 2)
+        x, y = x[keep], y[keep]
+    fig = go.Figure(data=[go.Scatter(x=x, y=y, mode='lines', name='權益', line=dict(color='#1e3c72', width=1.5), fill='tozeroy',
+                                     hovertemplate='%{x}<br>累計損益 %{y:+,.0f} 元<extra></extra>')])
+    fig.update_layout(title=title, height=250, margin=dict(l=10, r=10, t=30, b=10), yaxis_title="累計損益 (TWD)")
+    return fig
+
+# ==========================================
+# 參數最佳化熱圖：兩個參數為軸，格值為其餘參數下的最佳淨損益
+# ==========================================
+def build_sweep_heatmap(pivot, title):
+    fig = go.Figure(data=[go.Heatmap(
+        z=pivot.to_numpy(), x=[f"{v:g}" for v in pivot.columns], y=[f"{v:g}" for v in pivot.index], zmid=0,
+        colorscale=[[0, '#2e7d32'], [0.5, '#ffffff'], [1, '#d32f2f']], colorbar=dict(title="淨損益"),
+        hovertemplate=f'{pivot.columns.name} %{{x}}｜{pivot.index.name} %{{y}}<br>最佳淨損益 %{{z:+,.0f}} 元<extra></extra>'
+    )])
+    fig.update_layout(title=title, height=400, margin=dict(l=10, r=10, t=30, b=10), xaxis=dict(type='category', title=pivot.columns.name),
+                      yaxis=dict(type='category', title=pivot.index.name))
+    return fig
+
+# ==========================================
+# 網格模擬圖：K 線 + 各格價位 + 買賣成交點
+# ==========================================
+def build_grid_figure(df, levels, fills, title):
+    fig = build_price_figure(df, title)
+    for lv in levels:
+        fig.add_hline(y=float(lv), line_dash="dot", line_width=1, line_color="#9e9e9e")
+    for side, symbol, color, label in (("BUY", "triangle-up", "#d32f2f", "買進"), ("SELL", "triangle-down", "#2e7d32", "賣出")):
+        f = fills[fills['side'] == side]
+        if f.empty: continue
+        fig.add_trace(go.Scatter(x=f['time'], y=f['price'], mode='markers', name=label, marker=dict(symbol=symbol, size=10, color=color),
+                                 hovertemplate=f'{label} %{{y:.2f}}<extra></extra>'))
+    fig.update_layout(height=420, showlegend=False)
+    return fig
+
+# ==========================================
+# 當沖 VWAP 圖：左為 K 線 + VWAP ±1/±2 標準差帶，右為分價量表 (共用價格軸)
+# ==========================================
+VWAP_BANDS = (('upper2', 'lower2', 'rgba(255,152,0,0.10)'), ('upper1', 'lower1', 'rgba(255,152,0,0.18)'))
+
+def build_vwap_figure(df, title, vwap, profile, entry_price=None, entry_label="進場價", poc=None, max_points=MAX_POINTS):
+    trace, _, _ = price_trace(df, max_points, WEBGL_THRESHOLD)
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True, column_widths=[0.82, 0.18], horizontal_spacing=0.01)
+    fig.add_trace(trace, row=1, col=1)
+    if not vwap.empty:
+        for upper, lower, fill in VWAP_BANDS:
+            fig.add_trace(go.Scatter(x=vwap['date'], y=vwap[upper], mode='lines', line=dict(width=0), hoverinfo='skip'), row=1, col=1)
+            fig.add_trace(go.Scatter(x=vwap['date'], y=vwap[lower], mode='lines', line=dict(width=0), fill='tonexty', fillcolor=fill, hoverinfo='skip'), row=1, col=1)
+        fig.add_trace(go.Scatter(x=vwap['date'], y=vwap['vwap'], mode='lines', name='VWAP', line=dict(color='#ff9800', width=2),
+                                 hovertemplate='VWAP %{y:.2f}<extra></extra>'), row=1, col=1)
+    if not profile.empty:
+        shown = profile[profile['volume'] > 0]
+        fig.add_trace(go.Bar(x=shown['volume'], y=shown['price'], orientation='h', name='分價量', marker_color='#90a4ae',
+                             hovertemplate='%{y:.2f}：%{x:,.0f}<extra></extra>'), row=1, col=2)
+    if poc is not None and not np.isnan(poc):
+        fig.add_hline(y=poc, line_dash="dot", line_color="#607d8b", annotation_text="POC", row=1, col=2)
+    if entry_price:
+        fig.add_hline(y=entry_price, line_dash="dash", line_color="blue", annotation_text=entry_label, row=1, col=1)
+    fig.update_layout(title=title, height=420, margin=dict(l=10, r=10, t=30, b=10), yaxis_title="股價 (TWD)", hovermode="closest",
+                      showlegend=False, bargap=0)
+    fig.update_xaxes(rangeslider_visible=False)
+    fig.update_xaxes(showticklabels=False, row=1, col=2)
+    return fig
@@ -1,13 +1,9 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-import yfinance as yf
-from datetime import datetime, time as dt_time
-import pytz
-import time
-import feedparser
-import requests
+from datetime import datetime
+from metrics import timed
+from ui_common import (engine, init_session, get_metrics_server, get_intraday_book, plot_chinese_chart, show_chart, pick_symbol,
+                       render_admin_panel, clear_caches, render_upstream_status, render_master_status, render_replay_panel,
+                       live_every, render_dashboard)
 
 # ==========================================
 # 1. 系統初始化 & CSS 風格 (保留原樣)
@@ -57,318 +53,118 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # ==========================================
-# 2. 核心數據引擎 (保留原樣)
+# 2. 核心數據引擎 (與 app.py 共用 ui_common.py)
 # ==========================================
-class DataEngine:
-    def __init__(self):
-        self.tz = pytz.timezone('Asia/Taipei')
-        self.name_map = {
-            "2330": "台積電", "2317": "鴻海", "2454": "聯發科", "2603": "長榮", "2609": "陽明",
-            "2615": "萬海", "3231": "緯創", "2382": "廣達", "2356": "英業達", "2303": "聯電",
-            "2881": "富邦金", "2882": "國泰金", "2891": "中信金", "2376": "技嘉", "2388": "威盛",
-            "3037": "欣興", "3035": "智原", "3017": "奇鋐", "2368": "金像電", "3008": "大立光",
-            "1513": "中興電", "1519": "華城", "1503": "士電", "1504": "東元", "2002": "中鋼",
-            "1605": "華新", "2409": "友達", "3481": "群創", "2344": "華邦電", "2498": "宏達電",
-            "6182": "合晶", "8069": "元太", "5483": "中美晶", "3661": "世芯-KY", "6531": "愛普",
-            "6669": "緯穎", "5269": "祥碩", "6415": "矽力-KY", "2327": "國巨", "2308": "台達電"
-        }
-        self.watch_list = list(self.name_map.keys())
-
-    def is_market_open(self):
-        now = datetime.now(self.tz)
-        if now.weekday() >= 5: return False
-        return dt_time(9, 0) <= now.time() <= dt_time(13, 30)
-
-    def get_stock_name(self, ticker):
-        clean_ticker = ticker.replace('.TW', '')
-        return self.name_map.get(clean_ticker, ticker)
-
-    @st.cache_data(ttl=60)
-    def fetch_quote(_self, ticker):
-        if not ticker.endswith('.TW') and not ticker.startswith('^'): ticker += '.TW'
-        try:
-            stock = yf.Ticker(ticker)
-            df = stock.history(period='1d', interval='1m')
-            if df.empty:
-                df = stock.history(period='5d', interval='1d')
-            
-            if df.empty: return None
-            
-            last = df.iloc[-1]
-            price = float(last['Close'])
-            
-            change = 0.0
-            pct = 0.0
-            if len(df) > 1:
-                prev = df.iloc[-2]['Close']
-                change = price - prev
-                pct = (change / prev) * 100
-            
-            clean_ticker = ticker.replace('.TW', '')
-            display_name = _self.name_map.get(clean_ticker, clean_ticker)
-            
-            return {
-                "name": display_name, "price": price, "change": change,
-                "pct": pct, "vol": last['Volume'], 
-                "open": last['Open'], "high": last['High'], "low": last['Low']
-            }
-        except: return None
-        
-    @st.cache_data(ttl=3600)
-    def fetch_stock_profile(_self, ticker):
-        if not ticker.endswith('.TW'): ticker += '.TW'
-        try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            return {
-                "pe": info.get('trailingPE', 'N/A'),
-                "eps": info.get('trailingEps', 'N/A'),
-                "marketCap": info.get('marketCap', 'N/A'),
-                "yield": info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 'N/A',
-                "sector": info.get('sector', 'N/A')
-            }
-        except: return None
-
-    @st.cache_data(ttl=300)
-    def fetch_indices(_self):
-        targets = {"加權指數": "^TWII", "櫃買指數": "^TWOII", "道瓊": "^DJI", "那斯達克": "^IXIC", "費半": "^SOX"}
-        res = {}
-        for name, sym in targets.items():
-            q = _self.fetch_quote(sym)
-            if q: res[name] = q
-        return res
-
-    @st.cache_data(ttl=60)
-    def fetch_kline(_self, ticker, interval="1d", period="3mo"):
-        if not ticker.endswith('.TW'): ticker += '.TW'
-        try:
-            stock = yf.Ticker(ticker)
-            df = stock.history(period=period, interval=interval)
-            df.reset_index(inplace=True)
-            df['Date'] = df['Date'].dt.tz_localize(None)
-            df.columns = [c.lower() for c in df.columns]
-            return df
-        except: return pd.DataFrame()
-
-    @st.cache_data(ttl=300)
-    def get_real_news(_self):
-        rss_url = "https://news.google.com/rss/search?q=台股&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
-        news_items = []
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        try:
-            response = requests.get(rss_url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                feed = feedparser.parse(response.content)
-                if feed.entries:
-                    for entry in feed.entries[:5]:
-                        t = entry.published_parsed
-                        time_str = f"{t.tm_hour:02}:{t.tm_min:02}" if t else "最新"
-                        news_items.append({
-                            "title": entry.title, "link": entry.link,
-                            "time": time_str, "source": entry.source.title if hasattr(entry, 'source') else "Google新聞"
-                        })
-        except: pass
-        if not news_items: return [{"title": "系統連線中...", "link": "#", "time": "--", "source": "系統"}]
-        return news_items
-
-    @st.cache_data(ttl=60)
-    def scan_market(_self, min_p, max_p, strategy):
-        data_list = []
-        tickers_tw = [f"{x}.TW" for x in _self.watch_list]
-        try:
-            df = yf.download(tickers_tw, period="1d", group_by='ticker', threads=True, progress=False)
-            for code in _self.watch_list:
-                t_code = f"{code}.TW"
-                if t_code not in df.columns.levels[0]: continue
-                sub = df[t_code]
-                if sub.empty: continue
-                row = sub.iloc[-1]
-                price = float(row['Close'])
-                if not (min_p <= price <= max_p): continue
-                open_p = float(row['Open'])
-                change_pct = (price - open_p) / open_p * 100
-                vol = int(row['Volume'])
-                name = _self.name_map.get(code, code)
-                data_list.append({
-                    "代號": code, "名稱": name, "股價": price, "漲跌幅": change_pct, "成交量": vol,
-                    "abs_change": abs(change_pct)
-                })
-            res = pd.DataFrame(data_list)
-            if res.empty: return res
-            if strategy == "漲跌停 (±10%)": return res.sort_values(by="abs_change", ascending=False).head(10)
-            elif strategy == "爆量強勢股": return res.sort_values(by="成交量", ascending=False).head(10)
-            elif strategy == "飆股 (漲幅排行)": return res.sort_values(by="漲跌幅", ascending=False).head(10)
-            return res
-        except: return pd.DataFrame()
-
-engine = DataEngine()
 
 # ==========================================
 # 3. Session 狀態初始化
 # ==========================================
-if 'portfolio' not in st.session_state: st.session_state.portfolio = [{"code": "2330", "name": "台積電", "cost": 980, "qty": 1000}]
-if 'login_status' not in st.session_state: st.session_state.login_status = False
+init_session()
 
 # 新增當沖相關的 Session
 if 'discount_rate' not in st.session_state: st.session_state.discount_rate = 0.6  # 預設手續費6折
 if 'trade_history' not in st.session_state: st.session_state.trade_history = []   # 當沖歷史紀錄
 
-def auto_fill_name():
-    code = st.session_state.p_code_input
-    if code:
-        info = engine.fetch_quote(code)
-        if info: st.session_state.p_name_input = info['name']
-
-def plot_chinese_chart(df, title, trigger_price=None):
-    fig = go.Figure(data=[go.Candlestick(
-        x=df['date'], open=df['open'], high=df['high'], low=df['low'], close=df['close'],
-        name='K線',
-        increasing_line_color='#d32f2f', decreasing_line_color='#2e7d32'
-    )])
-    fig.update_traces(hovertemplate='<b>日期</b>: %{x}<br><b>開盤</b>: %{open:.2f}<br><b>最高</b>: %{high:.2f}<br><b>最低</b>: %{low:.2f}<br><b>收盤</b>: %{close:.2f}<extra></extra>')
-    if trigger_price:
-        fig.add_hline(y=trigger_price, line_dash="dash", line_color="blue", annotation_text="目標價")
-    fig.update_layout(title=title, height=350, xaxis_rangeslider_visible=False, margin=dict(l=10, r=10, t=30, b=10), yaxis_title="股價 (TWD)", hovermode="x unified")
-    return fig
-
 # ==========================================
-# 4. 模組一：股市情報站 (保留原樣)
+# 4. 模組一：股市情報站 (與 app.py 共用 ui_common.render_dashboard)
 # ==========================================
-def render_dashboard():
-    st.markdown("<div class='nav-bar'><span class='nav-title'>🕵️ 股市情報站 (Intelligence Station)</span></div>", unsafe_allow_html=True)
-    
-    col_main, col_news = st.columns([3, 2])
-    
-    with col_main:
-        # A. 大盤
-        st.subheader("📊 市場行情")
-        indices = engine.fetch_indices()
-        c_grid = st.columns(4)
-        for i, (name, data) in enumerate(indices.items()):
-            if i < 4:
-                color = "up" if data['change'] > 0 else "down"
-                with c_grid[i]:
-                    st.markdown(f"""
-                    <div class='card'>
-                        <div class='card-title'>{name}</div>
-                        <div class='card-val {color}'>{data['price']:,.0f}</div>
-                        <div class='{color}'>{data['change']:+.0f} ({data['pct']:+.2f}%)</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-        st.divider()
-        
-        # B. 個股偵查
-        st.subheader("🔎 全方位個股偵查")
-        c_search, c_space = st.columns([1, 2])
-        ticker = c_search.text_input("輸入代號 (例如 2330)", "2330")
-        
-        q = engine.fetch_quote(ticker)
-        profile = engine.fetch_stock_profile(ticker)
-        
-        if q:
-            color_cls = "up" if q['change'] > 0 else "down"
-            st.markdown(f"""
-            <div class='stock-header'>
-                <span class='stock-price-lg {color_cls}'>{q['price']}</span>
-                <span class='stock-meta {color_cls}' style='margin-left:10px; font-size:20px;'>{q['change']:+.2f} ({q['pct']:+.2f}%)</span>
-                <div class='stock-meta'>代號: {ticker} | 名稱: {q['name']} | 成交量: {q['vol']:,}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            tab1, tab2, tab3 = st.tabs(["📈 技術走勢", "📋 基本資料", "🔗 深層數據 (Anue)"])
-            
-            with tab1:
-                c_k_opt, c_k_void = st.columns([1, 4])
-                k_type = c_k_opt.radio("K線週期", ["日K", "週K", "月K"], horizontal=True, label_visibility="collapsed")
-                
-                if k_type == "日K": k_inv, k_prd = "1d", "3mo"
-                elif k_type == "週K": k_inv, k_prd = "1wk", "1y"
-                else: k_inv, k_prd = "1mo", "5y"
-                
-                df_k = engine.fetch_kline(ticker, interval=k_inv, period=k_prd)
-                
-                if not df_k.empty:
-                    st.plotly_chart(plot_chinese_chart(df_k, f"{q['name']} ({ticker}) - {k_type}線圖"), use_container_width=True, key="dash_chart")
-                else:
-                    st.warning("查無此週期 K 線資料")
-            
-            with tab2:
-                if profile:
-                    c_p1, c_p2, c_p3 = st.columns(3)
-                    c_p1.metric("本益比 (PE)", f"{profile['pe']}")
-                    c_p2.metric("每股盈餘 (EPS)", f"{profile['eps']}")
-                    c_p3.metric("殖利率 (%)", f"{profile['yield']:.2f}%" if profile['yield'] != 'N/A' else 'N/A')
-                    st.caption(f"產業: {profile['sector']} | 市值: {profile['marketCap']}")
-                else:
-                    st.info("暫無基本資料")
-
-            with tab3:
-                st.info(f"🔒 {q['name']} ({ticker}) 深層數據傳送門 (點擊直達鉅亨網)：")
-                anue_base = f"https://stock.cnyes.com/market/TWS:{ticker}:STOCK"
-                col_btn1, col_btn2, col_btn3 = st.columns(3)
-                col_btn1.link_button("🏦 三大法人買賣超", f"{anue_base}/institutional", use_container_width=True)
-                col_btn2.link_button("📉 融資融券餘額", f"{anue_base}/margin", use_container_width=True)
-                col_btn3.link_button("📑 營收與財報", f"{anue_base}/financials", use_container_width=True)
-                
-        st.divider()
-        
-        # C. 熱點排行
-        st.subheader("🔥 市場熱點排行 (Scanner)")
-        with st.container():
-            st.info("💡 請設定條件以開始搜尋")
-            c_s1, c_s2, c_s3, c_s4 = st.columns([2, 2, 3, 2])
-            min_p = c_s1.number_input("最低價 ($)", value=10, min_value=1)
-            max_p = c_s2.number_input("最高價 ($)", value=1000, min_value=1)
-            strat = c_s3.selectbox("篩選策略", ["漲跌停 (±10%)", "爆量強勢股", "飆股 (漲幅排行)"])
-            if c_s4.button("🔍 開始掃描", type="primary", use_container_width=True):
-                with st.spinner("正在掃描全市場數據..."):
-                    res = engine.scan_market(min_p, max_p, strat)
-                    if not res.empty:
-                        st.success(f"搜尋完成！")
-                        st.dataframe(res.style.format({"股價": "{:.2f}", "漲跌幅": "{:+.2f}%", "成交量": "{:,}"}), use_container_width=True)
-                    else:
-                        st.warning("查無符合條件股票")
-
-    with col_news:
-        st.subheader("📰 今日頭條 (Google News)")
-        st.caption("點擊標題開啟新視窗")
-        news_list = engine.get_real_news()
-        for news in news_list:
-            st.markdown(f"""
-            <div class='news-item'>
-                <a href='{news['link']}' target='_blank' class='news-link'>{news['title']} 🔗</a>
-                <div class='news-meta'>{news['time']} | {news['source']}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-    st.divider()
-    st.subheader("🎒 我的資產庫存")
-    with st.expander("➕ 新增庫存紀錄", expanded=False):
-        c1, c2, c3, c4 = st.columns(4)
-        new_code = c1.text_input("代號", key="p_code_input", on_change=auto_fill_name)
-        new_name = c2.text_input("名稱 (自動帶入)", key="p_name_input")
-        new_cost = c3.number_input("平均成本", min_value=0.0)
-        new_qty = c4.number_input("股數", min_value=1, step=1000)
-        if st.button("加入"):
-            if new_code:
-                st.session_state.portfolio.append({"code": new_code, "name": new_name, "cost": new_cost, "qty": new_qty})
-                st.rerun()
-    if st.session_state.portfolio:
-        p_data = []
-        for item in st.session_state.portfolio:
-            q = engine.fetch_quote(item['code'])
-            curr = q['price'] if q else item['cost']
-            prof = (curr - item['cost']) * item['qty']
-            p_data.append({
-                "代號": item['code'], "名稱": item['name'], "持有": item['qty'],
-                "成本": item['cost'], "現價": f"{curr:.2f}", "損益": f"{prof:,.0f}"
-            })
-        st.dataframe(pd.DataFrame(p_data), use_container_width=True)
 
 # ==========================================
 # 5. 模組二：⚡ 當沖戰情室 (Day Trading) - [主要修改區]
 # ==========================================
+@st.fragment
+@timed("render.pl_scenarios")
+def render_pl_scenarios(entry_price, is_long, discount):
+    # 出場價 (依升降單位逐檔) x 張數 一次算完整張淨損益表；調整範圍只重跑這一塊
+    import numpy as np
+    from trade_costs import pl_grid, tick_ladder, break_even
+    from charts import build_pl_heatmap
+    with st.expander("📊 損益情境表 (出場價 x 張數)", expanded=False):
+        if entry_price <= 0:
+            st.info("請先輸入進場價")
+            return
+        c_t, c_l = st.columns(2)
+        n_ticks = c_t.slider("出場價範圍 (上下檔數)", 5, 200, 30)
+        max_lots = c_l.slider("最多張數", 1, 50, 10)
+        exits = tick_ladder(entry_price, n_ticks)
+        lots = np.arange(1, max_lots + 1)
+        grid = pl_grid(entry_price, exits, lots, is_long, discount)
+
+        be_long, n_long = break_even(entry_price, 1, True, discount)
+        be_short, n_short = break_even(entry_price, 1, False, discount)
+        c_be1, c_be2 = st.columns(2)
+        c_be1.metric("做多損益兩平 (1張)", f"{be_long:.2f}" if be_long else "N/A", f"+{n_long} 檔" if be_long else None)
+        c_be2.metric("做空損益兩平 (1張)", f"{be_short:.2f}" if be_short else "N/A", f"-{n_short} 檔" if be_short else None, delta_color="inverse")
+        show_chart(build_pl_heatmap(exits[::-1], lots, grid[::-1], f"{'做多' if is_long else '做空'} 進場 {entry_price:.2f} 淨損益"), use_container_width=True)
+
+@st.fragment(run_every=live_every("intraday"))
+@timed("render.grid_sim")
+def render_grid_sim(code, lower, upper, n_levels, lots, discount):
+    # 模擬器存在 session 裡，每次刷新只撮合新收完的 1 分K；換標的、換參數或換日才從開盤重來
+    from grid_sim import GridSimulator
+    from charts import build_grid_figure
+    if lower <= 0 or upper <= lower:
+        st.info("請設定上限大於下限")
+        return
+    df = engine.fetch_kline(code, interval="1m", period="1d")
+    if df.empty:
+        st.warning("讀取當日 1 分K 中...")
+        return
+    key = (code, df['date'].iloc[0].date(), lower, upper, n_levels, lots, discount)
+    if st.session_state.get("grid_sim_key") != key:
+        st.session_state.grid_sim = GridSimulator(lower, upper, n_levels, lots, discount)
+        st.session_state.grid_sim_key = key
+    sim = st.session_state.grid_sim
+    sim.update(df, final=not engine.is_market_open())
+
+    last = float(df['close'].iloc[-1])
+    s = sim.summary(last)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("已實現淨損益", f"{s['realized']:+,.0f}")
+    m2.metric("未實現損益", f"{s['unrealized']:+,.0f}")
+    m3.metric("庫存 (張)", s['inventory'], f"均價 {s['avg_cost']:.2f}" if s['inventory'] else None, delta_color="off")
+    m4.metric("完成來回", s['round_trips'], f"獲利 {s['wins']} 筆" if s['round_trips'] else None, delta_color="off")
+    fills = sim.fill_table()
+    show_chart(build_grid_figure(df, sim.levels, fills, f"網格 {sim.levels[0]:.2f} ~ {sim.levels[-1]:.2f} ({len(sim.levels)} 格)"), use_container_width=True, key="grid_chart")
+    if not fills.empty:
+        view = fills.iloc[::-1].assign(time=fills['time'].iloc[::-1].dt.strftime("%H:%M"), side=fills['side'].iloc[::-1].map({"BUY": "買進", "SELL": "賣出"}))
+        st.dataframe(view.rename(columns={"time": "時間", "side": "方向", "level": "格", "price": "成交價", "lots": "張數", "pl": "淨損益"})
+                     .style.format({"成交價": "{:.2f}", "淨損益": "{:+,.0f}"}), use_container_width=True, hide_index=True, height=200)
+    if s['last_ts'] is not None: st.caption(f"已撮合至 {s['last_ts']:%H:%M}")
+
+@st.fragment(run_every=live_every("intraday"))
+@timed("render.intraday_chart")
+def render_intraday_chart(code, name, entry_price):
+    # 分K 走勢自己每分鐘刷新；切換週期也只重跑這一塊
+    import numpy as np
+    from intraday_stats import prev_close
+    from charts import build_vwap_figure
+    k_type = st.radio("K線週期", ["1分K", "5分K", "15分K", "60分K"], horizontal=True, label_visibility="collapsed")
+    k_inv = {"1分K": "1m", "5分K": "5m", "15分K": "15m", "60分K": "60m"}[k_type]
+    df_bot = engine.fetch_kline(code, interval=k_inv, period="1d") # 當沖看分K (由1分K重取樣)
+    if df_bot.empty:
+        st.warning("讀取即時走勢中...")
+        return
+    show_vwap = st.toggle("VWAP / 分價量表", value=True, key="intraday_vwap")
+    if not show_vwap:
+        show_chart(plot_chinese_chart(df_bot, f"{name} 即時走勢 ({k_type})", entry_price, source=(code, k_inv), trigger_label="目標價"), use_container_width=True)
+        return
+    # VWAP 一律以 1 分K 累計 (與週期無關)，只併入新收完的 K 棒
+    df_1m = df_bot if k_inv == "1m" else engine.fetch_kline(code, interval="1m", period="1d")
+    ref = prev_close(engine.fetch_kline(code, interval="1d", period="1mo"), df_1m['date'].iloc[-1])
+    s, vwap, profile = get_intraday_book().update(code, df_1m, ref)
+    if s:
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("VWAP", f"{s['vwap']:.2f}", f"{s['vwap_dev_pct']:+.2f}% (σ {s['vwap_std']:.2f})", delta_color="off")
+        m2.metric("日高 / 日低", f"{s['high']:.2f} / {s['low']:.2f}", f"振幅 {s['range_pct']:.2f}%", delta_color="off")
+        m3.metric("區間位置", f"{s['range_pos_pct']:.0f}%", f"POC {s['poc']:.2f}" if not np.isnan(s['poc']) else None, delta_color="off")
+        m4.metric("紅 / 黑 K", f"{s['up_bars']} / {s['down_bars']}", f"平均 1 分振幅 {s['avg_bar_range']:.2f}" if not np.isnan(s['avg_bar_range']) else None, delta_color="off")
+    show_chart(build_vwap_figure(df_bot, f"{name} 即時走勢 ({k_type})", vwap, profile, entry_price, poc=s.get('poc')),
+                    use_container_width=True)
+
+@timed("render.bot")
 def render_bot():
+    from trade_costs import trade_costs
     st.markdown("<div class='nav-bar'><span class='nav-title'>⚡ 當沖戰情室 (Day Trading Room)</span></div>", unsafe_allow_html=True)
     
     # 側邊欄設定
@@ -391,7 +187,7 @@ def render_bot():
         with st.container(border=True):
             # 輸入區
             c1, c2 = st.columns([1, 1])
-            code = c1.text_input("股票代號", "2330")
+            code = pick_symbol(c1, c1.text_input("股票代號 / 名稱", "2330"), "calc_pick")
             direction = c2.selectbox("操作方向", ["🔴 做多 (先買後賣)", "🟢 做空 (先賣後買)"])
             
             # 自動抓取現價
@@ -406,26 +202,12 @@ def render_bot():
             exit_price = st.number_input("預計/目標出場價 ($)", value=current_price + (1.0 if "做多" in direction else -1.0), step=0.5, format="%.2f")
             
             # === 核心計算邏輯 ===
-            trade_val = entry_price * qty * 1000
-            fee_rate = 0.001425 * discount
-            tax_rate = 0.0015 # 當沖稅率
-            
-            # 手續費 (進出都要)
-            fee_in = trade_val * fee_rate
-            fee_out = (exit_price * qty * 1000) * fee_rate
-            total_fee = max(20, fee_in) + max(20, fee_out) # 最低手續費20元
-            
-            # 證交稅 (只在賣出時收)
+            # 手續費進出都要 (最低 20 元)；證交稅只在賣出時收
             # 做多: 買進(無) -> 賣出(有)
             # 做空: 賣出(有) -> 買進(無) (註: 借券賣出要稅，回補不用，這裡簡化為當沖稅制)
-            tax = 0.0
-            if "做多" in direction:
-                tax = (exit_price * qty * 1000) * tax_rate
-                gross_pl = (exit_price - entry_price) * qty * 1000
-            else:
-                tax = (entry_price * qty * 1000) * tax_rate # 先賣出時扣稅
-                gross_pl = (entry_price - exit_price) * qty * 1000
-                
+            is_long = "做多" in direction
+            trade_val = entry_price * qty * 1000
+            gross_pl, total_fee, tax = (float(v) for v in trade_costs(entry_price, exit_price, qty, is_long, discount))
             net_pl = gross_pl - total_fee - tax
             
             # 顯示結果
@@ -458,15 +240,13 @@ def render_bot():
                     "pl": net_pl
                 })
                 st.success("已加入紀錄！")
+
+        render_pl_scenarios(entry_price, is_long, discount)
     
     # === 右側：走勢圖與紀錄 ===
     with col_chart:
         st.markdown(f"### 📈 走勢監控: {name} ({code})")
-        df_bot = engine.fetch_kline(code, interval="1m", period="1d") # 當沖看1分K
-        if not df_bot.empty:
-            st.plotly_chart(plot_chinese_chart(df_bot, f"{name} 即時走勢", entry_price), use_container_width=True)
-        else:
-            st.warning("讀取即時走勢中...")
+        render_intraday_chart(code, name, entry_price)
             
         st.markdown("### 📋 當沖試算紀錄簿")
         if st.session_state.trade_history:
@@ -490,17 +270,36 @@ def render_bot():
         else:
             st.info("尚無紀錄，請由左側新增")
 
+    # === 下方：網格交易模擬 ===
+    st.divider()
+    st.markdown("### 🕸️ 網格交易模擬 (當日 1 分K)")
+    with st.container(border=True):
+        base = current_price or 100.0
+        g1, g2, g3, g4 = st.columns(4)
+        g_upper = g1.number_input("網格上限 ($)", value=round(base * 1.03, 2), step=0.5, format="%.2f", key="grid_upper")
+        g_lower = g2.number_input("網格下限 ($)", value=round(base * 0.97, 2), step=0.5, format="%.2f", key="grid_lower")
+        g_levels = g3.number_input("格數", value=10, min_value=2, max_value=100, key="grid_levels")
+        g_lots = g4.number_input("每格張數", value=1, min_value=1, key="grid_lots")
+        render_grid_sim(code, g_lower, g_upper, int(g_levels), int(g_lots), discount)
+
 # ==========================================
 # 6. 主程式導航 (保留原樣，修改選單名稱)
 # ==========================================
+get_metrics_server()   # Prometheus 端點，每個行程只啟動一次
+
 with st.sidebar:
     st.title("🕵️ 股市特務 X")
     st.markdown("---")
     module = st.radio("導航", ["📊 股市情報站", "⚡ 當沖戰情室"])
     st.markdown("---")
     if st.button("清除快取"):
-        st.cache_data.clear()
+        clear_caches()
         st.rerun()
+    render_replay_panel()
+    render_upstream_status()
+    render_master_status()
+    st.markdown("---")
+    render_admin_panel()
 
 if module == "📊 股市情報站":
     render_dashboard()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from trade_costs import net_pl, round_to_tick, LOT_SHARES
+
+# ==========================================
+# 當沖網格模擬：上下限之間等分 N 格 (對齊升降單位)，每格跌到就買、漲到上一格就賣
+#   以當日 1 分K 逐根撮合；每次刷新只處理新收完的 K 棒，不從開盤重跑
+#   K 棒內路徑假設：收紅 開→低→高→收，收黑 開→高→低→收；前一根收盤→開盤為跳空，穿過的價位都以開盤價成交
+#   每一組 (第 k 格買、第 k+1 格賣) 為一筆當沖，手續費 / 證交稅沿用當沖試算
+# ==========================================
+BUY = "BUY"
+SELL = "SELL"
+
+def grid_levels(lower, upper, n_levels):
+    return np.unique(round_to_tick(np.linspace(lower, upper, n_levels)))
+
+class GridSimulator:
+    def __init__(self, lower, upper, n_levels, lots=1, discount=1.0):
+        self.levels = grid_levels(lower, upper, n_levels)
+        self.lots = lots
+        self.discount = discount
+        n = len(self.levels)
+        self.holding = np.zeros(n, dtype=bool)     # 第 k 格已買進，等第 k+1 格賣出
+        self.buy_armed = np.zeros(n, dtype=bool)   # 第 k 格掛著買單
+        self.cost = np.zeros(n)                    # 第 k 格實際買進價
+        self.started = False
+        self.last_ts = None
+        self.last_price = None
+        self.realized = 0.0
+        self.fills = []
+
+    def _start(self, price):
+        # 開始時只在現價之下掛買單；最上面一格沒有更上一格可賣，不掛
+        self.buy_armed = self.levels < price
+        self.buy_armed[-1] = False
+        self.started = True
+
+    def _down(self, ts, start, end, gap=False):
+        # 由 start 跌到 end：價位落在 [end, start) 的買單成交；跳空 (開盤) 沒有中間價，一律以 end 成交
+        hit = np.flatnonzero(self.buy_armed & (self.levels >= end) & (self.levels < start))
+        if not hit.size: return
+        price = np.full(hit.size, end) if gap else self.levels[hit]
+        self.buy_armed[hit] = False
+        self.holding[hit] = True
+        self.cost[hit] = price
+        for k, p in zip(hit.tolist(), price.tolist()):
+            self.fills.append({"time": ts, "side": BUY, "level": k, "price": p, "lots": self.lots, "pl": 0.0})
+
+    def _up(self, ts, start, end, gap=False):
+        # 由 start 漲到 end：持有部位的上一格落在 (start, end] 就賣出，並在原格重新掛買單；跳空以 end 成交
+        target = np.append(self.levels[1:], np.inf)
+        hit = np.flatnonzero(self.holding & (target > start) & (target <= end))
+        if not hit.size: return
+        price = np.full(hit.size, end) if gap else target[hit]
+        pl = net_pl(self.cost[hit], price, self.lots, True, self.discount)
+        self.holding[hit] = False
+        self.buy_armed[hit] = True
+        self.realized += float(pl.sum())
+        for k, p, v in zip(hit.tolist(), price.tolist(), np.atleast_1d(pl).tolist()):
+            self.fills.append({"time": ts, "side": SELL, "level": k + 1, "price": p, "lots": self.lots, "pl": v})
+
+    def _bar(self, ts, o, h, l, c):
+        if not self.started: self._start(o)
+        prev = self.last_price if self.last_price is not None else o
+        path = (prev, o, l, h, c) if c >= o else (prev, o, h, l, c)
+        for i, (a, b) in enumerate(zip(path[:-1], path[1:])):
+            if b < a: self._down(ts, a, b, gap=i == 0)
+            elif b > a: self._up(ts, a, b, gap=i == 0)
+        self.last_price = c
+
+    def update(self, df, final=False):
+        # 只處理上次之後、已經收完的 K 棒；盤中最後一根還在變動，等下一次 (或 final=True) 再算
+        if df.empty: return 0
+        new = df if self.last_ts is None else df[df['date'] > self.last_ts]
+        if not final: new = new[new['date'] < df['date'].iloc[-1]]
+        if new.empty: return 0
+        for ts, o, h, l, c in zip(new['date'], new['open'].to_numpy(dtype=float), new['high'].to_numpy(dtype=float),
+                                  new['low'].to_numpy(dtype=float), new['close'].to_numpy(dtype=float)):
+            self._bar(ts, o, h, l, c)
+        self.last_ts = new['date'].iloc[-1]
+        return len(new)
+
+    def summary(self, price=None):
+        price = self.last_price if price is None else price
+        held = int(self.holding.sum())
+        avg_cost = float(self.cost[self.holding].mean()) if held else 0.0
+        unrealized = float((price - self.cost[self.holding]).sum() * self.lots * LOT_SHARES) if held and price else 0.0
+        sells = [f for f in self.fills if f['side'] == SELL]
+        return {"realized": self.realized, "unrealized": unrealized, "inventory": held * self.lots, "avg_cost": avg_cost,
+                "round_trips": len(sells), "wins": sum(1 for f in sells if f['pl'] > 0), "last_ts": self.last_ts}
+
+    def fill_table(self):
+        return pd.DataFrame(self.fills, columns=["time", "side", "level", "price", "lots", "pl"])
@@ -0,0 +1,181 @@
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ==========================================
+# 技術指標：MA5/20/60、EMA20、RSI14、MACD(12,26,9)、布林通道(20,2)、KD(9,3,3)、ATR14
+#   以 NumPy 向量化計算，並保存「到倒數第二根為止」的遞迴狀態 (EMA、均值、KD、尾端 K 棒)；
+#   新 K 棒進來只算新增的部分 (最後一根盤中還在變，每次重算)
+#   IndicatorCache 依 (代號, 週期, 區間) 共用，圖表、選股、機器人讀同一份，不各算一次
+#   區間往後滑時遞迴指標 (EMA/MACD/RSI/ATR/KD) 沿用視窗外的歷史，等同從第一次看到的那根起整段計算；
+#   與「只拿目前視窗重算」只差在開頭的暖機段，差距以 (1-α)^k 衰減，WARMUP 根之後相對誤差 < DRIFT_TOL
+#   (MA / 布林是固定視窗，完全一致)；drift() 供壓測檢查
+# ==========================================
+MA_WINDOWS = (5, 20, 60)
+BB_WINDOW, BB_K = 20, 2
+KD_WINDOW = 9
+RSI_N = ATR_N = 14
+TAIL = max(MA_WINDOWS) - 1
+WARMUP = 200             # 最慢的 Wilder 平滑 (α=1/14) 約 186 根衰減到 1e-6
+DRIFT_TOL = 1e-4
+
+COLUMNS = ['ma5', 'ma20', 'ma60', 'ema20', 'rsi', 'macd', 'macd_signal', 'macd_hist',
+           'bb_upper', 'bb_mid', 'bb_lower', 'k', 'd', 'atr']
+
+# 畫圖用：疊在 K 線上的與另開子圖的
+OVERLAYS = {"MA5": ['ma5'], "MA20": ['ma20'], "MA60": ['ma60'], "EMA20": ['ema20'], "布林通道": ['bb_upper', 'bb_mid', 'bb_lower']}
+SUBPLOTS = {"RSI": ['rsi'], "MACD": ['macd', 'macd_signal', 'macd_hist'], "KD": ['k', 'd'], "ATR": ['atr']}
+
+def _ewm(x, alpha, prev=None):
+    # adjust=False 的 EMA；prev 為上一根的值，接續計算 (把它放在最前面再丟掉)
+    if x.size == 0: return x
+    if prev is None: return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return pd.Series(np.concatenate([[prev], x])).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+def _rolling_mean(full, start, window):
+    # full = 尾端歷史 + 新資料；回傳 full[start:] 每個位置的 window 期均值，歷史不足為 NaN
+    cs = np.concatenate([[0.0], np.cumsum(full)])
+    end = np.arange(start, len(full)) + 1
+    out = np.full(end.size, np.nan)
+    ok = end >= window
+    out[ok] = (cs[end[ok]] - cs[end[ok] - window]) / window
+    return out
+
+def _rolling(full, start, window, func, fill):
+    # 視窗不足時用 fill 補齊 (nanmax / nanmin / nanstd 會忽略)
+    pad = np.concatenate([np.full(window - 1, fill), full])
+    return func(sliding_window_view(pad, window)[start:], axis=1)
+
+def drift(a, b, warmup=WARMUP):
+    # 兩份指標 (增量 vs 整段重算) 在暖機段之後的最大相對誤差
+    x, y = a.to_numpy(dtype=float)[warmup:], b.to_numpy(dtype=float)[warmup:]
+    with np.errstate(invalid='ignore'):
+        d = np.abs(x - y) / np.maximum(np.abs(y), 1.0)
+    return float(np.nanmax(d)) if np.isfinite(d).any() else 0.0
+
+class IndicatorState:
+    def __init__(self, capacity=256):
+        self.rebuilds = 0         # 對不上而整段重算的次數 (量測用)
+        self.reset(capacity)
+
+    def reset(self, capacity=256):
+        self.values = np.full((len(COLUMNS), capacity), np.nan)
+        self.ts = np.empty(capacity, dtype='datetime64[ns]')   # 已定案各根的時間
+        self.n = 0                # 已定案的筆數 (不含最後一根)
+        self.first_ts = None
+        self.last_ts = None       # 已定案最後一根的時間
+        self.tail_c = np.empty(0)
+        self.tail_h = np.empty(0)
+        self.tail_l = np.empty(0)
+        self.prev = {}            # 遞迴狀態：close、ema12/20/26、signal、gain、loss、k、d、atr
+
+    def _reserve(self, n):
+        if n <= self.values.shape[1]: return
+        grown = np.full((len(COLUMNS), max(n, self.values.shape[1] * 2)), np.nan)
+        grown[:, :self.n] = self.values[:, :self.n]
+        ts = np.empty(grown.shape[1], dtype=self.ts.dtype)
+        ts[:self.n] = self.ts[:self.n]
+        self.values, self.ts = grown, ts
+
+    def _align(self, dates):
+        # 依時間對齊已定案的 K 棒：fetch_kline 的區間會往後滑 (開頭掉幾根)，只丟掉前面照樣增量；對不上回傳 False
+        if self.first_ts is None: return False
+        if not self.n: return dates.iloc[0] == self.first_ts
+        j = int(dates.searchsorted(self.last_ts))
+        drop = self.n - 1 - j
+        if j >= len(dates) - 1 or dates.iloc[j] != self.last_ts or drop < 0 or dates.iloc[0] != self.ts[drop]: return False
+        if drop:
+            self.values, self.ts = self.values[:, drop:], self.ts[drop:]
+            self.n -= drop
+        self.first_ts = dates.iloc[0]
+        return True
+
+    def _compute(self, h, l, c):
+        p = self.prev
+        full_c = np.concatenate([self.tail_c, c])
+        full_h = np.concatenate([self.tail_h, h])
+        full_l = np.concatenate([self.tail_l, l])
+        s = len(self.tail_c)
+        out, nxt = {}, {}
+
+        for w in MA_WINDOWS: out[f'ma{w}'] = _rolling_mean(full_c, s, w)
+        ema = {}
+        for n in (12, 20, 26): ema[n] = nxt[f'ema{n}'] = _ewm(c, 2 / (n + 1), p.get(f'ema{n}'))
+        out['ema20'] = ema[20]
+        macd = ema[12] - ema[26]
+        sig = nxt['signal'] = _ewm(macd, 2 / 10, p.get('signal'))
+        out['macd'], out['macd_signal'], out['macd_hist'] = macd, sig, macd - sig
+
+        # RSI / ATR (Wilder)：第一根沒有前一根收盤，RSI 從第二根開始
+        prev_c = np.concatenate([[p['close']], c[:-1]]) if 'close' in p else np.concatenate([[np.nan], c[:-1]])
+        diff = c - prev_c
+        has = ~np.isnan(diff)
+        gain, loss = np.full(c.size, np.nan), np.full(c.size, np.nan)
+        gain[has] = _ewm(np.maximum(diff[has], 0), 1 / RSI_N, p.get('gain'))
+        loss[has] = _ewm(np.maximum(-diff[has], 0), 1 / RSI_N, p.get('loss'))
+        nxt['gain'], nxt['loss'] = gain, loss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['rsi'] = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+        out['rsi'][~has] = np.nan
+        tr = np.fmax(h - l, np.fmax(np.abs(h - prev_c), np.abs(l - prev_c)))
+        out['atr'] = nxt['atr'] = _ewm(tr, 1 / ATR_N, p.get('atr'))
+
+        mid = out['ma20']
+        std = _rolling(full_c, s, BB_WINDOW, np.nanstd, np.nan)
+        std[np.isnan(mid)] = np.nan
+        out['bb_mid'], out['bb_upper'], out['bb_lower'] = mid, mid + BB_K * std, mid - BB_K * std
+
+        # KD (台灣慣用)：RSV 取近 9 根高低，K、D 以 1/3 平滑，起始值 50
+        hh = _rolling(full_h, s, KD_WINDOW, np.nanmax, np.nan)
+        ll = _rolling(full_l, s, KD_WINDOW, np.nanmin, np.nan)
+        rng = hh - ll
+        rsv = np.where(rng > 0, (c - ll) / np.where(rng > 0, rng, 1) * 100, 50.0)
+        k = nxt['k'] = _ewm(rsv, 1 / 3, p.get('k', 50.0))
+        out['k'], out['d'] = k, _ewm(k, 1 / 3, p.get('d', 50.0))
+        nxt['d'] = out['d']
+        nxt['close'] = c
+        return out, nxt, (full_c, full_h, full_l)
+
+    def update(self, df):
+        # 回傳與 df 對齊的指標 DataFrame；已定案的 K 棒對不上 (改了歷史、區間往前拉長) 才整段重算
+        if df.empty: return pd.DataFrame(columns=COLUMNS)
+        dates = df['date']
+        if not self._align(dates):
+            if self.first_ts is not None: self.rebuilds += 1
+            self.reset(max(256, len(df) * 2))
+            self.first_ts = dates.iloc[0]
+        new = df.iloc[self.n:]
+        h, l, c = (new[col].to_numpy(dtype=float) for col in ('high', 'low', 'close'))
+        out, nxt, fulls = self._compute(h, l, c)
+
+        self._reserve(self.n + len(new))
+        for r, col in enumerate(COLUMNS): self.values[r, self.n:self.n + len(new)] = out[col]
+        if len(new) >= 2:
+            # 定案到倒數第二根，最後一根下次再算
+            self.prev = {key: float(v[-2]) for key, v in nxt.items() if not np.isnan(v[-2])}
+            keep = len(fulls[0]) - 1
+            self.tail_c, self.tail_h, self.tail_l = (f[max(0, keep - TAIL):keep] for f in fulls)
+            self.ts[self.n:self.n + len(new) - 1] = dates.iloc[self.n:self.n + len(new) - 1].to_numpy()
+            self.n += len(new) - 1
+            self.last_ts = dates.iloc[self.n - 1]
+        return pd.DataFrame(self.values[:, :len(df)].T, columns=COLUMNS, index=df.index)
+
+class IndicatorCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._items = OrderedDict()    # key -> (IndicatorState, Lock)
+        self._lock = threading.Lock()
+
+    def get(self, key, df):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None: item = self._items[key] = (IndicatorState(), threading.Lock())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries: self._items.popitem(last=False)
+        state, lock = item
+        with lock: return state.update(df)
+
+    def clear(self):
+        with self._lock: self._items.clear()
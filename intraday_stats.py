@@ -0,0 +1,168 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 當沖盤中統計：VWAP (含標準差帶)、分價量表、日內振幅
+#   每檔一組固定大小的 NumPy 環狀緩衝 (1 分K)，累計量只加新收完的 K 棒；
+#   盤中最後一根還在變動，讀取時才臨時併入，不回寫
+#   台股漲跌幅 ±10%，分價量表直接以平盤價 (昨收) ±10% 切固定格數；沒給昨收才退回當日開盤價
+# ==========================================
+RING_SIZE = 512          # 一天 270 根 1 分K，留餘裕
+PROFILE_BINS = 80
+LIMIT_PCT = 0.10
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+class IntradayStats:
+    def __init__(self, ring_size=RING_SIZE, bins=PROFILE_BINS):
+        self.ring_size = ring_size
+        self.bins = bins
+        self.reset(None)
+
+    def reset(self, day):
+        n = self.ring_size
+        self.day = day
+        self.ts = np.zeros(n, dtype='datetime64[ns]')
+        self.bars = np.zeros((len(FIELDS), n))
+        self.vwap = np.full(n, np.nan)     # 每根收完時的累計 VWAP 與標準差，畫帶狀用
+        self.std = np.full(n, np.nan)
+        self.count = 0                     # 已收完 (定案) 的 K 棒數，可能大於 ring_size
+        self.last_ts = None
+        self.live = None                   # 盤中最後一根 (ts, o, h, l, c, v)
+        self.tz = None                     # 緩衝內一律存無時區時間，輸出時再掛回
+        self.sum_v = self.sum_pv = self.sum_p2v = 0.0
+        self.ref = None                    # 分價量表基準價 (昨收，沒有則為當日第一根開盤)
+        self.profile = np.zeros(self.bins)
+        self.edges = None
+        self.day_open = self.day_high = self.day_low = None
+        self.high_ts = self.low_ts = None
+        self.up_bars = self.down_bars = 0
+        self.sum_bar_range = 0.0
+
+    def _bins_for(self, lo, hi):
+        # 回傳 [lo, hi] 覆蓋到的格索引範圍
+        a = np.clip(np.searchsorted(self.edges, lo, 'right') - 1, 0, self.bins - 1)
+        b = np.clip(np.searchsorted(self.edges, hi, 'right') - 1, 0, self.bins - 1)
+        return a, b
+
+    def _profile_add(self, profile, h, l, v):
+        # 每根 K 棒的量平均攤到最低~最高涵蓋的價格格
+        a, b = self._bins_for(l, h)
+        counts = b - a + 1
+        diff = np.zeros(self.bins + 1)
+        np.add.at(diff, a, v / counts)
+        np.add.at(diff, b + 1, -v / counts)
+        profile += np.cumsum(diff[:-1])
+
+    def _commit(self, ts, o, h, l, c, v, prev_close=None):
+        if self.ref is None:
+            self.ref = float(prev_close) if prev_close else float(o[0])
+            self.edges = np.linspace(self.ref * (1 - LIMIT_PCT), self.ref * (1 + LIMIT_PCT), self.bins + 1)
+            self.day_open, self.day_high, self.day_low = float(o[0]), -np.inf, np.inf
+        tp = (h + l + c) / 3
+        cum_v = self.sum_v + np.cumsum(v)
+        cum_pv = self.sum_pv + np.cumsum(tp * v)
+        cum_p2v = self.sum_p2v + np.cumsum(tp * tp * v)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vwap = np.where(cum_v > 0, cum_pv / cum_v, np.nan)
+            std = np.sqrt(np.maximum(cum_p2v / cum_v - vwap * vwap, 0))
+        k = len(c)
+        pos = (self.count + np.arange(k)) % self.ring_size
+        self.ts[pos] = ts
+        for r, arr in enumerate((o, h, l, c, v)): self.bars[r, pos] = arr
+        self.vwap[pos], self.std[pos] = vwap, std
+        self.sum_v, self.sum_pv, self.sum_p2v = float(cum_v[-1]), float(cum_pv[-1]), float(cum_p2v[-1])
+        self._profile_add(self.profile, h, l, v)
+        i_hi, i_lo = int(np.argmax(h)), int(np.argmin(l))
+        if h[i_hi] > self.day_high: self.day_high, self.high_ts = float(h[i_hi]), ts[i_hi]
+        if l[i_lo] < self.day_low: self.day_low, self.low_ts = float(l[i_lo]), ts[i_lo]
+        self.up_bars += int((c > o).sum())
+        self.down_bars += int((c < o).sum())
+        self.sum_bar_range += float((h - l).sum())
+        self.count += k
+        self.last_ts = ts[-1]
+
+    def update(self, df, prev_close=None):
+        # df：當日 1 分K；只把上次之後、最後一根以前的 K 棒併入累計；prev_close 決定分價量表的漲跌停範圍
+        if df.empty: return
+        dates = pd.DatetimeIndex(df['date'])
+        day = dates[-1].date()
+        if day != self.day: self.reset(day)
+        self.tz = dates.tz
+        ts = dates.tz_localize(None).to_numpy() if dates.tz is not None else dates.to_numpy()
+        start = 0 if self.last_ts is None else int(np.searchsorted(ts, self.last_ts, 'right'))
+        end = len(df) - 1
+        if start < end:
+            cols = [df[f].to_numpy(dtype=float)[start:end] for f in FIELDS]
+            self._commit(ts[start:end], *cols, prev_close=prev_close)
+        self.live = (ts[-1], *(float(df[f].iloc[-1]) for f in FIELDS)) if start <= end else None
+
+    def _with_live(self):
+        # 定案累計 + 盤中最後一根
+        sum_v, sum_pv, sum_p2v = self.sum_v, self.sum_pv, self.sum_p2v
+        hi, lo, profile = self.day_high, self.day_low, self.profile
+        live = self.live
+        if live and self.ref is not None:
+            _, o, h, l, c, v = live
+            tp = (h + l + c) / 3
+            sum_v, sum_pv, sum_p2v = sum_v + v, sum_pv + tp * v, sum_p2v + tp * tp * v
+            hi, lo = max(hi, h), min(lo, l)
+            profile = profile.copy()
+            self._profile_add(profile, np.array([h]), np.array([l]), np.array([v]))
+        return sum_v, sum_pv, sum_p2v, hi, lo, profile
+
+    def series(self):
+        # 依時間排序的 [date, vwap, upper1, lower1, upper2, lower2] (環狀緩衝內的部分)
+        n = min(self.count, self.ring_size)
+        order = (self.count - n + np.arange(n)) % self.ring_size
+        vwap, std = self.vwap[order], self.std[order]
+        dates = pd.DatetimeIndex(self.ts[order])
+        if self.tz is not None: dates = dates.tz_localize(self.tz)
+        return pd.DataFrame({'date': dates, 'vwap': vwap, 'upper1': vwap + std, 'lower1': vwap - std,
+                             'upper2': vwap + 2 * std, 'lower2': vwap - 2 * std})
+
+    def volume_profile(self):
+        _, _, _, _, _, profile = self._with_live()
+        if self.edges is None: return pd.DataFrame(columns=['price', 'volume'])
+        return pd.DataFrame({'price': (self.edges[:-1] + self.edges[1:]) / 2, 'volume': profile})
+
+    def summary(self):
+        if self.ref is None: return {}
+        sum_v, sum_pv, sum_p2v, hi, lo, profile = self._with_live()
+        live = self.live
+        last = live[4] if live else float(self.bars[3, (self.count - 1) % self.ring_size])
+        vwap = sum_pv / sum_v if sum_v else np.nan
+        std = np.sqrt(max(sum_p2v / sum_v - vwap * vwap, 0)) if sum_v else np.nan
+        rng = hi - lo
+        n_bars = self.count + (1 if live else 0)
+        return {
+            "last": last, "vwap": vwap, "vwap_std": std, "vwap_dev_pct": (last / vwap - 1) * 100 if sum_v else np.nan,
+            "open": self.day_open, "high": hi, "low": lo, "range": rng, "range_pct": rng / self.day_open * 100,
+            "range_pos_pct": (last - lo) / rng * 100 if rng > 0 else 50.0,
+            "poc": float((self.edges[:-1] + self.edges[1:])[int(np.argmax(profile))] / 2) if profile.any() else np.nan,
+            "avg_bar_range": self.sum_bar_range / self.count if self.count else np.nan,
+            "up_bars": self.up_bars, "down_bars": self.down_bars, "bars": n_bars, "volume": sum_v,
+            "high_ts": self.high_ts, "low_ts": self.low_ts,
+        }
+
+def prev_close(daily, day):
+    # 日K 中當日之前最後一根的收盤 = 平盤價；拿不到回傳 None
+    if daily is None or daily.empty: return None
+    prior = daily[pd.to_datetime(daily['date']) < pd.Timestamp(day).normalize()]
+    return float(prior['close'].iloc[-1]) if not prior.empty else None
+
+class IntradayBook:
+    # 每檔一組 IntradayStats，跨 session 共用
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def update(self, ticker, df, prev_close=None):
+        # 回傳 (summary, VWAP 序列, 分價量表)，在同一把鎖內取出，不會讀到更新一半的緩衝
+        with self._lock: stats, lock = self._stats.setdefault(ticker, (IntradayStats(), threading.Lock()))
+        with lock:
+            stats.update(df, prev_close)
+            return stats.summary(), stats.series(), stats.volume_profile()
+
+    def clear(self):
+        with self._lock: self._stats.clear()
@@ -0,0 +1,150 @@
+import time
+import threading
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from metrics import record_error, record_bytes
+from scheduler import TokenBucket
+
+# ==========================================
+# LINE Messaging API 非同步發送器
+#   按鈕只負責排入佇列；背景執行緒以共用連線池發送，限流、重試、合併同一人的短時間通知
+# ==========================================
+PUSH_URL = "https://api.line.me/v2/bot/message/push"
+MULTICAST_URL = "https://api.line.me/v2/bot/message/multicast"
+PUSH_RATE_LIMIT = 2000       # LINE 官方上限：push 2,000 次/秒
+MULTICAST_RATE_LIMIT = 200   # multicast 200 次/秒
+MULTICAST_MAX_TO = 500       # multicast 一次最多 500 個 userId
+MAX_TEXT_LEN = 5000          # 單則文字訊息上限
+MAX_MESSAGES = 5             # 單次請求最多 5 則訊息
+MERGE_SEPARATOR = "\n\n"
+
+def split_messages(texts):
+    # 合併後的文字切成 ≤5000 字的訊息，每 5 則一個請求
+    merged = MERGE_SEPARATOR.join(texts)
+    chunks = [merged[i:i + MAX_TEXT_LEN] for i in range(0, len(merged), MAX_TEXT_LEN)] or [""]
+    msgs = [{"type": "text", "text": c} for c in chunks]
+    return [msgs[i:i + MAX_MESSAGES] for i in range(0, len(msgs), MAX_MESSAGES)]
+
+class LineDispatcher:
+    def __init__(self, max_concurrency=4, merge_window=2.0, max_retries=3, timeout=5, keep_results=500):
+        self.merge_window = merge_window
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.keep_results = keep_results
+        import requests   # 只有機器人頁 / 背景監控會建立，延後載入
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=max_concurrency))
+        self.buckets = {"push": TokenBucket(PUSH_RATE_LIMIT), "multicast": TokenBucket(MULTICAST_RATE_LIMIT)}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._cond = threading.Condition()
+        self._pending = {}               # (token, user_id) -> {"texts", "jobs", "due"}
+        self._inflight = 0
+        self._ids = itertools.count(1)
+        self.results = OrderedDict()     # job_id -> {"status", "to", "text", "ts", "error"}
+        threading.Thread(target=self._run, name="line-dispatcher", daemon=True).start()
+
+    def _new_job(self, to, text):
+        job_id = next(self._ids)
+        self.results[job_id] = {"status": "queued", "to": to, "text": text[:40], "ts": time.time(), "error": ""}
+        while len(self.results) > self.keep_results: self.results.popitem(last=False)
+        return job_id
+
+    def push(self, token, user_id, message):
+        # 同一人 merge_window 秒內的多則通知合併成一次 push
+        if not token or not user_id: return None
+        with self._cond:
+            job_id = self._new_job(user_id, message)
+            entry = self._pending.get((token, user_id))
+            if entry is None:
+                entry = self._pending[(token, user_id)] = {"texts": [], "jobs": [], "due": time.monotonic() + self.merge_window}
+            entry["texts"].append(message)
+            entry["jobs"].append(job_id)
+            self._cond.notify()
+        return job_id
+
+    def multicast(self, token, user_ids, message):
+        # 同一則訊息發給多人，每 500 人一次請求
+        user_ids = list(dict.fromkeys(u for u in user_ids if u))
+        if not token or not user_ids: return []
+        jobs = []
+        with self._cond:
+            for i in range(0, len(user_ids), MULTICAST_MAX_TO):
+                to = user_ids[i:i + MULTICAST_MAX_TO]
+                job_id = self._new_job(f"{len(to)} 人", message)
+                jobs.append(job_id)
+                self._inflight += 1
+                self._pool.submit(self._deliver, "multicast", token, to, [message], [job_id])
+        return jobs
+
+    def status(self, job_id):
+        return self.results.get(job_id)
+
+    def recent(self, n=10):
+        return list(self.results.items())[-n:][::-1]
+
+    def flush(self, timeout=30):
+        # 等佇列與發送中的請求全部完成 (背景程式結束前用)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            for entry in self._pending.values(): entry["due"] = 0
+            self._cond.notify()
+            while (self._pending or self._inflight) and time.monotonic() < deadline:
+                self._cond.wait(0.1)
+        return not (self._pending or self._inflight)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [k for k, e in self._pending.items() if e["due"] <= now]
+                    if due: break
+                    nxt = min((e["due"] for e in self._pending.values()), default=None)
+                    self._cond.wait(None if nxt is None else max(0.0, nxt - now))
+                batch = [(k, self._pending.pop(k)) for k in due]
+                self._inflight += len(batch)
+            for (token, user_id), entry in batch:
+                self._pool.submit(self._deliver, "push", token, user_id, entry["texts"], entry["jobs"])
+
+    def _deliver(self, kind, token, to, texts, jobs):
+        url = PUSH_URL if kind == "push" else MULTICAST_URL
+        headers = {"Content-Type": "application/json", "Authorization": "Bearer " + token}
+        status, error = "sent", ""
+        try:
+            for messages in split_messages(texts):
+                ok, error = self._post(kind, url, headers, {"to": to, "messages": messages})
+                if not ok:
+                    status = "failed"
+                    break
+        finally:
+            with self._cond:
+                for job_id in jobs:
+                    if job_id in self.results: self.results[job_id].update(status=status, error=error, ts=time.time())
+                self._inflight -= 1
+                self._cond.notify_all()
+
+    def _post(self, kind, url, headers, payload):
+        # 429 / 5xx / 連線錯誤以指數退避重試；其他 4xx (token 錯、userId 錯) 直接失敗
+        import requests
+        error = ""
+        for attempt in range(self.max_retries + 1):
+            self.buckets[kind].acquire()
+            retry_after = None
+            try:
+                resp = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+                record_bytes("line", len(resp.content))
+                if resp.status_code == 200: return True, ""
+                error = f"HTTP {resp.status_code}"
+                record_error("line", error)
+                if resp.status_code != 429 and resp.status_code < 500: return False, error
+                retry_after = resp.headers.get("Retry-After")
+            except requests.RequestException as e:
+                error = type(e).__name__
+                record_error("line", e)
+            if attempt < self.max_retries:
+                try: delay = float(retry_after) if retry_after else 0.5 * (2 ** attempt)
+                except ValueError: delay = 0.5 * (2 ** attempt)
+                time.sleep(min(delay, 30))
+        return False, error
@@ -0,0 +1,105 @@
+import re
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from symbols import get_master
+from metrics import record_error, record_rows
+from providers import TW_TZ, SESSION_OPEN, SESSION_CLOSE, get_provider
+from scheduler import QUOTE, UpstreamUnavailable, get_scheduler, non_empty, has_rows
+
+# ==========================================
+# 行情批次下載 (app.py / grid_bot.py 共用)
+#   上游一律經由 providers.get_provider() (yahoo / local / replay)，並經 scheduler 排隊 (機器人傳 priority=BOT)
+# ==========================================
+
+def to_symbol(ticker):
+    # 上市 .TW / 上櫃 .TWO 依代號主檔決定，不在主檔內的預設 .TW
+    if not re.search(r'\.TWO?$', ticker) and not ticker.startswith('^'): ticker += get_master().suffix(ticker)
+    return ticker
+
+def clean_code(symbol):
+    return re.sub(r'\.TWO?$', '', symbol)
+
+def build_quote(df, name):
+    # 與原 fetch_quote 相同：最後一根 K 與前一根比較
+    if df is None or df.empty: return None
+    df = df.dropna(subset=['Close'])
+    if df.empty: return None
+
+    last = df.iloc[-1]
+    price = float(last['Close'])
+
+    change = 0.0
+    pct = 0.0
+    if len(df) > 1:
+        prev = df.iloc[-2]['Close']
+        change = price - prev
+        pct = (change / prev) * 100
+
+    return {
+        "name": name, "price": price, "change": change,
+        "pct": pct, "vol": last['Volume'],
+        "open": last['Open'], "high": last['High'], "low": last['Low']
+    }
+
+def fetch_single_quote(symbol, name, priority=QUOTE):
+    provider = get_provider()
+    scheduler = get_scheduler()
+    try:
+        df = scheduler.call(priority, provider.history, symbol, '1m', period='1d', ok=has_rows)
+        if df.empty:
+            df = scheduler.call(priority, provider.history, symbol, '1d', period='5d', ok=has_rows)
+        record_rows(provider.name, len(df))
+    except UpstreamUnavailable as e:
+        record_error(provider.name, e.state)
+        return None
+    except Exception as e:
+        record_error(provider.name, e)
+        return None
+    q = build_quote(df, name)
+    if q is None: record_error(provider.name, "empty")   # yfinance 連線失敗時只印 log、回傳空表
+    return q
+
+def split_download(df, symbols):
+    # provider.download 與 yf.download 一樣回傳 (Ticker, Price) 兩層欄位，拆成每檔一張表
+    frames = {}
+    if df is None or df.empty: return frames
+    if not isinstance(df.columns, pd.MultiIndex):
+        if len(symbols) == 1: frames[symbols[0]] = df
+        return frames
+    available = set(df.columns.get_level_values(0))
+    for sym in symbols:
+        if sym in available: frames[sym] = df[sym]
+    return frames
+
+def download_quotes(symbols, names=None, max_workers=8, priority=QUOTE):
+    # 一次 bulk 下載全部 1 分 K，缺漏 (例如盤前、指數) 再平行逐檔補抓
+    # 排程器拒絕 (限流 / 斷路) 或多檔整批空表時丟出 UpstreamUnavailable，由 SharedCache 改回舊值
+    names = names or {}
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols: return {}
+
+    provider = get_provider()
+    try:
+        # 多檔一起抓卻整張空表，幾乎都是上游掛了，算斷路器的失敗
+        df = get_scheduler().call(priority, provider.download, symbols, period='1d', interval='1m',
+                                  ok=non_empty if len(symbols) > 1 else has_rows)
+    except UpstreamUnavailable as e:
+        record_error(provider.name, e.state)
+        raise
+    except Exception as e:
+        record_error(provider.name, e)
+        df = pd.DataFrame()
+    record_rows(provider.name, len(df))
+
+    res = {}
+    for sym, sub in split_download(df, symbols).items():
+        q = build_quote(sub, names.get(sym, clean_code(sym)))
+        if q: res[sym] = q
+
+    misses = [s for s in symbols if s not in res]
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as pool:
+            filled = pool.map(lambda s: fetch_single_quote(s, names.get(s, clean_code(s)), priority), misses)
+            for sym, q in zip(misses, filled):
+                if q: res[sym] = q
+    return res
@@ -0,0 +1,197 @@
+import os
+import time
+import bisect
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# 熱路徑量測：延遲直方圖、快取命中/未命中/過期、上游錯誤、收到的位元組數
+#   全行程共用一個 REGISTRY；timed() 包 DataEngine 方法與各畫面區塊，
+#   原本 bare except 吞掉的上游錯誤改以 record_error() 計數
+#   匯出 Prometheus 文字格式：側邊欄管理面板 + 本機 HTTP 端點 (預設 :9464/metrics)
+# ==========================================
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
+PREFIX = "stockagent_"
+
+HELP = {
+    "latency_seconds": ("histogram", "Latency of instrumented operations"),
+    "errors_total": ("counter", "Exceptions raised by instrumented operations"),
+    "cache_requests_total": ("counter", "Cache lookups by result (hit / miss / stale / wait / fallback)"),
+    "upstream_errors_total": ("counter", "Upstream request failures by source and error type"),
+    "upstream_bytes_total": ("counter", "Bytes received from upstream HTTP sources"),
+    "upstream_rows_total": ("counter", "Rows received from yfinance"),
+    "scheduler_requests_total": ("counter", "Upstream requests through the scheduler by priority and result (ok / throttled / circuit_open / error)"),
+}
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 最後一格 = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # 與 Prometheus histogram_quantile 相同：所在區間內線性內插，落在 +Inf 取最後一個上界
+        if not self.count: return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                if i == len(self.buckets): return self.buckets[-1]
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}      # (name, labels tuple) -> float
+        self.histograms = {}    # (name, labels tuple) -> Histogram
+        self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None: h = self.histograms[key] = Histogram()
+            h.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def latency_table(self):
+        # 管理面板用：每個 op 的呼叫數、錯誤數、平均 / p50 / p95 / p99 (毫秒)
+        with self._lock:
+            hists = {dict(labels).get('op'): h for (name, labels), h in self.histograms.items() if name == "latency_seconds"}
+            errors = {dict(labels).get('op'): v for (name, labels), v in self.counters.items() if name == "errors_total"}
+            rows = [{"op": op, "calls": h.count, "errors": int(errors.get(op, 0)), "avg_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                     "p50_ms": h.quantile(0.5) * 1000, "p95_ms": h.quantile(0.95) * 1000, "p99_ms": h.quantile(0.99) * 1000,
+                     "total_s": h.sum} for op, h in hists.items()]
+        return sorted(rows, key=lambda r: -r['total_s'])
+
+    def counter_table(self, name):
+        with self._lock:
+            return [{**dict(labels), "value": v} for (n, labels), v in sorted(self.counters.items()) if n == name]
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            names = sorted({n for n, _ in self.counters} | {n for n, _ in self.histograms})
+            for name in names:
+                kind, text = HELP.get(name, ("counter", name))
+                lines.append(f"# HELP {PREFIX}{name} {text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                for (n, labels), v in sorted(self.counters.items()):
+                    if n == name: lines.append(f"{PREFIX}{name}{_labels(labels)} {_num(v)}")
+                for (n, labels), h in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                    if n != name: continue
+                    cum = 0
+                    for le, c in zip(list(h.buckets) + ['+Inf'], h.counts):
+                        cum += c
+                        lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', str(le)),))} {cum}")
+                    lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {_num(h.sum)}")
+                    lines.append(f"{PREFIX}{name}_count{_labels(labels)} {h.count}")
+        lines.append(f"# TYPE {PREFIX}uptime_seconds gauge")
+        lines.append(f"{PREFIX}uptime_seconds {_num(time.time() - self.started_at)}")
+        return "\n".join(lines) + "\n"
+
+def _labels(labels):
+    if not labels: return ""
+    esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+REGISTRY = Registry()
+
+# ==========================================
+# 記錄用的小工具
+# ==========================================
+class timed:
+    # 可當 decorator 或 with 區塊：記錄延遲與呼叫數，例外計入 errors_total 後照常拋出
+    def __init__(self, op, registry=None):
+        self.op = op
+        self.registry = registry or REGISTRY
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe("latency_seconds", time.perf_counter() - self.t0, op=self.op)
+        if exc_type is not None and not _is_control_flow(exc_type): self.registry.inc("errors_total", op=self.op, type=exc_type.__name__)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.op, self.registry): return func(*args, **kwargs)
+        return wrapper
+
+def _is_control_flow(exc_type):
+    # st.rerun / st.stop 以例外實作，不算錯誤
+    return exc_type.__name__ in ("RerunException", "StopException")
+
+def instrument_methods(prefix, registry=None):
+    # 類別 decorator：所有公開方法 (含 st.cache_data 包過的) 都以 prefix.方法名 計時
+    def wrap(cls):
+        for name, attr in list(vars(cls).items()):
+            if name.startswith('_') or not callable(attr): continue
+            setattr(cls, name, timed(f"{prefix}.{name}", registry)(attr))
+        return cls
+    return wrap
+
+def record_cache(cache, result, n=1):
+    if n: REGISTRY.inc("cache_requests_total", n, cache=cache, result=result)
+
+def record_error(source, exc):
+    REGISTRY.inc("upstream_errors_total", source=source, type=exc if isinstance(exc, str) else type(exc).__name__)
+
+def record_bytes(source, n):
+    if n: REGISTRY.inc("upstream_bytes_total", n, source=source)
+
+def record_rows(source, n):
+    if n: REGISTRY.inc("upstream_rows_total", n, source=source)
+
+# ==========================================
+# Prometheus 端點：/metrics 回傳文字格式 (Streamlit 不能自訂路由，另開一個本機 HTTP 執行緒)
+# ==========================================
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    # 回傳 server；port 已被同機其他行程佔用時回傳 None (由那個行程匯出)
+    try: server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError: return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
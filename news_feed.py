@@ -0,0 +1,188 @@
+import os
+import time
+import hashlib
+import sqlite3
+import calendar
+import threading
+from urllib.parse import quote
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from metrics import record_error, record_bytes
+from scheduler import NEWS, UpstreamUnavailable, get_scheduler
+
+# ==========================================
+# 新聞匯入：多個 RSS 並行抓取、ETag/Last-Modified 條件式請求、連結去重、本地有上限的新聞庫
+# ==========================================
+NEWS_DB = os.path.join(os.environ.get('STOCK_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'), 'news.db')
+GENERAL_FEED = "台股"
+MIN_POLL_SEC = 300     # 同一個 feed 5 分鐘內不重複請求
+MAX_ITEMS = 2000       # 新聞庫保留筆數
+MAX_HOLDING_FEEDS = 5  # 除了目前代號，只追庫存市值前幾檔的個股 feed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    checked_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL,
+    source TEXT,
+    published REAL,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS item_feeds (
+    id TEXT NOT NULL,
+    feed_key TEXT NOT NULL,
+    PRIMARY KEY (feed_key, id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_published ON items(published);
+"""
+
+def feed_url(query):
+    return f"https://news.google.com/rss/search?q={quote(query)}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
+
+def item_id(entry):
+    key = entry.get('id') or entry.get('link') or entry.get('title', '')
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class NewsStore:
+    def __init__(self, path=NEWS_DB, max_items=MAX_ITEMS):
+        self.path = path
+        self.max_items = max_items
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn: yield conn
+        finally: conn.close()
+
+    def feed_state(self, url):
+        with self._connect() as conn:
+            r = conn.execute("SELECT * FROM feeds WHERE url = ?", (url,)).fetchone()
+        return dict(r) if r else {}
+
+    def save_feed_state(self, url, etag, last_modified, checked_at):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO feeds (url, etag, last_modified, checked_at) VALUES (?, ?, ?, ?)",
+                         (url, etag, last_modified, checked_at))
+
+    def add_items(self, feed_key, items):
+        # 已存在的連結只補上 feed 對應，不重複寫入；回傳新增筆數
+        if not items: return 0
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO items (id, title, link, source, published, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(i['id'], i['title'], i['link'], i['source'], i['published'], i['fetched_at']) for i in items])
+            added = conn.total_changes - before
+            conn.executemany("INSERT OR IGNORE INTO item_feeds (id, feed_key) VALUES (?, ?)", [(i['id'], feed_key) for i in items])
+            if added: self._trim(conn)
+        return added
+
+    def _trim(self, conn):
+        conn.execute("""
+            DELETE FROM items WHERE id IN (
+                SELECT id FROM items ORDER BY COALESCE(published, fetched_at) DESC LIMIT -1 OFFSET ?)
+        """, (self.max_items,))
+        conn.execute("DELETE FROM item_feeds WHERE id NOT IN (SELECT id FROM items)")
+
+    def page(self, feed_keys, page=0, page_size=5):
+        marks = ",".join("?" * len(feed_keys))
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(DISTINCT id) FROM item_feeds WHERE feed_key IN ({marks})", tuple(feed_keys)).fetchone()[0]
+            rows = conn.execute(f"""
+                SELECT * FROM items WHERE id IN (SELECT id FROM item_feeds WHERE feed_key IN ({marks}))
+                ORDER BY COALESCE(published, fetched_at) DESC LIMIT ? OFFSET ?
+            """, (*feed_keys, page_size, page * page_size)).fetchall()
+        return [dict(r) for r in rows], total
+
+class NewsIngester:
+    def __init__(self, store, min_interval=MIN_POLL_SEC, max_workers=6, timeout=5):
+        self.store = store
+        self.min_interval = min_interval
+        self.timeout = timeout
+        import requests   # requests / feedparser 只有新聞區塊用到，延後載入
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Mozilla/5.0'
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._locks = {}
+        self._pending = set()          # 已排進背景、還沒抓完的 feed
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, url):
+        with self._locks_guard: return self._locks.setdefault(url, threading.Lock())
+
+    def fetch_feed(self, feed_key, url):
+        # 回傳 "skipped" / "not_modified" / "updated" / "error"，或排程器的降級狀態 "throttled" / "circuit_open"
+        import requests, feedparser
+        with self._lock(url):
+            state = self.store.feed_state(url)
+            now = time.time()
+            if state.get('checked_at') and now - state['checked_at'] < self.min_interval: return "skipped"
+            headers = {}
+            if state.get('etag'): headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'): headers['If-Modified-Since'] = state['last_modified']
+            try:
+                # 5xx / 429 算上游故障，累積到門檻就斷路
+                resp = get_scheduler("news").call(NEWS, self.session.get, url, headers=headers, timeout=self.timeout,
+                                                  ok=lambda r: r.status_code < 500 and r.status_code != 429)
+            except UpstreamUnavailable as e:
+                record_error("news", e.state)
+                return e.state
+            except requests.RequestException as e:
+                record_error("news", e)
+                return "error"
+            record_bytes("news", len(resp.content))
+            if resp.status_code == 304:
+                self.store.save_feed_state(url, state.get('etag'), state.get('last_modified'), now)
+                return "not_modified"
+            if resp.status_code != 200:
+                record_error("news", f"HTTP {resp.status_code}")
+                return "error"
+
+            feed = feedparser.parse(resp.content)
+            items = []
+            for entry in feed.entries:
+                t = entry.get('published_parsed')
+                items.append({
+                    "id": item_id(entry), "title": entry.get('title', ''), "link": entry.get('link', '#'),
+                    "source": entry.source.title if hasattr(entry, 'source') else "Google新聞",
+                    "published": calendar.timegm(t) if t else None, "fetched_at": now,
+                })
+            self.store.add_items(feed_key, items)
+            self.store.save_feed_state(url, resp.headers.get('ETag'), resp.headers.get('Last-Modified'), now)
+            return "updated"
+
+    def refresh(self, feeds):
+        # feeds: {feed_key: 查詢字串}；全部並行抓取
+        jobs = {key: self._pool.submit(self.fetch_feed, key, feed_url(query)) for key, query in feeds.items()}
+        return {key: fut.result() for key, fut in jobs.items()}
+
+    def refresh_async(self, feeds):
+        # 畫面用：丟到背景抓、不等結果，新聞直接從本地庫讀；同一個 feed 還在抓就不重複排
+        for key, query in feeds.items():
+            url = feed_url(query)
+            with self._locks_guard:
+                if url in self._pending: continue
+                self._pending.add(url)
+            self._pool.submit(self._fetch_pending, key, url)
+
+    def _fetch_pending(self, feed_key, url):
+        try: return self.fetch_feed(feed_key, url)
+        except Exception as e: record_error("news", e)
+        finally:
+            with self._locks_guard: self._pending.discard(url)
+
+def news_codes(ticker, portfolio, limit=MAX_HOLDING_FEEDS):
+    # 目前代號 + 庫存市值 (成本) 前 limit 檔；庫存再多也不會讓 feed 數無限增加
+    top = sorted(portfolio, key=lambda p: -p['cost'] * p['qty'])[:limit]
+    return tuple(dict.fromkeys([ticker] + [p['code'] for p in top]))
@@ -0,0 +1,85 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from itertools import product
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from backtest import entry_signals, simulate
+from trade_costs import net_pl
+
+# ==========================================
+# 特務參數最佳化：觸發價 x 停利 x 停損 (x 移動停損) 組合對多檔標的回測，依淨損益排名
+#   所有標的的 OHLC 打包進一塊 shared memory，子行程直接掛上去讀，不必把 DataFrame pickle 給每個 worker
+#   任務以 (標的, 一批觸發價) 為單位；同一觸發價的進場點只算一次，供所有停利/停損組合共用
+#   觸發價以「期初收盤往下 x%」表示，才能跨標的比較
+# ==========================================
+FIELDS = ('open', 'high', 'low', 'close')
+COLUMNS = ["代號", "觸發%", "觸發價", "停利%", "停損%", "移動停損%", "交易次數", "勝率", "淨損益", "最大回落"]
+
+_SHM = None    # 子行程掛上的 shared memory
+_BARS = None   # shape (4, 全部 K 棒數) 的唯讀視圖
+
+def pack_bars(frames):
+    # frames: {代號: DataFrame}；回傳 (SharedMemory, 代號清單, 各代號起訖 offsets)
+    codes = [code for code, df in frames.items() if not df.empty]
+    offsets = np.concatenate([[0], np.cumsum([len(frames[code]) for code in codes])]).astype(np.int64)
+    shm = shared_memory.SharedMemory(create=True, size=max(8, len(FIELDS) * int(offsets[-1]) * 8))
+    bars = np.ndarray((len(FIELDS), int(offsets[-1])), dtype=float, buffer=shm.buf)
+    for j, code in enumerate(codes):
+        for r, col in enumerate(FIELDS): bars[r, offsets[j]:offsets[j + 1]] = frames[code][col].to_numpy(dtype=float)
+    return shm, codes, offsets
+
+def _attach(name, n_bars):
+    global _SHM, _BARS
+    _SHM = shared_memory.SharedMemory(name=name)
+    _BARS = np.ndarray((len(FIELDS), n_bars), dtype=float, buffer=_SHM.buf)
+
+def _sweep_task(a, b, trigger_pcts, exits, lots, discount):
+    o, h, l, c = _BARS[:, a:b]
+    ref = c[0]
+    out = []
+    for trig_pct in trigger_pcts:
+        trigger = ref * (1 - trig_pct / 100)
+        signals = entry_signals(o, l, c, trigger)
+        for profit, loss, trail in exits:
+            fills = simulate(o, h, l, c, trigger, profit, loss, trail, signals) if signals.size else []
+            if not fills:
+                out.append((trig_pct, trigger, profit, loss, trail, 0, 0.0, 0.0, 0.0))
+                continue
+            entry = np.array([f[2] for f in fills])
+            exit_px = np.array([f[3] for f in fills])
+            pl = net_pl(entry, exit_px, lots, True, discount)
+            eq = np.cumsum(pl)
+            dd = float((np.maximum.accumulate(np.maximum(eq, 0)) - eq).max())
+            out.append((trig_pct, trigger, profit, loss, trail, len(pl), float((pl > 0).mean() * 100), float(pl.sum()), dd))
+    return out
+
+def run_sweep(frames, trigger_pcts, profits, losses, trails=(0.0,), lots=1, discount=1.0, max_workers=None):
+    # 回傳 (排名表 DataFrame, {"combos", "seconds", "combos_per_sec", "workers", "tickers"})
+    max_workers = max_workers or os.cpu_count() or 1
+    exits = list(product(profits, losses, trails))
+    shm, codes, offsets = pack_bars(frames)
+    t0 = time.perf_counter()
+    try:
+        # 每檔的觸發價切成數批，讓任務數約為 worker 數的 4 倍
+        per_code = max(1, -(-max_workers * 4 // max(1, len(codes))))
+        batches = [list(chunk) for chunk in np.array_split(np.asarray(trigger_pcts, dtype=float), min(per_code, len(trigger_pcts))) if len(chunk)]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(shm.name, int(offsets[-1]))) as pool:
+            jobs = [(code, pool.submit(_sweep_task, int(offsets[j]), int(offsets[j + 1]), batch, exits, lots, discount))
+                    for j, code in enumerate(codes) for batch in batches]
+            rows = [(code, *r) for code, fut in jobs for r in fut.result()]
+    finally:
+        shm.close()
+        shm.unlink()
+    elapsed = time.perf_counter() - t0
+
+    table = pd.DataFrame(rows, columns=COLUMNS).sort_values(["淨損益", "最大回落"], ascending=[False, True]).reset_index(drop=True)
+    table.insert(0, "排名", np.arange(1, len(table) + 1))
+    combos = len(rows)
+    return table, {"combos": combos, "seconds": elapsed, "combos_per_sec": combos / elapsed if elapsed else 0.0,
+                   "workers": max_workers, "tickers": len(codes)}
+
+def best_by(table, x, y, value="淨損益"):
+    # 熱圖用：同一組 (x, y) 取其他參數下的最佳值
+    return table.pivot_table(index=y, columns=x, values=value, aggfunc='max').sort_index(ascending=False)
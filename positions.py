@@ -0,0 +1,117 @@
+import numpy as np
+
+# ==========================================
+# 部位管理：觸發後以觸發價進場，掛上停利/停損二擇一 (OCO) 與移動停損
+#   所有未平倉部位的價位存成一組陣列，每次批次報價一起更新
+# ==========================================
+TAKE_PROFIT = "TP"
+STOP_LOSS = "SL"
+TRAIL_STOP = "TRAIL"
+MANUAL = "MANUAL"
+EXIT_LABEL = {TAKE_PROFIT: "停利", STOP_LOSS: "停損", TRAIL_STOP: "移動停損", MANUAL: "手動平倉"}
+
+def bracket_prices(entry, profit_pct, loss_pct):
+    return entry * (1 + profit_pct / 100), entry * (1 - loss_pct / 100)
+
+class PositionBook:
+    def __init__(self, capacity=64):
+        self.keys = [None] * capacity      # slot -> (owner, bot slot, updated_at)
+        self.meta = [None] * capacity      # slot -> {"owner", "slot", "code", "symbol", ...}
+        self.slot_of = {}                  # key -> slot
+        self.free = list(range(capacity - 1, -1, -1))
+        self.symbols = []                  # 標的表，sym_idx 指向這裡
+        self.sym_pos = {}
+        self.open_mask = np.zeros(capacity, dtype=bool)
+        self.sym_idx = np.zeros(capacity, dtype=np.int64)
+        self.entry = np.zeros(capacity)
+        self.qty = np.zeros(capacity)
+        self.tp = np.zeros(capacity)
+        self.sl = np.zeros(capacity)
+        self.base_sl = np.zeros(capacity)  # 原始停損價，用來分辨是否已被移動停損上移
+        self.trail = np.zeros(capacity)    # 移動停損 %，0 = 不啟用
+        self.peak = np.zeros(capacity)     # 進場後最高價
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __contains__(self, key):
+        return key in self.slot_of
+
+    def _grow(self):
+        old = len(self.keys)
+        new = old * 2
+        for name in ('open_mask', 'sym_idx', 'entry', 'qty', 'tp', 'sl', 'base_sl', 'trail', 'peak'):
+            arr = getattr(self, name)
+            grown = np.zeros(new, dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        self.keys.extend([None] * old)
+        self.meta.extend([None] * old)
+        self.free.extend(range(new - 1, old - 1, -1))
+
+    def open(self, key, meta, entry, qty, profit_pct, loss_pct, trail_pct=0.0, tp=None, sl=None, peak=None):
+        # tp / sl / peak 有值時代表從儲存區還原，沿用原本 (可能已上移) 的停損價
+        if key in self.slot_of: return self.slot_of[key]
+        if not self.free: self._grow()
+        i = self.free.pop()
+        sym = meta['symbol']
+        if sym not in self.sym_pos:
+            self.sym_pos[sym] = len(self.symbols)
+            self.symbols.append(sym)
+        d_tp, d_sl = bracket_prices(entry, profit_pct, loss_pct)
+        self.keys[i], self.meta[i] = key, meta
+        self.slot_of[key] = i
+        self.open_mask[i] = True
+        self.sym_idx[i] = self.sym_pos[sym]
+        self.entry[i], self.qty[i], self.trail[i] = entry, qty, trail_pct
+        self.tp[i] = d_tp if tp is None else tp
+        self.sl[i] = d_sl if sl is None else sl
+        self.base_sl[i] = d_sl
+        self.peak[i] = entry if peak is None else peak
+        return i
+
+    def _release(self, i):
+        self.slot_of.pop(self.keys[i], None)
+        self.keys[i], self.meta[i] = None, None
+        self.open_mask[i] = False
+        self.free.append(i)
+
+    def _fill(self, i, kind, price, ts):
+        entry, qty = float(self.entry[i]), float(self.qty[i])
+        event = dict(self.meta[i], kind=kind, entry=entry, exit=float(price), qty=qty,
+                     pl=(float(price) - entry) * qty * 1000, ts=ts)
+        self._release(i)
+        return event
+
+    def close(self, key, price, ts, kind=MANUAL):
+        i = self.slot_of.get(key)
+        if i is None: return None
+        return self._fill(i, kind, price, ts)
+
+    def update(self, prices, ts):
+        # prices: {symbol: 價格}；回傳本次出場的成交事件
+        if not self.slot_of: return []
+        px_table = np.array([prices.get(s, np.nan) for s in self.symbols], dtype=float)
+        px = np.full(len(self.keys), np.nan)
+        px[self.open_mask] = px_table[self.sym_idx[self.open_mask]]
+        live = self.open_mask & np.isfinite(px)
+
+        # 移動停損：創新高就把停損上移到 高點 x (1 - trail%)，只上不下
+        np.maximum(self.peak, np.where(live, px, self.peak), out=self.peak)
+        trailing = live & (self.trail > 0)
+        np.maximum(self.sl, np.where(trailing, self.peak * (1 - self.trail / 100), self.sl), out=self.sl)
+
+        # OCO：同一筆報價同時碰到兩邊時以停損為準 (保守)
+        hit_sl = live & (px <= self.sl)
+        hit_tp = live & ~hit_sl & (px >= self.tp)
+        events = []
+        for i in np.flatnonzero(hit_sl):
+            kind = TRAIL_STOP if self.sl[i] > self.base_sl[i] else STOP_LOSS
+            events.append(self._fill(i, kind, px[i], ts))
+        for i in np.flatnonzero(hit_tp): events.append(self._fill(i, TAKE_PROFIT, px[i], ts))
+        return events
+
+    def snapshot(self):
+        # 給儲存區寫回用：[(key, meta, entry, qty, tp, sl, trail, peak), ...]
+        return [(self.keys[i], self.meta[i], float(self.entry[i]), float(self.qty[i]), float(self.tp[i]),
+                 float(self.sl[i]), float(self.trail[i]), float(self.peak[i])) for i in np.flatnonzero(self.open_mask)]
@@ -0,0 +1,255 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+import pytz
+from datetime import datetime, timedelta, time as dt_time
+
+# ==========================================
+# 行情資料源：所有報價 / K 線 / 基本資料都經由 get_provider()，時間也以資料源的時鐘為準
+#   yahoo  : 線上 yfinance (預設)
+#   local  : 只讀本地 K 線庫 (data/bars)，完全不連網
+#   replay : 把本地庫錄下的某一天 1 分K 依 1x~1000x 速度重播，報價、K 線、盤中判斷都跟著虛擬時鐘走
+#   STOCK_PROVIDER=replay STOCK_REPLAY_SPEED=300 streamlit run grid_bot.py
+#   python providers.py record 2330 2317     # 先把要重播的標的錄進本地庫
+#   yfinance 載入要 0.2~0.5 秒，第一次真的連線才 import
+# ==========================================
+TW_TZ = pytz.timezone('Asia/Taipei')
+SESSION_OPEN = dt_time(9, 0)
+SESSION_CLOSE = dt_time(13, 30)
+
+PROVIDER = os.environ.get("STOCK_PROVIDER", "yahoo")
+REPLAY_DAY = os.environ.get("STOCK_REPLAY_DAY")            # 預設：本地庫最近一個有 1 分K 的交易日
+REPLAY_SPEED = float(os.environ.get("STOCK_REPLAY_SPEED", "60"))
+MIN_SPEED, MAX_SPEED = 1.0, 1000.0
+REPLAY_SPEEDS = (1, 5, 10, 30, 60, 120, 300, 600, 1000)
+BAR_SECONDS = 60
+DAILY = ('1d', '5d', '1wk', '1mo', '3mo')
+
+def to_yahoo(df, interval):
+    # 本地庫格式 (date + 小寫欄位、無時區) -> yfinance history 格式 (tz-aware index + 大寫欄位)
+    if df is None or df.empty: return pd.DataFrame()
+    index = pd.DatetimeIndex(df['date']).tz_localize(TW_TZ).rename('Date' if interval in DAILY else 'Datetime')
+    return pd.DataFrame({c.capitalize(): df[c].to_numpy() for c in ('open', 'high', 'low', 'close', 'volume') if c in df.columns}, index=index)
+
+def wide_frame(frames):
+    # 與 yf.download(group_by='ticker') 相同的 (Ticker, Price) 兩層欄位
+    frames = {s: df for s, df in frames.items() if df is not None and not df.empty}
+    if not frames: return pd.DataFrame()
+    return pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+
+def select_rows(df, interval, period=None, start=None, now=None):
+    from bar_store import slice_period   # bar_store 反過來依賴本模組的時鐘
+    if df.empty: return df
+    if start is not None:
+        start = pd.Timestamp(start)
+        if start.tz is not None: start = start.tz_convert(TW_TZ).tz_localize(None)
+        return df[df['date'] >= start].reset_index(drop=True)
+    if period: return slice_period(df, interval, period, pd.Timestamp(now.replace(tzinfo=None)))
+    return df
+
+class YahooProvider:
+    name = "yahoo"
+    persist = True        # 下載結果寫進本地 K 線庫，之後只補增量
+
+    def now(self):
+        return datetime.now(TW_TZ)
+
+    def history(self, symbol, interval='1d', period=None, start=None):
+        import yfinance as yf
+        stock = yf.Ticker(symbol)
+        if start is not None: return stock.history(start=start, interval=interval)
+        return stock.history(period=period, interval=interval)
+
+    def download(self, symbols, period='1d', interval='1d'):
+        import yfinance as yf
+        return yf.download(symbols, period=period, interval=interval, group_by='ticker', threads=True, progress=False)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+class LocalStoreProvider:
+    name = "local"
+    persist = False       # 資料本來就在本地庫，不再寫回
+
+    def __init__(self, store=None):
+        from bar_store import BarStore
+        self.store = store or BarStore()
+
+    def now(self):
+        return datetime.now(TW_TZ)
+
+    def history(self, symbol, interval='1d', period=None, start=None):
+        return to_yahoo(select_rows(self.store.load(symbol, interval), interval, period, start, self.now()), interval)
+
+    def download(self, symbols, period='1d', interval='1d'):
+        return wide_frame({s: self.history(s, interval, period) for s in symbols})
+
+    def info(self, symbol):
+        return {}
+
+def recorded_days(store, symbol=None):
+    # 本地庫裡有 1 分K 的交易日 (由新到舊)；不指定代號就看全部
+    pattern = store.path(symbol, '1m') if symbol else store.path('*', '1m')
+    days = set()
+    for p in glob.glob(pattern):
+        try: dates = pd.read_parquet(p, columns=['date'])['date']
+        except Exception: continue
+        days.update(dates.dt.date.unique())
+    return sorted(days, reverse=True)
+
+class ReplayProvider:
+    # 虛擬時鐘 = 重播日開盤 + 經過的實際秒數 x speed，收盤後停住；最後一根 1 分K 依該分鐘經過的比例逐步成形
+    name = "replay"
+    persist = False
+
+    def __init__(self, day=None, speed=REPLAY_SPEED, source=None, start=SESSION_OPEN):
+        self.source = source or LocalStoreProvider()
+        if day is None:
+            days = recorded_days(self.source.store)
+            if not days: raise ValueError("本地 K 線庫沒有 1 分K 可重播，先執行 python providers.py record <代號>")
+            day = days[0]
+        self.day = pd.Timestamp(day).date()
+        self.end = TW_TZ.localize(datetime.combine(self.day, SESSION_CLOSE)) + timedelta(seconds=BAR_SECONDS)
+        self._lock = threading.Lock()
+        self._bars = {}       # symbol -> (ts, ohlcv) 重播日的 1 分K
+        self._prior = {}      # (symbol, interval) -> 重播日之前的 K 棒
+        self.speed = min(max(float(speed), MIN_SPEED), MAX_SPEED)
+        self.seek(start)
+
+    def seek(self, t):
+        # 跳到重播日的某個時間 (datetime.time)
+        with self._lock:
+            self._anchor = TW_TZ.localize(datetime.combine(self.day, t))
+            self._wall = time.monotonic()
+
+    def set_speed(self, speed):
+        with self._lock:
+            now = self._now()
+            self._anchor, self._wall = now, time.monotonic()
+            self.speed = min(max(float(speed), MIN_SPEED), MAX_SPEED)
+
+    def _now(self):
+        return min(self._anchor + timedelta(seconds=(time.monotonic() - self._wall) * self.speed), self.end)
+
+    def now(self):
+        with self._lock: return self._now()
+
+    def finished(self):
+        return self.now() >= self.end
+
+    def _day_bars(self, symbol):
+        with self._lock: hit = self._bars.get(symbol)
+        if hit is not None: return hit
+        df = self.source.store.load(symbol, '1m')
+        if not df.empty: df = df[df['date'].dt.date == self.day]
+        ts = df['date'].to_numpy(dtype='datetime64[ns]') if not df.empty else np.array([], dtype='datetime64[ns]')
+        ohlcv = np.vstack([df[c].to_numpy(dtype=float) for c in ('open', 'high', 'low', 'close', 'volume')]) if not df.empty else np.zeros((5, 0))
+        with self._lock: self._bars[symbol] = (ts, ohlcv)
+        return ts, ohlcv
+
+    def _prior_bars(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock: hit = self._prior.get(key)
+        if hit is not None: return hit
+        df = self.source.store.load(symbol, interval)
+        if not df.empty: df = df[df['date'] < pd.Timestamp(self.day)].reset_index(drop=True)
+        with self._lock: self._prior[key] = df
+        return df
+
+    def replayed(self, symbol, now=None):
+        # 重播日到 now 為止的 1 分K (本地庫格式)；最後一根若還在該分鐘內，以經過比例內插成形中的 K 棒
+        now = pd.Timestamp((now or self.now()).replace(tzinfo=None)).to_datetime64()
+        ts, ohlcv = self._day_bars(symbol)
+        k = int(np.searchsorted(ts, now, 'right'))
+        if k == 0: return pd.DataFrame(columns=['date', 'open', 'high', 'low', 'close', 'volume'])
+        o, h, l, c, v = ohlcv[:, :k].copy()
+        f = (now - ts[k - 1]) / np.timedelta64(BAR_SECONDS, 's')
+        if f < 1:
+            o1, c1 = o[-1], o[-1] + (c[-1] - o[-1]) * f
+            h[-1] = max(o1, c1) + (h[-1] - max(o1, c[-1])) * f
+            l[-1] = min(o1, c1) - (min(o1, c[-1]) - l[-1]) * f
+            c[-1], v[-1] = c1, v[-1] * f
+        return pd.DataFrame({'date': ts[:k], 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v})
+
+    def history(self, symbol, interval='1d', period=None, start=None):
+        now = self.now()
+        prior = self._prior_bars(symbol, interval)
+        if interval == '1m':
+            today = self.replayed(symbol, now)
+        elif interval == '1d':
+            bars = self.replayed(symbol, now)
+            today = pd.DataFrame([{'date': pd.Timestamp(self.day), 'open': bars['open'].iloc[0], 'high': bars['high'].max(),
+                                   'low': bars['low'].min(), 'close': bars['close'].iloc[-1], 'volume': bars['volume'].sum()}]) if not bars.empty else bars
+        else:
+            today = pd.DataFrame()
+        parts = [df for df in (prior, today) if not df.empty]
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else (parts[0] if parts else pd.DataFrame())
+        return to_yahoo(select_rows(df, interval, period, start, now), interval)
+
+    def download(self, symbols, period='1d', interval='1d'):
+        return wide_frame({s: self.history(s, interval, period) for s in symbols})
+
+    def info(self, symbol):
+        return self.source.info(symbol)
+
+def make_provider(kind=PROVIDER, **kwargs):
+    if kind == "yahoo": return YahooProvider()
+    if kind == "local": return LocalStoreProvider(**kwargs)
+    if kind == "replay":
+        kwargs.setdefault('day', REPLAY_DAY)
+        return ReplayProvider(**kwargs)
+    raise ValueError(f"未知的資料源：{kind}")
+
+_PROVIDER = None
+_LOCK = threading.Lock()
+
+def get_provider():
+    # 行程內共用一個資料源 (STOCK_PROVIDER 決定)
+    global _PROVIDER
+    if _PROVIDER is None:
+        with _LOCK:
+            if _PROVIDER is None: _PROVIDER = make_provider()
+    return _PROVIDER
+
+def set_provider(provider):
+    # 換掉目前的資料源 (基準測試 / 重播用)，回傳舊的
+    global _PROVIDER
+    with _LOCK: old, _PROVIDER = _PROVIDER, provider
+    return old
+
+def clock():
+    # SharedCache 的時鐘：重播時快取的新鮮期也用虛擬時間計算
+    return get_provider().now().timestamp()
+
+def main(argv=None):
+    from bar_store import BarStore
+    from market_data import to_symbol
+    parser = argparse.ArgumentParser(description="Record 1m bars for replay / list recorded days")
+    parser.add_argument("action", choices=["record", "days"])
+    parser.add_argument("codes", nargs="*")
+    parser.add_argument("--period", default="5d", help="錄製的 1 分K 區間 (Yahoo 只保留約 7 天)")
+    args = parser.parse_args(argv)
+    store = BarStore()
+    if args.action == "days":
+        for code in args.codes or [None]:
+            days = recorded_days(store, to_symbol(code) if code else None)
+            print(f"{code or '全部'}: {', '.join(map(str, days)) or '無'}")
+        return 0
+    set_provider(YahooProvider())
+    failed = 0
+    for code in args.codes:
+        sym = to_symbol(code)
+        bars = store.fetch(sym, '1m', args.period)
+        store.fetch(sym, '1d', '1y')
+        print(f"{sym}: {len(bars)} 根 1 分K")
+        failed += bars.empty
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
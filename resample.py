@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from market_data import SESSION_OPEN, SESSION_CLOSE
+from bar_store import period_start, slice_period
+from providers import get_provider
+
+# ==========================================
+# K 線重取樣 (週K/月K、5/15/60 分K 都由同一條基礎序列產生)
+# ==========================================
+AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+# interval -> (基礎 interval, 重取樣規則)
+DERIVED = {
+    '1wk': ('1d', 'W'), '1mo': ('1d', 'M'),
+    '5m': ('1m', 5), '15m': ('1m', 15), '30m': ('1m', 30), '60m': ('1m', 60),
+}
+DAILY_BASE_PERIOD = '5y'   # 日K 一律抓滿 5 年，日/週/月切換都不用再連網
+
+def aggregate(df, key):
+    cols = {c: f for c, f in AGG.items() if c in df.columns}
+    out = df.groupby(key, sort=True).agg(cols)
+    out.index.name = 'date'
+    return out.reset_index()
+
+def resample_calendar(df, rule):
+    # 週K 以週一、月K 以每月 1 日為標記，與 Yahoo 1wk / 1mo 一致；假日沒有 K 棒的週期自然不會出現
+    key = df['date'].dt.to_period('W-SUN' if rule == 'W' else 'M').dt.start_time
+    return aggregate(df, key.rename('date'))
+
+def resample_session(df, minutes):
+    # 以每天 09:00 開盤為錨點切分，13:30 收盤集合競價併入最後一根，不跨日也不含盤外資料
+    t = df['date']
+    open_at = t.dt.normalize() + pd.Timedelta(hours=SESSION_OPEN.hour, minutes=SESSION_OPEN.minute)
+    session_len = (SESSION_CLOSE.hour - SESSION_OPEN.hour) * 60 + SESSION_CLOSE.minute - SESSION_OPEN.minute
+    elapsed = ((t - open_at) // pd.Timedelta(minutes=1)).to_numpy()
+    mask = (elapsed >= 0) & (elapsed <= session_len)
+    bucket = np.minimum(elapsed // minutes, (session_len - 1) // minutes)
+    key = pd.Series(open_at.to_numpy() + (bucket * minutes).astype('timedelta64[m]'), index=df.index, name='date')
+    return aggregate(df[mask], key[mask])
+
+def resample_bars(df, rule):
+    if df.empty: return df
+    if isinstance(rule, str): return resample_calendar(df, rule)
+    return resample_session(df, rule)
+
+def fetch_kline(store, symbol, interval="1d", period="3mo"):
+    base_iv, rule = DERIVED.get(interval, (interval, None))
+    now = pd.Timestamp(get_provider().now().replace(tzinfo=None))
+
+    base_period = period
+    if base_iv == '1d' and period_start(period, now) >= period_start(DAILY_BASE_PERIOD, now):
+        base_period = DAILY_BASE_PERIOD
+    base = store.fetch(symbol, base_iv, base_period)
+    if base.empty: return base
+
+    df = base if rule is None else resample_bars(base, rule)
+    return slice_period(df, interval, period, now)
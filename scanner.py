@@ -0,0 +1,103 @@
+import re
+import numpy as np
+import pandas as pd
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from market_data import clean_code
+from providers import get_provider
+from metrics import record_error, record_bytes, record_rows
+from scheduler import SCAN, UpstreamUnavailable, get_scheduler, non_empty
+
+# ==========================================
+# 全市場掃描 (上市 + 上櫃)
+# ==========================================
+UNIVERSE_URLS = {
+    ".TW": "https://isin.twse.com.tw/isin/C_public.jsp?strMode=2",    # 上市
+    ".TWO": "https://isin.twse.com.tw/isin/C_public.jsp?strMode=4",   # 上櫃
+}
+COMMON_STOCK_CFI = "ESVUFR"
+CHUNK_SIZE = 200
+MAX_WORKERS = 8
+TOP_K = 10
+
+# 策略 -> 排序分數欄位
+STRATEGY_SCORE = {"漲跌停 (±10%)": "abs_change", "爆量強勢股": "成交量", "飆股 (漲幅排行)": "漲跌幅"}
+
+def load_universe_table():
+    # 證交所 ISIN 公告頁，只取普通股；回傳 [(yahoo 代號, 代號, 名稱, 市場, 產業), ...]
+    import requests   # 只有掃描頁用到，延後載入
+    rows = []
+    for suffix, url in UNIVERSE_URLS.items():
+        market = "上市" if suffix == ".TW" else "上櫃"
+        try:
+            resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
+            record_bytes("isin", len(resp.content))
+            resp.encoding = 'cp950'
+            table = pd.read_html(StringIO(resp.text), header=0)[0]
+            table = table[table.iloc[:, 5] == COMMON_STOCK_CFI]
+            for item, industry in zip(table.iloc[:, 0].astype(str), table.iloc[:, 4].fillna('').astype(str)):
+                m = re.match(r'^(\w+)\s+(.+)$', item.replace('　', ' ').strip())
+                if m: rows.append((m.group(1) + suffix, m.group(1), m.group(2).strip(), market, industry.strip()))
+        except Exception as e:
+            record_error("isin", e)
+            continue
+    return rows
+
+def load_universe():
+    # 回傳 {yahoo 代號: 名稱}
+    return {symbol: name for symbol, _, name, _, _ in load_universe_table()}
+
+def download_chunk(symbols):
+    # 全市場掃描排最低優先；限流 / 斷路時這一段先略過
+    provider = get_provider()
+    try:
+        df = get_scheduler().call(SCAN, provider.download, symbols, period="1d", ok=non_empty)
+    except UpstreamUnavailable as e:
+        record_error(provider.name, e.state)
+        return None
+    except Exception as e:
+        record_error(provider.name, e)
+        return None
+    if df is not None: record_rows(provider.name, len(df))
+    if df is None or df.empty or not isinstance(df.columns, pd.MultiIndex): return None
+    return df
+
+def download_universe(symbols, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS):
+    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+    if not chunks: return pd.DataFrame()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        frames = [df for df in pool.map(download_chunk, chunks) if df is not None]
+    if not frames: return pd.DataFrame()
+    wide = pd.concat(frames, axis=1)
+    # (Ticker, Price) 寬表一次轉成「每檔一列」：各欄往下補值後取最後一列 = 每檔最新一根
+    last = wide.ffill().iloc[-1]
+    return last.unstack(level=-1)
+
+def top_k_index(score, k):
+    # 部分選取：argpartition 取前 k 名，只對這 k 筆排序
+    if score.size <= k: return np.argsort(-score, kind='stable')
+    part = np.argpartition(-score, k - 1)[:k]
+    return part[np.argsort(-score[part], kind='stable')]
+
+def scan_frame(frame, names, min_p, max_p, strategy, top_k=TOP_K):
+    if frame.empty or 'Close' not in frame.columns: return pd.DataFrame()
+    symbols = frame.index.to_numpy()
+    close = frame['Close'].to_numpy(dtype=float)
+    open_p = frame['Open'].to_numpy(dtype=float)
+    vol = np.nan_to_num(frame['Volume'].to_numpy(dtype=float))
+
+    ok = np.isfinite(close) & np.isfinite(open_p) & (open_p > 0) & (close >= min_p) & (close <= max_p)
+    symbols, close, open_p, vol = symbols[ok], close[ok], open_p[ok], vol[ok]
+    if close.size == 0: return pd.DataFrame()
+    change_pct = (close - open_p) / open_p * 100
+    codes = np.array([clean_code(s) for s in symbols])
+
+    cols = {"漲跌幅": change_pct, "成交量": vol, "abs_change": np.abs(change_pct)}
+    key = STRATEGY_SCORE.get(strategy)
+    order = top_k_index(cols[key], top_k) if key else np.arange(close.size)
+
+    return pd.DataFrame({
+        "代號": codes[order], "名稱": [names.get(s, c) for s, c in zip(symbols[order], codes[order])],
+        "股價": close[order], "漲跌幅": change_pct[order], "成交量": vol[order].astype(np.int64),
+        "abs_change": cols["abs_change"][order]
+    })
@@ -0,0 +1,212 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from metrics import REGISTRY
+
+# ==========================================
+# 上游請求排程器：每個上游 (yahoo / news) 一個，放在資料源前面
+#   令牌桶限速 + 同時連線上限 + 優先序佇列 (機器人/警示 > 即時報價 > 圖表 > 基本資料/新聞/掃描)
+#   斷路器：連續失敗就開路，冷卻期間直接回 UpstreamUnavailable，由呼叫端改回快取資料
+#   降級狀態明確區分：throttled (排隊逾時) / circuit_open (斷路) / error (上游回了故障的結果)
+# ==========================================
+BOT, QUOTE, CHART, PROFILE = 0, 1, 2, 3
+NEWS = SCAN = PROFILE          # 新聞、全市場掃描與基本資料同一級
+PRIORITY_LABEL = {BOT: "bot", QUOTE: "quote", CHART: "chart", PROFILE: "profile"}
+MAX_WAIT = {BOT: 30.0, QUOTE: 8.0, CHART: 15.0, PROFILE: 5.0}   # 排隊超過就放棄 (秒)
+
+UPSTREAM_RATE = float(os.environ.get("STOCK_UPSTREAM_RATE", "10"))     # 每秒請求數，0 = 不限
+UPSTREAM_BURST = 20
+MAX_CONCURRENCY = int(os.environ.get("STOCK_UPSTREAM_CONCURRENCY", "4"))
+BREAKER_THRESHOLD = 5          # 連續失敗幾次開路
+BREAKER_COOLDOWN = 30.0        # 開路多久後放一個試探請求
+THROTTLE_NOTICE_SEC = 60       # 最近多久內被限流要顯示在畫面上
+
+OK, EMPTY, THROTTLED, CIRCUIT_OPEN, ERROR = "ok", "empty", "throttled", "circuit_open", "error"
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+DEGRADED_TEXT = {
+    THROTTLED: "上游限流中，稍後自動更新",
+    CIRCUIT_OPEN: "上游暫時無法連線，稍後自動重試",
+    ERROR: "上游回應錯誤",
+}
+
+class UpstreamUnavailable(Exception):
+    # 排程器拒絕送出 (THROTTLED / CIRCUIT_OPEN)，或上游回了被 ok() 判定為故障的結果 (ERROR)
+    def __init__(self, state, retry_in=0.0):
+        super().__init__(f"{state} (retry in {retry_in:.0f}s)" if retry_in else state)
+        self.state = state
+        self.retry_in = retry_in
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        # 拿到令牌回傳 0，否則回傳還要等幾秒
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait: return
+            time.sleep(wait)
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0              # 連續失敗次數
+        self.opened_at = 0.0
+        self.probing = False           # 半開時只放一個試探請求
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED: return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown: return False
+                self.state = HALF_OPEN
+            if self.probing: return False
+            self.probing = True
+            return True
+
+    def success(self):
+        with self._lock: self.state, self.failures, self.probing = CLOSED, 0, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state, self.opened_at = OPEN, time.monotonic()
+
+    def cancel(self):
+        # 試探請求沒送出去 (排隊逾時) 或結果無從判斷 (單檔空表)，讓下一個請求再試
+        with self._lock: self.probing = False
+
+    def retry_in(self):
+        with self._lock:
+            if self.state != OPEN: return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+class Scheduler:
+    def __init__(self, name, rate=UPSTREAM_RATE, burst=UPSTREAM_BURST, max_concurrency=MAX_CONCURRENCY,
+                 breaker=None, max_wait=MAX_WAIT):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self.max_wait = max_wait
+        self.active = 0
+        self.last = {}                 # priority -> (狀態, time.time())
+        self._queue = []               # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _admit(self, priority, timeout):
+        # 輪到自己 (佇列最前面) + 有空的連線 + 有令牌才放行；逾時回傳 False
+        ticket = (priority, next(self._seq))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    wait = None
+                    if self._queue[0] == ticket and self.active < self.max_concurrency:
+                        wait = self.bucket.try_acquire() if self.bucket else 0.0
+                        if not wait:
+                            self.active += 1
+                            return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: return False
+                    self._cond.wait(min(wait, remaining) if wait else remaining)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def _mark(self, priority, state):
+        self.last[priority] = (state, time.time())
+        REGISTRY.inc("scheduler_requests_total", upstream=self.name, priority=PRIORITY_LABEL[priority], result=state)
+
+    def call(self, priority, func, *args, ok=None, **kwargs):
+        # ok(result)：True 成功 / False 故障 (yfinance 連不上時常常只回空表，不丟例外) / None 無從判斷 (單檔空表)
+        if not self.breaker.allow():
+            self._mark(priority, CIRCUIT_OPEN)
+            raise UpstreamUnavailable(CIRCUIT_OPEN, self.breaker.retry_in())
+        t0 = time.perf_counter()
+        if not self._admit(priority, self.max_wait[priority]):
+            self.breaker.cancel()
+            self._mark(priority, THROTTLED)
+            raise UpstreamUnavailable(THROTTLED)
+        REGISTRY.observe("latency_seconds", time.perf_counter() - t0, op=f"scheduler.{self.name}.wait.{PRIORITY_LABEL[priority]}")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.breaker.failure()
+            self._mark(priority, ERROR)
+            raise
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+        verdict = True if ok is None else ok(result)
+        if verdict is False:
+            self.breaker.failure()
+            self._mark(priority, ERROR)
+            raise UpstreamUnavailable(ERROR)
+        if verdict:
+            self.breaker.success()
+            self._mark(priority, OK)
+        else:
+            self.breaker.cancel()      # 半開時空表不能證明已恢復，也不能讓試探名額一直卡住
+            self._mark(priority, EMPTY)
+        return result
+
+    def status(self):
+        # 管理面板 / 降級提示用
+        with self._cond: queued = [PRIORITY_LABEL[p] for p, _ in self._queue]
+        now = time.time()
+        throttled = [PRIORITY_LABEL[p] for p, (state, ts) in sorted(self.last.items())
+                     if state == THROTTLED and now - ts < THROTTLE_NOTICE_SEC]
+        return {"upstream": self.name, "breaker": self.breaker.state, "retry_in": self.breaker.retry_in(),
+                "active": self.active, "queued": {label: queued.count(label) for label in PRIORITY_LABEL.values()},
+                "throttled": throttled, "degraded": self.breaker.state != CLOSED or bool(throttled),
+                "last": {PRIORITY_LABEL[p]: state for p, (state, _) in sorted(self.last.items())}}
+
+_SCHEDULERS = {}
+_LOCK = threading.Lock()
+
+def get_scheduler(name="yahoo"):
+    # 每個行程、每個上游一個 (bot_daemon 是另一個行程，自己一組限額)
+    with _LOCK:
+        if name not in _SCHEDULERS: _SCHEDULERS[name] = Scheduler(name)
+        return _SCHEDULERS[name]
+
+def set_scheduler(scheduler):
+    with _LOCK: old, _SCHEDULERS[scheduler.name] = _SCHEDULERS.get(scheduler.name), scheduler
+    return old
+
+def all_schedulers():
+    with _LOCK: return list(_SCHEDULERS.values())
+
+def non_empty(df):
+    # 多檔批次整張空表 = 上游故障
+    return df is not None and not df.empty
+
+def has_rows(df):
+    # 單檔空表可能只是代號不存在 / 還沒開盤，不算成功也不算失敗
+    return True if df is not None and not df.empty else None
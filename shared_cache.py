@@ -0,0 +1,86 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics import record_cache
+
+# ==========================================
+# 跨 session 共用快取：同 key 合併請求 (single-flight) + 過期先回舊值背景更新 + LRU 上限
+#   上游降級 (loader 丟例外，例如斷路器開啟) 時不論多舊都先回最後一次的值
+# ==========================================
+class SharedCache:
+    def __init__(self, ttl=60, stale_ttl=900, max_entries=2048, refresh_workers=4, name=None, clock=time.time):
+        self.name = name                # 量測用名稱 (cache_requests_total 的 cache 標籤)
+        self.clock = clock              # 重播行情時改用資料源的虛擬時鐘
+        self.ttl = ttl                  # 新鮮期：直接回傳
+        self.stale_ttl = stale_ttl      # 過期但仍可先回舊值的期限，超過就同步重抓
+        self.max_entries = max_entries
+        self._data = OrderedDict()      # key -> (抓取時間, value)
+        self._inflight = {}             # key -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=refresh_workers)
+
+    def _store(self, key, value, fetched_at):
+        self._data[key] = (fetched_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries: self._data.popitem(last=False)
+
+    def _load(self, keys, loader, futures):
+        # loader(keys) -> {key: value}；沒回來的 key 存 None (負快取)，整批失敗則不寫入，回傳保留的舊值
+        try:
+            values = loader(keys) or {}
+            failed = False
+        except Exception:
+            values, failed = {}, True
+        now = self.clock()
+        with self._lock:
+            if failed: values = {k: self._data[k][1] for k in keys if k in self._data}
+            for k in keys:
+                if not failed: self._store(k, values.get(k), now)
+                if self._inflight.get(k) is futures[k]: del self._inflight[k]
+        if failed and self.name: record_cache(self.name, "fallback", len(values))
+        for k in keys: futures[k].set_result(values.get(k))
+        return values
+
+    def get_many(self, keys, loader):
+        now = self.clock()
+        res, owned, waiting, stale = {}, [], {}, []
+        with self._lock:
+            for k in dict.fromkeys(keys):
+                hit = self._data.get(k)
+                if hit is not None:
+                    self._data.move_to_end(k)
+                    age = now - hit[0]
+                    if age < self.ttl:
+                        res[k] = hit[1]; continue
+                    if age < self.stale_ttl:
+                        res[k] = hit[1]
+                        if k not in self._inflight: stale.append(k)
+                        continue
+                fut = self._inflight.get(k)
+                if fut is not None: waiting[k] = fut
+                else: owned.append(k)
+
+            futures = {}
+            for k in owned + stale:
+                futures[k] = Future()
+                self._inflight[k] = futures[k]
+
+        if self.name:
+            record_cache(self.name, "hit", len(res) - len(stale))
+            record_cache(self.name, "stale", len(stale))
+            record_cache(self.name, "miss", len(owned))
+            record_cache(self.name, "wait", len(waiting))
+        if stale:
+            self._pool.submit(self._load, stale, loader, {k: futures[k] for k in stale})
+        if owned:
+            values = self._load(owned, loader, {k: futures[k] for k in owned})
+            for k in owned: res[k] = values.get(k)
+        for k, fut in waiting.items(): res[k] = fut.result()
+        return res
+
+    def get(self, key, loader):
+        return self.get_many([key], lambda keys: {k: loader(k) for k in keys})[key]
+
+    def clear(self):
+        with self._lock: self._data.clear()
@@ -0,0 +1,213 @@
+import os
+import re
+import csv
+import sys
+import time
+import bisect
+import logging
+import argparse
+import threading
+
+# ==========================================
+# 全市場代號主檔：代號、名稱、市場 (上市 .TW / 上櫃 .TWO)、產業、每張股數
+#   讀本地主檔，不必連網就能決定 Yahoo 代號後綴
+#   repo 內附的 data/symbols.csv 只是約 120 檔的種子檔；第一次用到時在背景由證交所 ISIN 頁建立完整主檔
+#   (上市 + 上櫃約 1,800 檔) 存到 data/symbols_full.csv，建好後自動換上，之後每週在背景更新一次；
+#   離線 / 建立失敗時照常用種子檔 (未收錄的代號當上市 .TW)，隔一小時再試。python symbols.py 可手動先建好
+#   搜尋索引：代號排序陣列 (前綴二分搜尋) + 字元倒排索引 (名稱/代號模糊比對先交集候選)
+#   排名：代號完全相符 > 名稱完全相符 > 代號前綴 > 名稱前綴 > 包含 > 依序出現 (例如「台電」→ 台積電、台達電)
+# ==========================================
+SYMBOLS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbols.csv')
+DATA_DIR = os.environ.get('STOCK_DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+BUILT_CSV = os.path.join(DATA_DIR, 'symbols_full.csv')   # 自動建立的完整主檔 (不進版控)
+BUILD_RETRY_SEC = 3600         # 建立失敗 (離線) 後隔多久再試，也是檢查主檔是否過期的週期
+MASTER_MAX_AGE = 7 * 86400     # 完整主檔超過一週就在背景重建 (新上市 / 下市)
+FIELDS = ["code", "name", "market", "industry", "lot"]
+SUFFIX = {"上市": ".TW", "上櫃": ".TWO"}
+DEFAULT_SUFFIX = ".TW"
+SEARCH_LIMIT = 8
+FULL_MASTER_MIN = 1500   # 少於此數視為種子檔 / 不完整
+
+log = logging.getLogger("symbols")
+
+def _subsequence(q, text):
+    it = iter(text)
+    return all(ch in it for ch in q)
+
+class SymbolMaster:
+    def __init__(self, rows=()):
+        from trade_costs import LOT_SHARES   # trade_costs 會載入 numpy，頁面 import 時不需要
+        self.rows = []
+        self.by_code = {}
+        self.by_name = {}
+        for r in rows:
+            code = str(r['code']).strip()
+            if not code or code in self.by_code: continue
+            item = {"code": code, "name": str(r.get('name') or code).strip(), "market": r.get('market') or "上市",
+                    "industry": r.get('industry') or "", "lot": int(r.get('lot') or LOT_SHARES)}
+            self.by_code[code] = len(self.rows)
+            self.by_name.setdefault(item['name'].lower(), len(self.rows))
+            self.rows.append(item)
+        self.sorted_codes = sorted(self.by_code)
+        self.keys = [(r['code'] + ' ' + r['name']).lower() for r in self.rows]
+        self.chars = {}
+        for i, key in enumerate(self.keys):
+            for ch in set(key) - {' '}: self.chars.setdefault(ch, set()).add(i)
+
+    @classmethod
+    def load(cls, path=None):
+        # 優先用自動建立的完整主檔，沒有才退回 repo 內附的種子檔
+        if path is None: path = BUILT_CSV if os.path.exists(BUILT_CSV) else SYMBOLS_CSV
+        master = cls()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8', newline='') as f: master = cls(list(csv.DictReader(f)))
+        if not master.complete:
+            log.warning("代號主檔 %s 只有 %d 檔 (不完整)，完整主檔建好前未收錄的代號當上市 .TW 處理", path, len(master))
+        return master
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def complete(self):
+        return len(self.rows) >= FULL_MASTER_MIN
+
+    def get(self, code):
+        i = self.by_code.get(code)
+        return self.rows[i] if i is not None else None
+
+    def name(self, code, default=None):
+        r = self.get(code)
+        return r['name'] if r else (code if default is None else default)
+
+    def suffix(self, code):
+        r = self.get(code)
+        return SUFFIX.get(r['market'], DEFAULT_SUFFIX) if r else DEFAULT_SUFFIX
+
+    def symbol(self, code):
+        return code + self.suffix(code)
+
+    def info(self, code, price=None):
+        # 交易單位：每張股數 + 依價格的升降單位
+        from trade_costs import tick_size
+        r = self.get(code)
+        if r is None: return None
+        return {**r, "symbol": code + SUFFIX.get(r['market'], DEFAULT_SUFFIX), "tick": float(tick_size(price)) if price else None}
+
+    def _code_prefix(self, q, limit):
+        # 排序陣列上二分搜尋，只取前 limit 筆 (完全相符的代號最短，一定排在最前面)
+        lo = bisect.bisect_left(self.sorted_codes, q)
+        hi = bisect.bisect_left(self.sorted_codes, q + '\uffff', lo)
+        return [self.by_code[c] for c in self.sorted_codes[lo:min(hi, lo + limit)]]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        # 回傳 [{code, name, market, ...}, ...]，依相符程度排序
+        q = re.sub(r'\.TWO?$', '', str(query).strip(), flags=re.I).lower()
+        if not q: return []
+        scored = {}
+        if q.isascii():
+            for i in self._code_prefix(q.upper(), limit): scored[i] = 0 if self.rows[i]['code'].lower() == q else 2
+        i = self.by_name.get(q)
+        if i is not None: scored[i] = 1
+        if len(scored) >= limit: cand = set()   # 代號前綴已經排滿，後面的名次不可能擠進來
+        else:
+            chars = set(q) - {' '}
+            cand = set.intersection(*(self.chars.get(ch, set()) for ch in chars)) if chars else set()
+        for i in cand - scored.keys():
+            name = self.rows[i]['name'].lower()
+            if name.startswith(q): scored[i] = 3
+            elif q in self.keys[i]: scored[i] = 4
+            elif _subsequence(q, name) or _subsequence(q, self.keys[i]): scored[i] = 5
+        best = sorted(scored.items(), key=lambda kv: (kv[1], len(self.rows[kv[0]]['code']), self.rows[kv[0]]['code']))
+        return [self.rows[i] for i, _ in best[:limit]]
+
+    def resolve(self, query):
+        # 代號或名稱 -> 代號；完全相符或只有一筆候選才算數，否則原樣回傳
+        q = re.sub(r'\.TWO?$', '', str(query).strip(), flags=re.I)
+        if q in self.by_code or not q: return q
+        i = self.by_name.get(q.lower())
+        if i is not None: return self.rows[i]['code']
+        hits = self.search(q, 2)
+        return hits[0]['code'] if len(hits) == 1 else q
+
+_MASTER = None
+_LOCK = threading.Lock()
+_BUILD = {"thread": None, "next_check": 0.0, "error": None}
+_BUILD_LOCK = threading.Lock()
+
+def get_master():
+    # 行程內只載入一次 (market_data.to_symbol 也會用到)；只有種子檔或主檔過期時在背景建立，建好後自動換上
+    global _MASTER
+    if _MASTER is None:
+        with _LOCK:
+            if _MASTER is None: _MASTER = SymbolMaster.load()
+    if time.monotonic() >= _BUILD['next_check']: ensure_master_build()
+    return _MASTER
+
+def reload_master():
+    global _MASTER
+    with _LOCK: _MASTER = SymbolMaster.load()
+    return _MASTER
+
+def _stale():
+    if not _MASTER.complete: return True
+    return os.path.exists(BUILT_CSV) and time.time() - os.path.getmtime(BUILT_CSV) > MASTER_MAX_AGE
+
+def ensure_master_build():
+    # 每 BUILD_RETRY_SEC 最多起一個背景建立；回傳是否有啟動
+    with _BUILD_LOCK:
+        if time.monotonic() < _BUILD['next_check']: return False
+        _BUILD['next_check'] = time.monotonic() + BUILD_RETRY_SEC
+        if _MASTER is None or not _stale(): return False
+        _BUILD['thread'] = threading.Thread(target=_build_in_background, name="symbols-build", daemon=True)
+        _BUILD['thread'].start()
+    return True
+
+def _build_in_background():
+    try:
+        from providers import get_provider
+        if get_provider().name != "yahoo": return   # 本地庫 / 重播模式完全不連網
+        n = build_master(BUILT_CSV)
+        _BUILD['error'] = None if n else "ISIN 頁讀取失敗"
+        if n:
+            reload_master()
+            log.info("完整代號主檔已建立：%d 檔 -> %s", n, BUILT_CSV)
+    except Exception as e:
+        _BUILD['error'] = str(e) or type(e).__name__
+        log.warning("代號主檔建立失敗：%s", e)
+
+def build_status():
+    # 畫面提示用：{"running": 是否建立中, "error": 上次失敗原因}
+    t = _BUILD['thread']
+    return {"running": bool(t and t.is_alive()), "error": _BUILD['error']}
+
+def build_master(path=BUILT_CSV, min_rows=FULL_MASTER_MIN):
+    # 由證交所 ISIN 頁 (上市 + 上櫃普通股) 重建主檔；抓不到或只抓到一部分 (少於 min_rows) 就保留舊檔
+    from scanner import load_universe_table
+    from trade_costs import LOT_SHARES
+    rows = [{"code": code, "name": name, "market": market, "industry": industry, "lot": LOT_SHARES}
+            for _, code, name, market, industry in load_universe_table()]
+    if not rows or len(rows) < min_rows: return 0
+    rows.sort(key=lambda r: (r['market'] != "上市", r['code']))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"   # 網頁與 bot_daemon 兩個行程可能同時建立
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    return len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the full symbol master from the TWSE ISIN listing (the apps also do this on first use)")
+    parser.add_argument("--out", default=BUILT_CSV)
+    args = parser.parse_args(argv)
+    n = build_master(args.out)
+    if not n:
+        print("ISIN 頁讀取失敗，主檔未更新", file=sys.stderr)
+        return 1
+    print(f"寫入 {n} 檔 -> {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
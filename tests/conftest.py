@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 測試直接 import repo 根目錄的模組 (與 benchmarks/ 相同做法)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,51 @@
+from alerts import AlertIndex, BELOW, ABOVE
+
+# ==========================================
+# 觸發價索引：一次性觸發、可重複觸發的遲滯重新上膛
+# ==========================================
+def fired(events):
+    return [e[0] for e in events]
+
+def test_one_shot_fires_once():
+    idx = AlertIndex()
+    a = idx.add("2330", 100, BELOW)
+    assert idx.update("2330", 101) == []
+    assert fired(idx.update("2330", 99)) == [a]
+    assert len(idx) == 0
+    idx.update("2330", 105)
+    assert idx.update("2330", 95) == []
+
+def test_new_alert_fires_when_already_past_level():
+    idx = AlertIndex()
+    idx.update("2330", 95)
+    a = idx.add("2330", 100, BELOW)
+    assert fired(idx.update("2330", 96)) == [a]
+
+def test_below_rearms_only_after_clearing_hysteresis():
+    idx = AlertIndex()
+    a = idx.add("2330", 100, BELOW, one_shot=False, hysteresis=2)
+    idx.update("2330", 101)
+    assert fired(idx.update("2330", 99)) == [a]
+    idx.update("2330", 101)                           # 沒站回 102 之上
+    assert idx.update("2330", 99) == []
+    idx.update("2330", 103)                           # 站回 102 之上，重新上膛
+    assert fired(idx.update("2330", 99)) == [a]
+    assert len(idx) == 1
+
+def test_above_rearms_only_after_clearing_hysteresis():
+    idx = AlertIndex()
+    a = idx.add("2330", 100, ABOVE, one_shot=False, hysteresis=2)
+    idx.update("2330", 99)
+    assert fired(idx.update("2330", 101)) == [a]
+    idx.update("2330", 99)                            # 沒跌破 98
+    assert idx.update("2330", 101) == []
+    idx.update("2330", 97)
+    assert fired(idx.update("2330", 101)) == [a]
+
+def test_removed_alert_does_not_fire():
+    idx = AlertIndex()
+    a = idx.add("2330", 100, BELOW)
+    b = idx.add("2330", 90, BELOW)
+    idx.update("2330", 101)
+    assert idx.remove(a)
+    assert fired(idx.update("2330", 80)) == [b]
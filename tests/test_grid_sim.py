@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from grid_sim import GridSimulator, BUY, SELL
+from trade_costs import net_pl
+
+# ==========================================
+# 網格模擬：跳空穿過的價位一律以開盤價成交，不以掛單價成交
+# ==========================================
+def bars(rows, start="2026-10-16 09:00"):
+    # rows: [(open, high, low, close), ...]，逐分一根
+    df = pd.DataFrame(rows, columns=["open", "high", "low", "close"])
+    df.insert(0, "date", pd.date_range(start, periods=len(df), freq="1min"))
+    df["volume"] = 1
+    return df
+
+def flat(price):
+    return (price, price, price, price)
+
+def test_levels_are_tick_aligned():
+    sim = GridSimulator(100, 110, 11)
+    assert sim.levels.tolist() == [float(p) for p in range(100, 111)]
+
+def test_gap_down_buys_at_open():
+    sim = GridSimulator(100, 110, 11)
+    sim.update(bars([flat(105.5), flat(102.5)]), final=True)
+    buys = [f for f in sim.fills if f['side'] == BUY]
+    assert [f['level'] for f in buys] == [3, 4, 5]       # 103 / 104 / 105 被跳空穿過
+    assert [f['price'] for f in buys] == [102.5] * 3
+    assert sim.cost[[3, 4, 5]].tolist() == [102.5] * 3
+
+def test_gap_up_sells_at_open():
+    sim = GridSimulator(100, 110, 11, discount=0.6)
+    sim.update(bars([flat(105.5), flat(102.5), flat(107)]), final=True)
+    sells = [f for f in sim.fills if f['side'] == SELL]
+    assert [f['level'] for f in sells] == [4, 5, 6]
+    assert [f['price'] for f in sells] == [107.0] * 3
+    expected = float(net_pl(102.5, 107, 1, True, 0.6))
+    assert [f['pl'] for f in sells] == pytest.approx([expected] * 3)
+    assert sim.realized == pytest.approx(3 * expected)
+    assert sim.buy_armed[[3, 4, 5]].all()                # 賣出後原格重新掛買單
+
+def test_intrabar_moves_fill_at_level():
+    sim = GridSimulator(100, 110, 11)
+    sim.update(bars([flat(105.5), (105.5, 105.6, 103.8, 104.2)]), final=True)
+    buys = [f for f in sim.fills if f['side'] == BUY]
+    assert [(f['level'], f['price']) for f in buys] == [(4, 104.0), (5, 105.0)]
+
+def test_open_bar_waits_until_closed():
+    sim = GridSimulator(100, 110, 11)
+    df = bars([flat(105.5), flat(102.5)])
+    assert sim.update(df) == 1                           # 最後一根還沒收完
+    assert sim.fills == []
+    assert sim.update(df, final=True) == 1
+    assert len(sim.fills) == 3
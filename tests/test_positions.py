@@ -0,0 +1,62 @@
+import pytest
+from positions import PositionBook, TAKE_PROFIT, STOP_LOSS, TRAIL_STOP, MANUAL
+
+# ==========================================
+# 部位管理：停利 / 停損二擇一 (OCO) 與移動停損
+# ==========================================
+META = {"owner": "u1", "slot": 0, "code": "2330", "symbol": "2330.TW"}
+
+def test_take_profit_cancels_stop_loss():
+    book = PositionBook()
+    book.open("a", META, entry=100, qty=2, profit_pct=5, loss_pct=3)
+    assert book.update({"2330.TW": 104}, ts=1) == []
+    events = book.update({"2330.TW": 105.5}, ts=2)
+    assert [e['kind'] for e in events] == [TAKE_PROFIT]
+    assert events[0]['exit'] == 105.5
+    assert events[0]['pl'] == pytest.approx(5.5 * 2 * 1000)
+    assert "a" not in book
+    assert book.update({"2330.TW": 90}, ts=3) == []    # 另一邊已一併取消
+
+def test_stop_loss_cancels_take_profit():
+    book = PositionBook()
+    book.open("a", META, entry=100, qty=1, profit_pct=5, loss_pct=3)
+    events = book.update({"2330.TW": 96}, ts=1)
+    assert [e['kind'] for e in events] == [STOP_LOSS]
+    assert book.update({"2330.TW": 110}, ts=2) == []
+    assert len(book) == 0
+
+def test_both_legs_touched_prefers_stop():
+    book = PositionBook()
+    # 從儲存區還原：停損已被移動停損上移到停利價之上，同一筆報價兩邊都碰到
+    book.open("a", META, entry=100, qty=1, profit_pct=5, loss_pct=3, tp=99, sl=101)
+    events = book.update({"2330.TW": 100}, ts=1)
+    assert [e['kind'] for e in events] == [TRAIL_STOP]
+    assert len(book) == 0
+
+def test_trailing_stop_only_moves_up():
+    book = PositionBook()
+    book.open("a", META, entry=100, qty=1, profit_pct=50, loss_pct=3, trail_pct=2)
+    assert book.update({"2330.TW": 110}, ts=1) == []
+    i = book.slot_of["a"]
+    assert book.sl[i] == pytest.approx(107.8)
+    assert book.update({"2330.TW": 108}, ts=2) == []
+    assert book.sl[i] == pytest.approx(107.8)          # 回落不會把停損往下拉
+    events = book.update({"2330.TW": 107.5}, ts=3)
+    assert [e['kind'] for e in events] == [TRAIL_STOP]
+    assert events[0]['pl'] == pytest.approx(7.5 * 1000)
+
+def test_trailing_stop_below_base_stop_is_plain_stop_loss():
+    book = PositionBook()
+    book.open("a", META, entry=100, qty=1, profit_pct=50, loss_pct=3, trail_pct=5)
+    events = book.update({"2330.TW": 96}, ts=1)
+    assert [e['kind'] for e in events] == [STOP_LOSS]
+
+def test_missing_price_and_manual_close():
+    book = PositionBook(capacity=1)
+    book.open("a", META, entry=100, qty=1, profit_pct=5, loss_pct=3)
+    book.open("b", dict(META, symbol="2317.TW"), entry=50, qty=1, profit_pct=5, loss_pct=3)
+    assert len(book) == 2                                # 容量不足時自動擴充
+    assert book.update({"2317.TW": 51}, ts=1) == []      # 沒報價的 2330 不動
+    event = book.close("a", 101, ts=2)
+    assert event['kind'] == MANUAL and "a" not in book
+    assert book.close("a", 101, ts=3) is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from resample import resample_session, resample_bars
+
+# ==========================================
+# 分K 重取樣：以 09:00 為錨點，13:30 收盤集合競價併入最後一根，盤外資料不計
+# ==========================================
+def session_bars(day="2026-10-16"):
+    # 09:00 ~ 13:24 逐分 + 13:30 收盤一根 (台股 1 分K 的實際樣子)，前後各加一根盤外資料
+    times = list(pd.date_range(f"{day} 09:00", f"{day} 13:24", freq="1min"))
+    times = [pd.Timestamp(f"{day} 08:59")] + times + [pd.Timestamp(f"{day} 13:30"), pd.Timestamp(f"{day} 13:31")]
+    n = len(times)
+    close = 100 + np.arange(n) * 0.1
+    return pd.DataFrame({"date": times, "open": close - 0.05, "high": close + 0.2, "low": close - 0.2,
+                         "close": close, "volume": np.arange(1, n + 1)})
+
+def test_closing_auction_joins_last_bucket():
+    df = session_bars()
+    out = resample_session(df, 5)
+    assert out['date'].iloc[0] == pd.Timestamp("2026-10-16 09:00")
+    assert out['date'].iloc[-1] == pd.Timestamp("2026-10-16 13:25")
+    assert len(out) == 54
+    last = out.iloc[-1]
+    closing = df[df['date'] == "2026-10-16 13:30"].iloc[0]
+    tail = df[(df['date'] >= "2026-10-16 13:25") & (df['date'] <= "2026-10-16 13:30")]
+    assert last['close'] == closing['close']
+    assert last['volume'] == tail['volume'].sum()
+
+def test_hourly_buckets_anchor_at_open():
+    out = resample_session(session_bars(), 60)
+    assert [t.strftime("%H:%M") for t in out['date']] == ["09:00", "10:00", "11:00", "12:00", "13:00"]
+
+def test_out_of_session_bars_dropped():
+    df = session_bars()
+    out = resample_bars(df, 15)
+    inside = df[(df['date'] >= "2026-10-16 09:00") & (df['date'] <= "2026-10-16 13:30")]
+    assert out['volume'].sum() == inside['volume'].sum()
+    assert out['open'].iloc[0] == inside['open'].iloc[0]
+
+def test_days_do_not_merge():
+    df = pd.concat([session_bars("2026-10-15"), session_bars("2026-10-16")], ignore_index=True)
+    out = resample_session(df, 30)
+    assert len(out) == 2 * 9
+    assert out['date'].iloc[8] == pd.Timestamp("2026-10-15 13:00")
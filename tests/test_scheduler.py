@@ -0,0 +1,76 @@
+import pytest
+import scheduler
+from scheduler import CircuitBreaker, Scheduler, UpstreamUnavailable, CLOSED, OPEN, HALF_OPEN, CIRCUIT_OPEN, QUOTE
+
+# ==========================================
+# 斷路器狀態轉換：closed -> open -> half_open -> closed / open
+# ==========================================
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    return now
+
+def test_opens_after_threshold_failures(clock):
+    b = CircuitBreaker(threshold=3, cooldown=30)
+    for _ in range(2): b.failure()
+    assert b.state == CLOSED and b.allow()
+    b.failure()
+    assert b.state == OPEN
+    assert not b.allow()
+    assert b.retry_in() == 30
+
+def test_success_resets_failure_count(clock):
+    b = CircuitBreaker(threshold=3, cooldown=30)
+    b.failure(); b.failure(); b.success()
+    b.failure(); b.failure()
+    assert b.state == CLOSED
+
+def test_half_open_lets_one_probe_through(clock):
+    b = CircuitBreaker(threshold=1, cooldown=30)
+    b.failure()
+    clock[0] += 29
+    assert not b.allow()
+    clock[0] += 1
+    assert b.allow()
+    assert b.state == HALF_OPEN
+    assert not b.allow()           # 試探中，其他請求擋下
+
+def test_probe_success_closes(clock):
+    b = CircuitBreaker(threshold=1, cooldown=30)
+    b.failure()
+    clock[0] += 30
+    assert b.allow()
+    b.success()
+    assert b.state == CLOSED and b.failures == 0
+    assert b.allow() and b.allow()
+
+def test_probe_failure_reopens_with_new_cooldown(clock):
+    b = CircuitBreaker(threshold=5, cooldown=30)
+    for _ in range(5): b.failure()
+    clock[0] += 30
+    assert b.allow()
+    b.failure()
+    assert b.state == OPEN
+    assert b.retry_in() == 30
+    assert not b.allow()
+
+def test_cancel_frees_the_probe(clock):
+    b = CircuitBreaker(threshold=1, cooldown=30)
+    b.failure()
+    clock[0] += 30
+    assert b.allow()
+    b.cancel()
+    assert b.state == HALF_OPEN
+    assert b.allow()
+
+def test_scheduler_rejects_while_open(clock):
+    s = Scheduler("test", rate=0, breaker=CircuitBreaker(threshold=1, cooldown=30))
+    with pytest.raises(RuntimeError):
+        s.call(QUOTE, lambda: (_ for _ in ()).throw(RuntimeError("down")))
+    with pytest.raises(UpstreamUnavailable) as err:
+        s.call(QUOTE, lambda: 1)
+    assert err.value.state == CIRCUIT_OPEN
+    clock[0] += 30
+    assert s.call(QUOTE, lambda: 1) == 1
+    assert s.breaker.state == CLOSED
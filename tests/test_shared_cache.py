@@ -0,0 +1,71 @@
+import time
+import threading
+from shared_cache import SharedCache
+
+# ==========================================
+# SharedCache：同 key 合併請求 (single-flight)、過期回舊值、上游失敗時退回最後一次的值
+# ==========================================
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_concurrent_misses_share_one_load():
+    cache = SharedCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return key.upper()
+
+    results = []
+    def worker(): results.append(cache.get("2330", loader))
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]: t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads: t.join(5)
+    assert calls == ["2330"]
+    assert results == ["2330"] * 8
+
+def test_get_many_loads_only_missing_keys():
+    cache = SharedCache(ttl=60)
+    batches = []
+    def loader(keys):
+        batches.append(sorted(keys))
+        return {k: k * 2 for k in keys}
+    assert cache.get_many(["a", "b"], loader) == {"a": "aa", "b": "bb"}
+    assert cache.get_many(["a", "b", "c"], loader) == {"a": "aa", "b": "bb", "c": "cc"}
+    assert batches == [["a", "b"], ["c"]]
+
+def test_stale_value_returned_while_refreshing():
+    clock = Clock()
+    cache = SharedCache(ttl=10, stale_ttl=100, clock=clock)
+    cache.get("k", lambda k: 1)
+    clock.now = 50
+    assert cache.get("k", lambda k: 2) == 1     # 先回舊值，背景更新
+    cache._pool.shutdown(wait=True)
+    assert cache.get("k", lambda k: 3) == 2
+
+def test_loader_failure_falls_back_to_last_value():
+    clock = Clock()
+    cache = SharedCache(ttl=10, stale_ttl=100, clock=clock)
+    cache.get("k", lambda k: "old")
+    clock.now = 1000                            # 超過 stale_ttl，照理要同步重抓
+
+    def down(keys): raise ConnectionError("circuit open")
+    assert cache.get_many(["k"], down) == {"k": "old"}
+    assert cache.get("k", lambda k: "new") == "new"   # 失敗不寫入，下次仍會重抓
+
+def test_loader_failure_without_cached_value_returns_none():
+    cache = SharedCache()
+    def down(keys): raise ConnectionError("circuit open")
+    assert cache.get_many(["k"], down) == {"k": None}
+    assert cache.get("k", lambda k: "v") == "v"
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from trade_costs import trade_costs, net_pl, pl_grid
+
+# ==========================================
+# trade_costs 與原本當沖試算 (grid_bot 內的公式) 逐筆比對
+# ==========================================
+def old_calculator(entry_price, exit_price, qty, discount, long):
+    trade_val = entry_price * qty * 1000
+    fee_rate = 0.001425 * discount
+    tax_rate = 0.0015
+    fee_in = trade_val * fee_rate
+    fee_out = (exit_price * qty * 1000) * fee_rate
+    total_fee = max(20, fee_in) + max(20, fee_out)
+    if long:
+        tax = (exit_price * qty * 1000) * tax_rate
+        gross_pl = (exit_price - entry_price) * qty * 1000
+    else:
+        tax = (entry_price * qty * 1000) * tax_rate
+        gross_pl = (entry_price - exit_price) * qty * 1000
+    return gross_pl, total_fee, tax, gross_pl - total_fee - tax
+
+CASES = [
+    (580.0, 585.0, 1, 0.6, True),
+    (580.0, 575.0, 3, 0.6, False),
+    (12.35, 12.4, 1, 0.28, True),     # 低價股：單邊手續費被最低 20 元墊高
+    (9.8, 9.5, 2, 1.0, False),
+    (1020.0, 1005.0, 10, 0.5, True),
+]
+
+@pytest.mark.parametrize("entry, exit, lots, discount, long", CASES)
+def test_matches_old_calculator(entry, exit, lots, discount, long):
+    gross, fee, tax, net = old_calculator(entry, exit, lots, discount, long)
+    g, f, t = trade_costs(entry, exit, lots, long, discount)
+    assert (float(g), float(f), float(t)) == pytest.approx((gross, fee, tax))
+    assert float(net_pl(entry, exit, lots, long, discount)) == pytest.approx(net)
+
+@pytest.mark.parametrize("long", [True, False])
+def test_broadcast_matches_scalar(long):
+    exits = np.array([95.0, 99.5, 100.0, 100.5, 105.0])
+    lots = np.array([1, 2, 5])
+    grid = pl_grid(100.0, exits, lots, long, 0.6)
+    assert grid.shape == (5, 3)
+    for i, x in enumerate(exits):
+        for j, n in enumerate(lots):
+            assert grid[i, j] == pytest.approx(old_calculator(100.0, x, n, 0.6, long)[3])
@@ -0,0 +1,61 @@
+import numpy as np
+
+# ==========================================
+# 交易成本與升降單位 (當沖試算、回測、網格共用)
+#   手續費 0.1425% x 折數，單邊最低 20 元；當沖證交稅 0.15% 只在賣出那一邊收
+# ==========================================
+FEE_RATE = 0.001425
+MIN_FEE = 20
+DAYTRADE_TAX = 0.0015
+LOT_SHARES = 1000
+
+# 證交所升降單位：<10 / <50 / <100 / <500 / <1000 / >=1000
+TICK_BANDS = np.array([10, 50, 100, 500, 1000], dtype=float)
+TICK_SIZES = np.array([0.01, 0.05, 0.1, 0.5, 1, 5])
+
+def tick_size(price):
+    return TICK_SIZES[np.searchsorted(TICK_BANDS, price, 'right')]
+
+def round_to_tick(price):
+    return np.round(np.round(np.asarray(price, dtype=float) / tick_size(price)) * tick_size(price), 2)
+
+def tick_ladder(center, n_ticks):
+    # 以 center 為中心、上下各 n_ticks 檔的合法價位 (跨價格區間時檔距會跟著變)
+    center = float(round_to_tick(center))
+    lo, hi = max(0.01, center * 0.5), center * 1.5 + 5
+    edges = np.concatenate([[0.0], TICK_BANDS, [np.inf]])
+    parts = []
+    for a, b, step in zip(edges[:-1], edges[1:], TICK_SIZES):
+        a, b = max(a, lo), min(b, hi)
+        if a >= b: continue
+        start = np.ceil(round(a / step, 6)) * step
+        parts.append(np.arange(start, b - step / 2, step))
+    ladder = np.unique(np.round(np.concatenate(parts), 2))
+    c = int(np.searchsorted(ladder, center))
+    return ladder[max(0, c - n_ticks):c + n_ticks + 1]
+
+def trade_costs(entry, exit, lots, long=True, discount=1.0):
+    # 可傳入陣列 (自動 broadcast)；回傳 (毛損益, 手續費, 證交稅)
+    entry, exit, lots = np.asarray(entry, dtype=float), np.asarray(exit, dtype=float), np.asarray(lots, dtype=float)
+    shares = lots * LOT_SHARES
+    in_val, out_val = entry * shares, exit * shares
+    fee = np.maximum(MIN_FEE, in_val * FEE_RATE * discount) + np.maximum(MIN_FEE, out_val * FEE_RATE * discount)
+    if long: return out_val - in_val, fee, out_val * DAYTRADE_TAX
+    return in_val - out_val, fee, in_val * DAYTRADE_TAX
+
+def net_pl(entry, exit, lots, long=True, discount=1.0):
+    gross, fee, tax = trade_costs(entry, exit, lots, long, discount)
+    return gross - fee - tax
+
+def pl_grid(entry, exits, lots, long=True, discount=1.0):
+    # 出場價 x 張數 的淨損益表，shape = (len(exits), len(lots))
+    return net_pl(entry, np.asarray(exits, dtype=float)[:, None], np.asarray(lots, dtype=float)[None, :], long, discount)
+
+def break_even(entry, lots=1, long=True, discount=1.0, max_ticks=500):
+    # 第一個淨損益 >= 0 的出場檔位；回傳 (價格, 距進場幾檔)，找不到回傳 (None, None)
+    ladder = tick_ladder(entry, max_ticks)
+    c = int(np.searchsorted(ladder, float(round_to_tick(entry))))
+    side = ladder[c:] if long else ladder[:c + 1][::-1]
+    ok = np.flatnonzero(net_pl(entry, side, lots, long, discount) >= 0)
+    if ok.size == 0: return None, None
+    return float(side[ok[0]]), int(ok[0])
@@ -0,0 +1,502 @@
+import streamlit as st
+import functools
+from datetime import datetime, time as dt_time
+import pytz
+from symbols import get_master
+from metrics import REGISTRY, METRICS_PORT, timed, instrument_methods, record_error, start_metrics_server
+from shared_cache import SharedCache
+from scheduler import PROFILE, CLOSED, ERROR, DEGRADED_TEXT, UpstreamUnavailable, get_scheduler, all_schedulers
+
+# ==========================================
+# 兩個頁面 (app.py 股市特務 X、grid_bot.py 當沖戰情室) 共用：
+#   跨 session 的快取資源、數據引擎、側邊欄面板與股市情報站
+#   頁面自己的 st.set_page_config / CSS / 模組留在各自檔案
+#   頂層只 import 輕量模組；pandas / numpy / plotly 圖表 / 掃描 / 新聞等到第一次用到才載入，
+#   新行程先把頁面框架送出去，不等這些套件 (python benchmarks/bench_startup.py 量)
+# ==========================================
+@st.cache_resource
+def get_quote_cache():
+    # 跨 session 共用的報價快取：同檔合併請求、過期先回舊值背景更新
+    from providers import clock
+    return SharedCache(ttl=60, max_entries=4096, name="quote", clock=clock)
+
+@st.cache_resource
+def get_indicator_cache():
+    from indicators import IndicatorCache
+    return IndicatorCache(max_entries=512)
+
+@st.cache_resource
+def get_figure_cache():
+    from charts import FigureCache
+    return FigureCache(max_entries=64)
+
+@st.cache_resource
+def get_metrics_server():
+    # 每個行程一個 Prometheus 端點 (METRICS_PORT)
+    return start_metrics_server()
+
+@st.cache_resource
+def get_bar_cache():
+    from providers import clock
+    return SharedCache(ttl=60, max_entries=512, name="bars", clock=clock)
+
+@st.cache_resource
+def get_news_store():
+    from news_feed import NewsStore
+    return NewsStore()
+
+@st.cache_resource
+def get_news_ingester():
+    from news_feed import NewsIngester
+    return NewsIngester(get_news_store())
+
+@st.cache_resource
+def get_bar_store():
+    from bar_store import BarStore
+    return BarStore()
+
+@st.cache_resource
+def get_intraday_book():
+    # 每檔當日 VWAP / 分價量 / 振幅的環狀緩衝，跨 session 共用
+    from intraday_stats import IntradayBook
+    return IntradayBook()
+
+@instrument_methods("engine")
+class DataEngine:
+    def __init__(self):
+        self.tz = pytz.timezone('Asia/Taipei')
+
+    @property
+    def symbols(self):
+        return get_master()   # 上市 + 上櫃代號主檔 (data/symbols.csv)，第一次用到才載入
+
+    @property
+    def watch_list(self):
+        return list(self.symbols.by_code)
+
+    def is_market_open(self):
+        from providers import get_provider
+        now = get_provider().now()   # 重播時為虛擬時間
+        if now.weekday() >= 5: return False
+        return dt_time(9, 0) <= now.time() <= dt_time(13, 30)
+
+    def get_stock_name(self, ticker):
+        from market_data import clean_code
+        return self.symbols.name(clean_code(ticker), ticker)
+
+    def fetch_quotes(self, tickers, cache=None):
+        # 批次報價：命中快取直接回傳，其餘一次 bulk 下載並回填每檔快取 (背景執行緒呼叫時由外面傳入 cache)
+        from market_data import to_symbol, clean_code, download_quotes
+        symbols = {t: to_symbol(t) for t in tickers}
+        def load(missing):
+            names = {s: self.symbols.name(clean_code(s)) for s in missing}
+            return download_quotes(missing, names)
+        quotes = (cache or get_quote_cache()).get_many(list(symbols.values()), load)
+        return {t: quotes[s] for t, s in symbols.items() if quotes.get(s)}
+
+    def fetch_quote(self, ticker, cache=None):
+        return self.fetch_quotes([ticker], cache).get(ticker)
+        
+    @st.cache_data(ttl=3600)
+    def fetch_stock_profile(_self, ticker):
+        from market_data import to_symbol, clean_code
+        from providers import get_provider
+        code = clean_code(ticker)
+        provider = get_provider()
+        try:
+            info = get_scheduler().call(PROFILE, provider.info, to_symbol(ticker), ok=lambda i: True if i else None)
+            return {
+                "pe": info.get('trailingPE', 'N/A'),
+                "eps": info.get('trailingEps', 'N/A'),
+                "marketCap": info.get('marketCap', 'N/A'),
+                "yield": info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 'N/A',
+                "sector": info.get('sector') or (_self.symbols.get(code) or {}).get('industry') or 'N/A'
+            }
+        except UpstreamUnavailable:
+            raise   # 限流 / 斷路 / 上游錯誤都不寫進 1 小時的快取，下次重跑再試
+        except Exception as e:
+            record_error(provider.name, e)
+            raise UpstreamUnavailable(ERROR) from e
+
+    @st.cache_data(ttl=60)
+    def fetch_indices(_self):
+        targets = {"加權指數": "^TWII", "櫃買指數": "^TWOII", "道瓊": "^DJI", "那斯達克": "^IXIC", "費半": "^SOX"}
+        quotes = _self.fetch_quotes(list(targets.values()))
+        return {name: quotes[sym] for name, sym in targets.items() if sym in quotes}
+
+    # === [修改重點] 增加 interval 和 period 參數 ===
+    def fetch_kline(self, ticker, interval="1d", period="3mo"):
+        # 歷史 K 棒走本地 Parquet 庫，只向上游要最後一根之後的增量；週/月K 與 5/15/60 分K 由基礎序列重取樣
+        import pandas as pd
+        from market_data import to_symbol
+        from resample import fetch_kline as fetch_resampled_kline
+        def load(key):
+            try: return fetch_resampled_kline(get_bar_store(), *key)
+            except Exception as e:
+                record_error("bar_store", e)
+                raise   # 交給 SharedCache 保留上一份 K 線，不用空表蓋掉
+        df = get_bar_cache().get((to_symbol(ticker), interval, period), load)
+        return df if df is not None else pd.DataFrame()
+
+    def fetch_indicators(self, ticker, interval="1d", period="3mo"):
+        # 回傳 (K 線, 指標表)；指標狀態依 (代號, 週期, 區間) 共用，新 K 棒只增量計算
+        import pandas as pd
+        from market_data import to_symbol
+        df = self.fetch_kline(ticker, interval, period)
+        if df.empty: return df, pd.DataFrame()
+        return df, get_indicator_cache().get((to_symbol(ticker), interval, period), df)
+
+    def indicator_snapshot(self, tickers):
+        # 每檔最新一根日K的指標 (選股結果用)，與圖表、機器人讀同一份快取
+        import pandas as pd
+        rows = {}
+        for t in tickers:
+            df, ind = self.fetch_indicators(t)
+            if not ind.empty: rows[t] = ind.iloc[-1]
+        return pd.DataFrame(rows).T
+
+    def get_real_news(self, codes=(), page=0, page_size=5):
+        # 大盤新聞 + 每檔個股各自的 feed；背景更新 (未變動的 feed 只花一次 304)，畫面直接從本地庫分頁讀出
+        from news_feed import GENERAL_FEED
+        feeds = {GENERAL_FEED: GENERAL_FEED}
+        for code in codes:
+            name = self.symbols.name(code, "")
+            feeds[code] = f"{code} {name}" if name else f"{code} 股票"
+        try: get_news_ingester().refresh_async(feeds)
+        except Exception as e: record_error("news", e)
+        rows, total = get_news_store().page(list(feeds), page, page_size)
+
+        news_items = []
+        today = datetime.now(self.tz).date()
+        for r in rows:
+            t = datetime.fromtimestamp(r['published'], self.tz) if r['published'] else None
+            time_str = (t.strftime("%H:%M") if t.date() == today else t.strftime("%m/%d %H:%M")) if t else "最新"
+            news_items.append({"title": r['title'], "link": r['link'], "time": time_str, "source": r['source']})
+        if not news_items: return [{"title": "系統連線中...", "link": "#", "time": "--", "source": "系統"}], 0
+        return news_items, total
+
+    @st.cache_data(ttl=86400)
+    def fetch_universe(_self):
+        # 上市 + 上櫃普通股清單 (約 1,800 檔)，抓不到時退回本地代號主檔
+        from scanner import load_universe
+        universe = load_universe()
+        if not universe: universe = {_self.symbols.symbol(r['code']): r['name'] for r in _self.symbols.rows}
+        return universe
+
+    @st.cache_data(ttl=60)
+    def scan_market(_self, min_p, max_p, strategy):
+        import pandas as pd
+        from scanner import download_universe, scan_frame
+        universe = _self.fetch_universe()
+        try:
+            frame = download_universe(list(universe.keys()))
+            return scan_frame(frame, universe, min_p, max_p, strategy)
+        except Exception as e:
+            record_error("yahoo", e)
+            return pd.DataFrame()
+
+engine = DataEngine()
+
+def init_session():
+    # 兩頁共用的 Session 狀態
+    if 'portfolio' not in st.session_state: st.session_state.portfolio = [{"code": "2330", "name": "台積電", "cost": 980, "qty": 1000}]
+    if 'login_status' not in st.session_state: st.session_state.login_status = False
+    if 'news_page' not in st.session_state: st.session_state.news_page = 0
+
+def auto_fill_name():
+    # 代號或名稱都可以輸入；主檔查得到就不必等報價
+    code = get_master().resolve(st.session_state.p_code_input)
+    if code:
+        st.session_state.p_code_input = code
+        r = get_master().get(code)
+        info = r or engine.fetch_quote(code)
+        if info: st.session_state.p_name_input = info['name']
+
+def pick_symbol(container, query, key):
+    # 代號 / 名稱 -> 代號；不是完整代號時以主檔索引列出候選 (前綴 + 模糊比對)
+    master = get_master()
+    code = master.resolve(query)
+    if not code or master.get(code): return code
+    hits = master.search(code)
+    if not hits: return code
+    return container.selectbox("符合的股票", [h['code'] for h in hits], format_func=lambda c: f"{c} {master.name(c)}", key=key)
+
+def plot_chinese_chart(df, title, trigger_price=None, source=None, ind=None, overlays=(), subplots=(), trigger_label="觸發買進價"):
+    # 長週期 / 多日分K 會先依畫面寬度縮減，超大序列改用 WebGL
+    # source=(代號, 週期)：資料、觸發價與指標選擇都沒變時直接沿用快取的圖，不重建
+    from charts import build_price_figure, data_fingerprint
+    build = lambda: build_price_figure(df, title, trigger_price, trigger_label, ind=ind, overlays=overlays, subplots=subplots)
+    if source is None: return build()
+    key = (*source, data_fingerprint(df), trigger_price, trigger_label, title, tuple(overlays), tuple(subplots))
+    return get_figure_cache().get(key, build)
+
+# 開盤時段各區塊 (st.fragment) 依自己的週期刷新，只重跑該區塊；休市時不自動刷新
+REFRESH_SEC = {"indices": 60, "news": 300, "bot": 60, "intraday": 60}
+
+def show_chart(fig, **kwargs):
+    # st.plotly_chart 內含 Figure 序列化 (to_json)，單獨計時
+    with timed("render.plotly_chart"): return st.plotly_chart(fig, **kwargs)
+
+def render_admin_panel():
+    # 管理員：熱路徑延遲、快取命中、上游錯誤與流量；同一份數據由本機 /metrics 端點以 Prometheus 格式匯出
+    if not st.toggle("🛠️ 系統監控", key="admin_panel"): return
+    import pandas as pd
+    server = get_metrics_server()
+    st.caption(f"Prometheus：http://127.0.0.1:{server.server_port}/metrics" if server else f"Prometheus 端點 :{METRICS_PORT} 由其他行程匯出")
+    lat = pd.DataFrame(REGISTRY.latency_table())
+    if not lat.empty:
+        st.markdown("**延遲 (ms)**")
+        st.dataframe(lat[['op', 'calls', 'errors', 'p50_ms', 'p95_ms', 'p99_ms']].round(1), hide_index=True, use_container_width=True)
+    cache = pd.DataFrame(REGISTRY.counter_table("cache_requests_total"))
+    if not cache.empty:
+        st.markdown("**快取**")
+        pivot = cache.pivot_table(index='cache', columns='result', values='value', aggfunc='sum', fill_value=0).astype(int)
+        total = pivot.sum(axis=1)
+        pivot['命中率%'] = ((pivot.get('hit', 0) + pivot.get('stale', 0)) / total.where(total > 0) * 100).round(1)
+        st.dataframe(pivot, use_container_width=True)
+    errors = pd.DataFrame(REGISTRY.counter_table("upstream_errors_total"))
+    if not errors.empty:
+        st.markdown("**上游錯誤**")
+        st.dataframe(errors.astype({'value': int}), hide_index=True, use_container_width=True)
+    traffic = [f"{r['source']} {r['value']:,.0f} bytes" for r in REGISTRY.counter_table("upstream_bytes_total")]
+    traffic += [f"{r['source']} {r['value']:,.0f} 筆" for r in REGISTRY.counter_table("upstream_rows_total")]
+    if traffic: st.caption("上游流量：" + " | ".join(traffic))
+    sched = pd.DataFrame(REGISTRY.counter_table("scheduler_requests_total"))
+    if not sched.empty:
+        st.markdown("**上游排程**")
+        states = [s.status() for s in all_schedulers()]
+        st.caption(" | ".join(f"{s['upstream']}：斷路器 {s['breaker']}、連線 {s['active']}、排隊 {sum(s['queued'].values())}" for s in states))
+        st.dataframe(sched.pivot_table(index=['upstream', 'priority'], columns='result', values='value', aggfunc='sum', fill_value=0).astype(int),
+                     use_container_width=True)
+    st.download_button("下載 Prometheus 文字", REGISTRY.render_prometheus(), "metrics.prom", "text/plain")
+
+def clear_caches():
+    st.cache_data.clear()
+    get_quote_cache().clear()
+    get_bar_cache().clear()
+    get_figure_cache().clear()
+    get_indicator_cache().clear()
+    get_intraday_book().clear()
+
+def render_upstream_status():
+    # 上游降級明確告知：斷路 = 報價 / K 線改用快取；限流 = 低優先的圖表、基本資料、新聞稍後更新
+    for s in all_schedulers():
+        status = s.status()
+        if status['breaker'] != CLOSED:
+            retry = f"{status['retry_in']:.0f} 秒後重試" if status['retry_in'] else "重試中"
+            st.warning(f"⚠️ {s.name} 暫時無法連線，目前顯示快取資料 ({retry})")
+        elif status['throttled']:
+            st.info(f"⏳ {s.name} 限流中：{'、'.join(status['throttled'])} 稍後更新")
+
+def render_master_status():
+    # 完整主檔在背景建立 (symbols.get_master)；建好前提示上櫃股可能抓錯
+    from symbols import build_status
+    master = engine.symbols
+    if master.complete: return
+    status = build_status()
+    if status['running']: st.info(f"⏳ 正在建立完整代號主檔 (目前為 {len(master)} 檔種子檔)，完成後自動套用")
+    elif status['error']: st.warning(f"⚠️ 代號主檔只有 {len(master)} 檔 (種子檔)，上櫃股可能抓錯；完整主檔建立失敗 ({status['error']})，稍後自動重試")
+    else: st.warning(f"⚠️ 代號主檔只有 {len(master)} 檔 (種子檔)，上櫃股可能抓錯；離線資料源不會自動建立，可執行 python symbols.py")
+
+def render_replay_panel():
+    # 離線資料源狀態；重播模式可調速度、從頭重播 (全行程共用同一個虛擬時鐘)
+    from providers import get_provider, SESSION_OPEN, REPLAY_SPEEDS
+    provider = get_provider()
+    if provider.name == "local": st.caption("📁 資料源：本地 K 線庫 (離線)")
+    if provider.name != "replay": return
+    st.caption(f"⏯️ 重播 {provider.day}　虛擬時間 {provider.now():%H:%M:%S}　{provider.speed:g}x")
+    if "replay_speed" not in st.session_state:
+        st.session_state.replay_speed = min(REPLAY_SPEEDS, key=lambda s: abs(s - provider.speed))
+    st.select_slider("重播速度 (x)", REPLAY_SPEEDS, key="replay_speed", on_change=lambda: provider.set_speed(st.session_state.replay_speed))
+    if st.button("⏮️ 從頭重播"):
+        provider.seek(SESSION_OPEN)
+        clear_caches()
+        st.rerun()
+
+def live_every(part):
+    return REFRESH_SEC[part] if engine.is_market_open() else None
+
+def live_fragment(part):
+    # 這個模組只 import 一次，run_every 不能在定義時決定；每次呼叫才依開盤與否套上 st.fragment
+    def wrap(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs): return st.fragment(run_every=live_every(part))(func)(*args, **kwargs)
+        return run
+    return wrap
+
+def rerun_fragment():
+    # 區塊內的按鈕只重跑該區塊；若這次其實是整頁重跑 (例如 AppTest) 就退回整頁
+    try: st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException: st.rerun()
+
+# ==========================================
+# 股市情報站 (Dashboard)
+# ==========================================
+@live_fragment("indices")
+@timed("render.index_strip")
+def render_index_strip():
+    indices = engine.fetch_indices()
+    c_grid = st.columns(4)
+    for i, (name, data) in enumerate(indices.items()):
+        if i < 4:
+            color = "up" if data['change'] > 0 else "down"
+            with c_grid[i]:
+                st.markdown(f"""
+                <div class='card'>
+                    <div class='card-title'>{name}</div>
+                    <div class='card-val {color}'>{data['price']:,.0f}</div>
+                    <div class='{color}'>{data['change']:+.0f} ({data['pct']:+.2f}%)</div>
+                </div>
+                """, unsafe_allow_html=True)
+
+@live_fragment("news")
+@timed("render.news")
+def render_news(codes):
+    if st.session_state.get('news_codes') != codes:
+        # 換了代號 / 庫存：feed 組合不同，舊的頁碼沒有意義
+        st.session_state.news_codes, st.session_state.news_page = codes, 0
+    news_list, news_total = engine.get_real_news(codes, st.session_state.news_page)
+    for news in news_list:
+        st.markdown(f"""
+        <div class='news-item'>
+            <a href='{news['link']}' target='_blank' class='news-link'>{news['title']} 🔗</a>
+            <div class='news-meta'>{news['time']} | {news['source']}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    news_pages = max(1, -(-news_total // 5))
+    c_prev, c_page, c_next = st.columns([1, 2, 1])
+    if c_prev.button("◀ 上一頁", key="news_prev", disabled=st.session_state.news_page == 0):
+        st.session_state.news_page -= 1
+        rerun_fragment()
+    c_page.caption(f"第 {min(st.session_state.news_page, news_pages - 1) + 1} / {news_pages} 頁")
+    if c_next.button("下一頁 ▶", key="news_next", disabled=st.session_state.news_page + 1 >= news_pages):
+        st.session_state.news_page += 1
+        rerun_fragment()
+
+@timed("render.dashboard")
+def render_dashboard():
+    import pandas as pd
+    from indicators import OVERLAYS, SUBPLOTS
+    from news_feed import news_codes
+    st.markdown("<div class='nav-bar'><span class='nav-title'>🕵️ 股市情報站 (Intelligence Station)</span></div>", unsafe_allow_html=True)
+    
+    col_main, col_news = st.columns([3, 2])
+    
+    with col_main:
+        # A. 大盤
+        st.subheader("📊 市場行情")
+        render_index_strip()
+        st.divider()
+        
+        # B. 個股偵查
+        st.subheader("🔎 全方位個股偵查")
+        c_search, c_space = st.columns([1, 2])
+        ticker = pick_symbol(c_search, c_search.text_input("輸入代號或名稱 (例如 2330、台積)", "2330"), "search_pick")
+        
+        q = engine.fetch_quote(ticker)
+        try: profile, profile_state = engine.fetch_stock_profile(ticker), None
+        except UpstreamUnavailable as e: profile, profile_state = None, e.state
+        
+        if q:
+            color_cls = "up" if q['change'] > 0 else "down"
+            st.markdown(f"""
+            <div class='stock-header'>
+                <span class='stock-price-lg {color_cls}'>{q['price']}</span>
+                <span class='stock-meta {color_cls}' style='margin-left:10px; font-size:20px;'>{q['change']:+.2f} ({q['pct']:+.2f}%)</span>
+                <div class='stock-meta'>代號: {ticker} | 名稱: {q['name']} | 成交量: {q['vol']:,}</div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            tab1, tab2, tab3 = st.tabs(["📈 技術走勢", "📋 基本資料", "🔗 深層數據 (Anue)"])
+            
+            with tab1:
+                c_k_opt, c_k_ind = st.columns([1, 4])
+                k_type = c_k_opt.radio("K線週期", ["日K", "週K", "月K"], horizontal=True, label_visibility="collapsed")
+                picked = c_k_ind.multiselect("技術指標", list(OVERLAYS) + list(SUBPLOTS), placeholder="技術指標 (MA / 布林 / RSI / MACD / KD / ATR)", label_visibility="collapsed", key="dash_ind")
+                
+                if k_type == "日K": k_inv, k_prd = "1d", "3mo"
+                elif k_type == "週K": k_inv, k_prd = "1wk", "1y"
+                else: k_inv, k_prd = "1mo", "5y"
+                
+                df_k, ind_k = engine.fetch_indicators(ticker, interval=k_inv, period=k_prd)
+                
+                if not df_k.empty:
+                    show_chart(plot_chinese_chart(df_k, f"{q['name']} ({ticker}) - {k_type}線圖", source=(ticker, k_inv), ind=ind_k,
+                                                       overlays=[p for p in picked if p in OVERLAYS], subplots=[p for p in picked if p in SUBPLOTS]), use_container_width=True, key="dash_chart")
+                else:
+                    st.warning("查無此週期 K 線資料")
+            
+            with tab2:
+                if profile:
+                    c_p1, c_p2, c_p3 = st.columns(3)
+                    c_p1.metric("本益比 (PE)", f"{profile['pe']}")
+                    c_p2.metric("每股盈餘 (EPS)", f"{profile['eps']}")
+                    c_p3.metric("殖利率 (%)", f"{profile['yield']:.2f}%" if profile['yield'] != 'N/A' else 'N/A')
+                    st.caption(f"產業: {profile['sector']} | 市值: {profile['marketCap']}")
+                else:
+                    st.info(DEGRADED_TEXT.get(profile_state, "暫無基本資料"))
+
+            with tab3:
+                st.info(f"🔒 {q['name']} ({ticker}) 深層數據傳送門 (點擊直達鉅亨網)：")
+                anue_base = f"https://stock.cnyes.com/market/TWS:{ticker}:STOCK"
+                col_btn1, col_btn2, col_btn3 = st.columns(3)
+                col_btn1.link_button("🏦 三大法人買賣超", f"{anue_base}/institutional", use_container_width=True)
+                col_btn2.link_button("📉 融資融券餘額", f"{anue_base}/margin", use_container_width=True)
+                col_btn3.link_button("📑 營收與財報", f"{anue_base}/financials", use_container_width=True)
+                
+        st.divider()
+        
+        # C. 熱點排行
+        st.subheader("🔥 市場熱點排行 (Scanner)")
+        with st.container():
+            st.info("💡 請設定條件以開始搜尋")
+            c_s1, c_s2, c_s3, c_s4 = st.columns([2, 2, 3, 2])
+            min_p = c_s1.number_input("最低價 ($)", value=10, min_value=1)
+            max_p = c_s2.number_input("最高價 ($)", value=1000, min_value=1)
+            strat = c_s3.selectbox("篩選策略", ["漲跌停 (±10%)", "爆量強勢股", "飆股 (漲幅排行)"])
+            with_ind = st.checkbox("附加技術指標 (RSI / KD / MA20 乖離)", key="scan_ind")
+            if c_s4.button("🔍 開始掃描", type="primary", use_container_width=True):
+                with st.spinner("正在掃描全市場數據..."):
+                    res = engine.scan_market(min_p, max_p, strat)
+                    if not res.empty:
+                        fmt = {"股價": "{:.2f}", "漲跌幅": "{:+.2f}%", "成交量": "{:,}"}
+                        if with_ind:
+                            snap = engine.indicator_snapshot(list(res['代號']))
+                            if not snap.empty:
+                                res = res.assign(RSI=res['代號'].map(snap['rsi']), K=res['代號'].map(snap['k']), D=res['代號'].map(snap['d']),
+                                                 MA20乖離=(res['股價'] / res['代號'].map(snap['ma20']) - 1) * 100)
+                                fmt.update({"RSI": "{:.1f}", "K": "{:.1f}", "D": "{:.1f}", "MA20乖離": "{:+.2f}%"})
+                        st.success(f"搜尋完成！")
+                        st.dataframe(res.style.format(fmt, na_rep="-"), use_container_width=True)
+                    else:
+                        st.warning("查無符合條件股票")
+
+    with col_news:
+        st.subheader("📰 今日頭條 (Google News)")
+        st.caption("點擊標題開啟新視窗")
+        render_news(news_codes(ticker, st.session_state.portfolio))
+            
+    st.divider()
+    st.subheader("🎒 我的資產庫存")
+    with st.expander("➕ 新增庫存紀錄", expanded=False):
+        c1, c2, c3, c4 = st.columns(4)
+        new_code = c1.text_input("代號", key="p_code_input", on_change=auto_fill_name)
+        new_name = c2.text_input("名稱 (自動帶入)", key="p_name_input")
+        new_cost = c3.number_input("平均成本", min_value=0.0)
+        new_qty = c4.number_input("股數", min_value=1, step=1000)
+        if st.button("加入"):
+            if new_code:
+                st.session_state.portfolio.append({"code": new_code, "name": new_name, "cost": new_cost, "qty": new_qty})
+                st.rerun()
+    if st.session_state.portfolio:
+        p_data = []
+        quotes = engine.fetch_quotes([item['code'] for item in st.session_state.portfolio])
+        for item in st.session_state.portfolio:
+            q = quotes.get(item['code'])
+            curr = q['price'] if q else item['cost']
+            prof = (curr - item['cost']) * item['qty']
+            p_data.append({
+                "代號": item['code'], "名稱": item['name'], "持有": item['qty'],
+                "成本": item['cost'], "現價": f"{curr:.2f}", "損益": f"{prof:,.0f}"
+            })
+        st.dataframe(pd.DataFrame(p_data), use_container_width=True)